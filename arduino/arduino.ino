@@ -2,23 +2,68 @@
 
 // ========== Config ==========
 #define DEBUG 1  // Set to 1 for verbose serial prints
+#define SLOT_EEPROM 0  // Set to 1 to keep stored slots across resets (EEPROM)
+#ifndef FIRMWARE_ID
+#define FIRMWARE_ID 0UL  // Set by the host's build cache (-DFIRMWARE_ID=0x...UL), 0 = unknown build
+#endif
+#if SLOT_EEPROM
+#include <EEPROM.h>
+#endif
+#define EVENT_QUEUE_CAPACITY 20  // maxEvents
+#include "event_queue.h"
+#include "command_reader.h"
+#define SLOT_POOL_SLOTS 8  // numSlots
+#define SLOT_POOL_SLOT_EVENTS 20  // maxEvents
+#include "slot_pool.h"
 
 const int channelPins[] = {1, 2, 3, 4, 5, 6};
 const int numChannels = sizeof(channelPins) / sizeof(channelPins[0]);
 const int maxEvents = 20;
+const unsigned long maxDelayUs = 0x7FFFFFFFUL;  // ~35.8 min, half the micros() range
+const int numSlots = 8;
+const unsigned long frameTimeoutUs = 1000000UL;  // A frame stalled this long is handled as is
 
 // ========== Data Structures ==========
-struct Event {
-  unsigned long startTime;  // in micros
-  int channel;
-  bool state;
-};
+// Pending events, fired in time order by the Timer1 compare interrupt. loop() only
+// touches the queue with interrupts disabled.
+EventQueue queue;
+
+// All channels are bits of one output port (PORTD on the Uno), so events at the same
+// time are set with a single port write
+volatile uint8_t* channelPort;
+uint8_t channelBit[numChannels];
+const uint8_t allChannels = (1 << numChannels) - 1;
+
+// Preloaded sequences, see slot_pool.h. The timer interrupt loads repeat shots from
+// them, so loop() only changes them with interrupts disabled.
+SlotPool slots;
 
-Event Events[maxEvents];
-int numEvents = 0;
+// Repeat mode: slot repeatSlot is replayed every repeatPeriod us, each shot reported as "D<n>"
+int repeatSlot = -1;  // -1 when not repeating (or the last shot is loaded)
+unsigned long repeatPeriod = 0;
+unsigned long repeatCount = 0;  // 0 = until STOP
+unsigned long nextShotTime = 0;
+unsigned long shotNumber = 0;
+bool shotActive = false;  // a shot's events are in the queue
+volatile unsigned long completedShot = 0;  // last shot finished by the interrupt
+unsigned long reportedShot = 0;  // last shot reported as "D<n>" by loop()
+// Bytes of the command being received; loop() feeds it whatever has arrived
+CommandReader reader;
+long currentSeq = -1;  // Sequence number of the command being handled, -1 if none
+unsigned long streamOrigin = 0;  // micros() when the current event list was (re)started; the interrupt moves it to each repeat shot
 
 // ========== Helpers ==========
+// Echo the host's sequence number so pipelined replies can be matched
+void printSeq() {
+  if (currentSeq >= 0) {
+    Serial.print('#');
+    Serial.print(currentSeq);
+    Serial.print(' ');
+  }
+}
+
 void sendConfirmation(bool success, const char* msg = "") {
+  printSeq();
 #if DEBUG
   Serial.print(success ? "OK: " : "ERR: ");
   Serial.println(msg);
@@ -27,37 +72,157 @@ void sendConfirmation(bool success, const char* msg = "") {
 #endif
 }
 
+// CRC of fixed commands like "STOP;": XOR of buffer up to `end`, compared with the number at `end`
+bool fixedCommandCRC(const char* buffer, const char* end) {
+  char calcCRC = 0;
+  for (const char* c = buffer; c < end; ++c) calcCRC ^= *c;
+  return calcCRC == (char)atoi(end);
+}
+
+void armTimer();
+
 void resetEvents() {
-  numEvents = 0;
+  noInterrupts();
+  eqClear(&queue);
+  repeatSlot = -1;
+  shotActive = false;
+  armTimer();
+  interrupts();
 #if DEBUG
+  printSeq();
   Serial.println("Events reset.");
 #endif
 }
 
+// delay_us is relative to streamOrigin so appended events share the first command's time base
 void scheduleEvent(unsigned long delay_us, int channel, bool state) {
   if (channel >= numChannels || channel < 0) {
     sendConfirmation(false, "Bad channel.");
     return;
   }
-  if (numEvents < maxEvents) {
-    Events[numEvents++] = {micros() + delay_us, channel, state};
-  } else {
-    sendConfirmation(false, "Event buffer full.");
+  noInterrupts();
+  bool queued = eqPush(&queue, streamOrigin + delay_us, channel, state);
+  armTimer();
+  interrupts();
+  if (!queued) sendConfirmation(false, "Event buffer full.");
+}
+
+void loadShot();
+
+// Drive the channels in `high`/`low` (bit n = channel n) with one port write (interrupts disabled)
+void writeChannels(uint8_t high, uint8_t low) {
+  uint8_t set = 0, clear = 0;
+  for (uint8_t i = 0; i < numChannels; ++i) {
+    if (high & (1 << i)) set |= channelBit[i];
+    if (low & (1 << i)) clear |= channelBit[i];
   }
+  *channelPort = (*channelPort & ~clear) | set;
 }
 
-void processEvents() {
-  unsigned long now = micros();
-  for (int i = 0; i < numEvents;) {
-    if ((long)(now - Events[i].startTime) >= 0) {
-      digitalWrite(channelPins[Events[i].channel], Events[i].state);
-      Events[i] = Events[--numEvents];  // Fast remove
-    } else {
-      ++i;
-    }
+// Timer1 runs freely at 0.5 us per tick and wraps every 32.768 ms, so a far event
+// takes a few intermediate compare matches (interrupts disabled)
+void armTimer() {
+  if (eqEmpty(&queue)) {
+    TIMSK1 &= ~_BV(OCIE1A);
+    return;
+  }
+  long wait = (long)(eqNextTime(&queue) - micros());
+  if (wait < 4) wait = 4;
+  if (wait > 30000) wait = 30000;
+  OCR1A = TCNT1 + (uint16_t)(wait * 2);
+  TIFR1 = _BV(OCF1A);  // Drop a match of the previous compare value
+  TIMSK1 |= _BV(OCIE1A);
+}
+
+ISR(TIMER1_COMPA_vect) {
+  uint8_t high, low;
+  while (eqPopDue(&queue, micros(), &high, &low)) writeChannels(high, low);
+  if (shotActive && eqEmpty(&queue)) {
+    shotActive = false;
+    completedShot = shotNumber;  // Reported by loop()
+    // Load the next shot here so it fires on time, however busy loop() is
+    if (repeatSlot >= 0) loadShot();
   }
+  armTimer();
 }
 
+// "D<n>" for every shot the interrupt finished since the last call
+void reportShots() {
+  noInterrupts();
+  unsigned long done = completedShot;
+  interrupts();
+  while (reportedShot != done) {
+    Serial.print('D');  // Unsolicited, so never "#<seq>"-tagged
+    Serial.println(++reportedShot);
+  }
+}
+
+// Set streamOrigin from loop(); the interrupt writes it too when it loads a repeat shot
+void setStreamOrigin(unsigned long origin) {
+  noInterrupts();
+  streamOrigin = origin;
+  interrupts();
+}
+
+void addSlotEvent(int n, unsigned long delay_us, int channel, bool state) {
+  if (channel >= numChannels || channel < 0) {
+    sendConfirmation(false, "Bad channel.");
+    return;
+  }
+  noInterrupts();
+  bool added = spAdd(&slots, n, delay_us, channel, state);
+  interrupts();
+  if (!added) sendConfirmation(false, "Slot full.");
+}
+
+// Replace the event list with slot n's events, timed from origin (interrupts disabled)
+void loadSlot(int n, unsigned long origin) {
+  streamOrigin = origin;
+  spLoad(&slots, n, &queue, origin);
+  armTimer();
+}
+
+void fireSlot(int n) {
+  noInterrupts();
+  repeatSlot = -1;
+  shotActive = false;
+  loadSlot(n, micros());
+  interrupts();
+}
+
+// Interrupts disabled
+void loadShot() {
+  loadSlot(repeatSlot, nextShotTime);
+  shotActive = true;
+  shotNumber++;
+  nextShotTime += repeatPeriod;
+  if (repeatCount && shotNumber >= repeatCount) repeatSlot = -1;
+}
+
+#if SLOT_EEPROM
+const uint16_t slotMagic = 0x5A01;
+
+void saveSlots() {
+  int addr = 0;
+  EEPROM.put(addr, slotMagic); addr += sizeof(slotMagic);
+  EEPROM.put(addr, slots.used); addr += sizeof(slots.used);
+  EEPROM.put(addr, slots.start); addr += sizeof(slots.start);
+  EEPROM.put(addr, slots.count); addr += sizeof(slots.count);
+  for (int i = 0; i < slots.used; ++i, addr += sizeof(SlotEvent)) EEPROM.put(addr, slots.events[i]);
+}
+
+void loadSlots() {
+  uint16_t magic;
+  int addr = 0;
+  EEPROM.get(addr, magic); addr += sizeof(magic);
+  if (magic != slotMagic) return;
+  EEPROM.get(addr, slots.used); addr += sizeof(slots.used);
+  EEPROM.get(addr, slots.start); addr += sizeof(slots.start);
+  EEPROM.get(addr, slots.count); addr += sizeof(slots.count);
+  for (int i = 0; i < slots.used; ++i, addr += sizeof(SlotEvent)) EEPROM.get(addr, slots.events[i]);
+}
+#endif
+
 // ========== Setup ==========
 void setup() {
   Serial.begin(115200);
@@ -73,25 +238,136 @@ void setup() {
   digitalWrite(channelPins[3], LOW);
   digitalWrite(channelPins[4], LOW);
   digitalWrite(channelPins[5], LOW);  
+  channelPort = portOutputRegister(digitalPinToPort(channelPins[0]));
+  for (int i = 0; i < numChannels; ++i) channelBit[i] = digitalPinToBitMask(channelPins[i]);
+  // Timer1: normal mode, prescaler 8 (0.5 us per tick); the compare A interrupt fires events
+  TCCR1A = 0;
+  TCCR1B = _BV(CS11);
+  TIMSK1 = 0;
+#if SLOT_EEPROM
+  loadSlots();
+#endif
+  Serial.println("READY");  // Lets the host start talking as soon as the board is up
 }
 
 // ========== Main Loop ==========
+void handleCommand(char* buffer, int len, unsigned long rxTime);
+void handleBinary(const CommandReader* r);
+
+// Act on what crFeed()/crExpired() returned
+void dispatch(uint8_t result, uint8_t slot) {
+  switch (result) {
+    case CR_FIRE:
+      if (slot < numSlots) fireSlot(slot);
+      break;
+    case CR_COMMAND:
+      handleCommand(reader.buffer, reader.len, micros());
+      break;
+    case CR_BINARY:
+      handleBinary(&reader);
+      break;
+  }
+}
+
 void loop() {
-  // Always process pending events
-  processEvents();
+  // Events fire from the timer interrupt; only the shot notifications are sent from here
+  reportShots();
 
-  // Wait for start of command
-  while (Serial.available() > 0 && Serial.peek() != '<') {
-    Serial.read(); // discard garbage
+  // Consume what has arrived without waiting for the rest of a command; "!<n>" fires
+  // slot n with no framing and no reply
+  while (Serial.available() > 0) {
+    uint8_t slot = 0;
+    dispatch(crFeed(&reader, Serial.read(), micros(), &slot), slot);
   }
+  dispatch(crExpired(&reader, micros(), frameTimeoutUs), 0);
+}
 
-  if (Serial.available() == 0) return;
+// Store event e in slot n, or schedule it if n is -1
+void addEvent(int n, const ParsedEvent& e) {
+  // Keep delays below 2^31 us so (long)(now - startTime) stays overflow-safe
+  if ((e.micro && e.time > maxDelayUs) || (!e.micro && e.time > maxDelayUs / 1000)) {
+    sendConfirmation(false, "Bad delay.");
+  } else if (n >= 0) {
+    addSlotEvent(n, e.micro ? e.time : e.time * 1000, e.channel, e.state != 0);
+  } else {
+    scheduleEvent(e.micro ? e.time : e.time * 1000, e.channel, e.state != 0);
+  }
+}
 
-  if (Serial.read() != '<') return;
+// Empty slot n for the events that follow; false (and "Bad slot.") if there is none or it
+// is being repeated, as the interrupt could load a half-stored or empty shot from it
+bool beginSlot(int n) {
+  noInterrupts();
+  bool ok = n >= 0 && n < numSlots && n != repeatSlot;
+  if (ok) spBegin(&slots, n);
+  interrupts();
+  if (!ok) sendConfirmation(false, "Bad slot.");
+  return ok;
+}
 
-  char buffer[512];
-  int len = Serial.readBytesUntil('>', buffer, sizeof(buffer) - 1);
-  buffer[len] = '\0';
+// Confirm an event command once all its events were added
+void finishEvents(int slot, bool append) {
+  if (slot >= 0) {
+#if SLOT_EEPROM
+    saveSlots();
+#endif
+    sendConfirmation(true, "Stored.");
+    return;
+  }
+  sendConfirmation(true, append ? "Appended." : "Scheduled.");
+}
+
+// Handle a binary frame (see command_reader.h): the event commands of handleCommand
+// as fixed-size records, with a CRC-16 instead of the XOR CRC and no text to parse
+void handleBinary(const CommandReader* r) {
+  const uint8_t* payload = (const uint8_t*)r->buffer;
+  currentSeq = -1;
+  if (r->len >= 2 && readLE(payload, 2) != BINARY_NO_SEQ) currentSeq = readLE(payload, 2);
+  if (!crBinaryOk(r)) {
+    sendConfirmation(false, "CRC mismatch.");
+    return;
+  }
+  uint8_t flags = r->binLen > 2 ? payload[2] : 0;
+  uint8_t header = 3 + ((flags & BIN_ORIGIN) ? 4 : 0) + ((flags & BIN_STORE) ? 1 : 0);
+  if (r->binLen <= header || (r->binLen - header) % BINARY_EVENT_SIZE != 0) {
+    sendConfirmation(false, "Bad length.");
+    return;
+  }
+
+  const uint8_t* p = payload + 3;
+  int slot = -1;
+  bool append = false;
+  if (flags & BIN_STORE) {
+    slot = p[(flags & BIN_ORIGIN) ? 4 : 0];
+    if (!beginSlot(slot)) return;
+  } else {
+    append = flags & BIN_APPEND;
+    if (!append) {
+      resetEvents();
+      setStreamOrigin(micros());
+    }
+    if (flags & BIN_ORIGIN) setStreamOrigin(readLE(p, 4));
+  }
+  for (p = payload + header; p < payload + r->binLen; p += BINARY_EVENT_SIZE) {
+    ParsedEvent e;
+    binaryEvent(p, &e);
+    addEvent(slot, e);
+  }
+  finishEvents(slot, append);
+}
+
+// Handle the body of a "<...>" frame, parsed in place; rxTime is reported to PING
+void handleCommand(char* buffer, int len, unsigned long rxTime) {
+  // Optional "#<seq>|" prefix, covered by the CRC like the rest of the command
+  currentSeq = -1;
+  char* body = buffer;
+  if (buffer[0] == '#') {
+    char* bar = strchr(buffer, '|');
+    if (bar) {
+      currentSeq = atol(buffer + 1);
+      body = bar + 1;
+    }
+  }
 
   if (len == 0) {
     sendConfirmation(false, "Empty.");
@@ -99,21 +375,67 @@ void loop() {
   }
 
   // Handle STOP
-  if (strncmp(buffer, "STOP;", 5) == 0) {
-    char receivedCRC = atoi(buffer + 5);
-    char calcCRC = 0;
-    for (int i = 0; i < 5; ++i) calcCRC ^= buffer[i];
-
-    if (calcCRC == receivedCRC) {
+  if (strncmp(body, "STOP;", 5) == 0) {
+    if (fixedCommandCRC(buffer, body + 5)) {
       resetEvents();
-      for (int i = 0; i < numChannels; ++i) {
-        digitalWrite(channelPins[i], LOW);
-      }
+      noInterrupts();
+      writeChannels(0, allChannels);
+      interrupts();
       sendConfirmation(true, "Stopped.");
     } else {
       sendConfirmation(false, "Bad CRC.");
     }
-    while (Serial.available()) Serial.read();
+    return;
+  }
+
+  // Handle PING: reply with the device clock at reception for host clock sync
+  if (strncmp(body, "PING;", 5) == 0) {
+    if (fixedCommandCRC(buffer, body + 5)) {
+      printSeq();
+      Serial.print('T');
+      Serial.println(rxTime);
+    } else {
+      sendConfirmation(false, "Bad CRC.");
+    }
+    return;
+  }
+
+  // Handle ID: report which build is running so the host can skip re-uploading it
+  if (strncmp(body, "ID;", 3) == 0) {
+    if (fixedCommandCRC(buffer, body + 3)) {
+      printSeq();
+      Serial.print("ID:");
+      Serial.println(FIRMWARE_ID, HEX);
+    } else {
+      sendConfirmation(false, "Bad CRC.");
+    }
+    return;
+  }
+
+  // Handle BIN: the host sends event commands as binary frames once it gets "BIN:<version>"
+  if (strncmp(body, "BIN;", 4) == 0) {
+    if (fixedCommandCRC(buffer, body + 4)) {
+      printSeq();
+      Serial.print("BIN:");
+      Serial.println(BINARY_VERSION);
+    } else {
+      sendConfirmation(false, "Bad CRC.");
+    }
+    return;
+  }
+
+  // Handle F<n>: fire slot n, like "!<n>" but with CRC and confirmation
+  if (body[0] == 'F') {
+    char* semi = strchr(body, ';');
+    int slot = atoi(body + 1);
+    if (!semi || !fixedCommandCRC(buffer, semi + 1)) {
+      sendConfirmation(false, "Bad CRC.");
+    } else if (slot < 0 || slot >= numSlots) {
+      sendConfirmation(false, "Bad slot.");
+    } else {
+      fireSlot(slot);
+      sendConfirmation(true, "Fired.");
+    }
     return;
   }
 
@@ -125,14 +447,12 @@ void loop() {
   }
 
   int receivedCRC = atoi(lastSemi + 1);
-  size_t dataLen = lastSemi - buffer + 1;
-  char data[512];
-  strncpy(data, buffer, dataLen);
-  data[dataLen] = '\0';
+  // Parse in place (no copy of the frame; the slot pool needs the RAM)
+  *(lastSemi + 1) = '\0';
 
   char calcCRC = 0;
-  for (size_t i = 0; i < dataLen; ++i) {
-    calcCRC ^= data[i];
+  for (char* c = buffer; c <= lastSemi; ++c) {
+    calcCRC ^= *c;
   }
 
   if (calcCRC != receivedCRC) {
@@ -140,31 +460,74 @@ void loop() {
     return;
   }
 
-  resetEvents();
+  // "S<n>;" stores the events in slot n instead of scheduling them
+  int slot = -1;
+  bool append = false;
+  if (*body == 'S') {
+    slot = atoi(body + 1);
+    if (!beginSlot(slot)) return;
+    body = strchr(body, ';') + 1;
+  } else {
+    // "+" appends to the running event list (streaming) instead of replacing it
+    append = (*body == '+');
+    if (append) {
+      body++;
+    } else {
+      resetEvents();
+      setStreamOrigin(micros());
+    }
+    // "@<micros>;" anchors the delays to an absolute device time (host clock sync)
+    if (*body == '@') {
+      setStreamOrigin(strtoul(body + 1, NULL, 10));
+      body = strchr(body, ';') + 1;
+    }
+  }
 
-  char* token = strtok(data, ";");
-  while (token != NULL) {
-    char* p1 = strchr(token, '(');
-    char* c1 = strchr(p1, ',');
-    char* c2 = strchr(c1 + 1, ',');
-    char* p2 = strchr(c2 + 1, ')');
+  // "R<slot>,<period>[u],<count>;" replays a slot from streamOrigin every period, count times (0 = until STOP)
+  if (slot < 0 && !append && *body == 'R') {
+    char* end;
+    int n = strtol(body + 1, &end, 10);
+    unsigned long period = strtoul(end + 1, &end, 10);
+    bool micro = (*end == 'u');
+    unsigned long count = strtoul(end + (micro ? 2 : 1), NULL, 10);
+    if (!micro) period = (period > maxDelayUs / 1000) ? 0 : period * 1000;
+    if (n < 0 || n >= numSlots || slots.count[n] == 0) {
+      sendConfirmation(false, "Bad slot.");
+    } else if (period == 0 || period > maxDelayUs) {
+      sendConfirmation(false, "Bad period.");
+    } else {
+      noInterrupts();
+      repeatSlot = n;
+      repeatPeriod = period;
+      repeatCount = count;
+      shotNumber = 0;
+      completedShot = 0;
+      reportedShot = 0;
+      nextShotTime = streamOrigin;
+      loadShot();
+      interrupts();
+      sendConfirmation(true, "Repeating.");
+    }
+    return;
+  }
 
-    if (p1 && c1 && c2 && p2) {
-      *c1 = *c2 = *p2 = '\0';
-      int ch = atoi(p1 + 1);
-      int time = atoi(c1 + 1);
-      int state = atoi(c2 + 1);
-      scheduleEvent((unsigned long)time * 1000, ch, state != 0);
+  // "(ch,time[u],state);" tokens up to the CRC; times are in ms, or in us with a "u" suffix
+  for (char* token = body; token <= lastSemi; ) {
+    char* semi = strchr(token, ';');
+    ParsedEvent e;
+    if (semi > token && parseEvent(token, semi, &e)) {
+      addEvent(slot, e);
     }
 #if DEBUG
-    else {
+    else if (semi > token) {
+      *semi = '\0';
+      printSeq();
       Serial.print("Skip: ");
       Serial.println(token);
     }
 #endif
-    token = strtok(NULL, ";");
+    token = semi + 1;
   }
 
-  sendConfirmation(true, "Scheduled.");
-  while (Serial.available()) Serial.read();
+  finishEvents(slot, append);
 }
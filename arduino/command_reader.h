@@ -0,0 +1,175 @@
+// Incremental reader for the host's serial commands, used by arduino.ino. It has no
+// Arduino dependencies, so host/test_command_reader.cpp can test it with gcc on Linux.
+//
+// crFeed() takes one byte at a time, so loop() consumes whatever has arrived and
+// never waits for the rest of a command:
+//   "<body>"  frame; crFeed returns CR_COMMAND once '>' arrives, body in buffer
+//   "!<d>"    unframed slot fire; crFeed returns CR_FIRE with the digit in *slot
+//   0xA5 <n> <n payload bytes> <CRC-16>
+//             binary frame; crFeed returns CR_BINARY once its CRC has arrived, with
+//             the payload and CRC in buffer (see crBinaryOk and binaryEvent)
+// Anything else between commands is skipped.
+#ifndef COMMAND_READER_H
+#define COMMAND_READER_H
+
+#include <stdint.h>
+#include <stdlib.h>
+#ifdef __AVR__
+#include <util/crc16.h>
+#endif
+
+#ifndef COMMAND_BUFFER_SIZE
+#define COMMAND_BUFFER_SIZE 512
+#endif
+
+#define BINARY_SYNC 0xA5  // Never part of a text command
+#define BINARY_VERSION 1  // Reported as "BIN:<version>"
+// Binary payload: seq (uint16, BINARY_NO_SEQ if untagged), flags, origin (uint32, with
+// BIN_ORIGIN), slot (uint8, with BIN_STORE), then BINARY_EVENT_SIZE bytes per event:
+// channel | state << 7 and the delay in us (uint32). Integers are little endian.
+#define BINARY_NO_SEQ 0xFFFF
+#define BINARY_EVENT_SIZE 5
+enum { BIN_APPEND = 0x01, BIN_ORIGIN = 0x02, BIN_STORE = 0x04 };
+
+enum { CR_NONE, CR_COMMAND, CR_FIRE, CR_BINARY };
+enum { CR_IDLE, CR_BANG, CR_FRAME, CR_BIN_LEN, CR_BIN_BODY };
+
+struct CommandReader {
+  char buffer[COMMAND_BUFFER_SIZE];  // Body of the last complete frame (NUL-terminated text)
+  uint16_t len;
+  uint8_t state;
+  uint8_t binLen;  // Payload length of a binary frame
+  uint16_t crc;  // CRC-16 of a binary frame's length and payload, updated per byte
+  uint32_t lastByteAt;  // micros() of the last byte of a frame in progress
+};
+
+// CRC-16/CCITT-FALSE step (polynomial 0x1021, start 0xFFFF); avr-libc has it in assembly
+static inline uint16_t crc16Update(uint16_t crc, uint8_t data) {
+#ifdef __AVR__
+  return _crc_xmodem_update(crc, data);
+#else
+  crc ^= (uint16_t)data << 8;
+  for (uint8_t i = 0; i < 8; ++i) crc = (crc & 0x8000) ? (crc << 1) ^ 0x1021 : crc << 1;
+  return crc;
+#endif
+}
+
+static inline void crReset(CommandReader* r) {
+  r->len = 0;
+  r->state = CR_IDLE;
+  r->binLen = 0;
+  r->buffer[0] = '\0';
+}
+
+// A frame longer than the buffer is cut off; the CRC check then rejects it
+static inline uint8_t crFeed(CommandReader* r, char c, uint32_t now, uint8_t* slot) {
+  switch (r->state) {
+    case CR_BANG:
+      r->state = CR_IDLE;
+      if (c >= '0' && c <= '9') {
+        *slot = c - '0';
+        return CR_FIRE;
+      }
+      if (c != '<' && (uint8_t)c != BINARY_SYNC) return CR_NONE;
+      // A lost digit: treat this byte as the start of the next frame
+      /* fall through */
+    case CR_IDLE:
+      if (c == '<') {
+        r->len = 0;
+        r->state = CR_FRAME;
+        r->lastByteAt = now;
+      } else if (c == '!') {
+        r->state = CR_BANG;
+      } else if ((uint8_t)c == BINARY_SYNC) {
+        r->len = 0;
+        r->state = CR_BIN_LEN;
+        r->lastByteAt = now;
+      }
+      return CR_NONE;
+    case CR_BIN_LEN:
+      r->binLen = c;
+      r->crc = crc16Update(0xFFFF, c);
+      r->state = CR_BIN_BODY;
+      r->lastByteAt = now;
+      return CR_NONE;
+    case CR_BIN_BODY:
+      // Counted rather than delimited: payload bytes may look like '<', '>' or the sync byte
+      r->lastByteAt = now;
+      if (r->len < r->binLen) r->crc = crc16Update(r->crc, c);
+      r->buffer[r->len++] = c;
+      if (r->len < r->binLen + 2) return CR_NONE;
+      r->state = CR_IDLE;
+      return CR_BINARY;
+    default:  // CR_FRAME
+      r->lastByteAt = now;
+      if (c == '>') {
+        r->buffer[r->len] = '\0';
+        r->state = CR_IDLE;
+        return CR_COMMAND;
+      }
+      if (c == '<') {
+        r->len = 0;  // The previous frame lost its '>'; start over
+      } else if (r->len < COMMAND_BUFFER_SIZE - 1) {
+        r->buffer[r->len++] = c;
+      }
+      return CR_NONE;
+  }
+}
+
+// CR_COMMAND or CR_BINARY (once) if a frame stalled for `timeout` us; its partial
+// body is handed over like a complete one, so the host still gets an error reply
+static inline uint8_t crExpired(CommandReader* r, uint32_t now, uint32_t timeout) {
+  if (r->state < CR_FRAME || now - r->lastByteAt < timeout) return CR_NONE;
+  uint8_t result = (r->state == CR_FRAME) ? CR_COMMAND : CR_BINARY;
+  if (result == CR_COMMAND) r->buffer[r->len] = '\0';
+  r->state = CR_IDLE;
+  return result;
+}
+
+// Little-endian unsigned integer of `n` bytes
+static inline uint32_t readLE(const uint8_t* p, uint8_t n) {
+  uint32_t value = 0;
+  while (n--) value = (value << 8) | p[n];
+  return value;
+}
+
+// True if the binary frame in buffer is complete and its CRC matches
+static inline bool crBinaryOk(const CommandReader* r) {
+  const uint8_t* b = (const uint8_t*)r->buffer;
+  return r->len == r->binLen + 2 && r->crc == (((uint16_t)b[r->binLen] << 8) | b[r->binLen + 1]);
+}
+
+struct ParsedEvent {
+  int channel;
+  unsigned long time;
+  bool micro;  // time is in us rather than ms
+  int state;
+};
+
+// Parse one "(ch,time[u],state)" token in [p, end) in place; false if malformed
+static inline bool parseEvent(const char* p, const char* end, ParsedEvent* e) {
+  char* next;
+  if (p >= end || *p != '(') return false;
+  e->channel = strtol(p + 1, &next, 10);
+  if (next == p + 1 || next >= end || *next != ',') return false;
+  p = next + 1;
+  e->time = strtoul(p, &next, 10);
+  if (next == p || next >= end) return false;
+  e->micro = (*next == 'u');
+  if (e->micro) next++;
+  if (next >= end || *next != ',') return false;
+  p = next + 1;
+  e->state = strtol(p, &next, 10);
+  if (next == p || next >= end || *next != ')') return false;
+  return true;
+}
+
+// Decode one BINARY_EVENT_SIZE-byte binary event; its time is always in us
+static inline void binaryEvent(const uint8_t* p, ParsedEvent* e) {
+  e->channel = p[0] & 0x7F;
+  e->state = p[0] >> 7;
+  e->time = readLE(p + 1, 4);
+  e->micro = true;
+}
+
+#endif
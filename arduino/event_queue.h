@@ -0,0 +1,90 @@
+// Time-sorted event queue used by arduino.ino. It has no Arduino dependencies, so
+// host/test_event_queue.cpp can compile, test and benchmark it with gcc on Linux.
+#ifndef EVENT_QUEUE_H
+#define EVENT_QUEUE_H
+
+#include <stdint.h>
+
+#ifndef EVENT_QUEUE_CAPACITY
+#define EVENT_QUEUE_CAPACITY 20  // maxEvents in arduino.ino
+#endif
+
+struct QueuedEvent {
+  uint32_t time;  // micros() at which the event fires
+  uint8_t channel;
+  uint8_t state;
+};
+
+// events[head .. head + count) are sorted by time; popping only advances head
+struct EventQueue {
+  QueuedEvent events[EVENT_QUEUE_CAPACITY];
+  uint8_t head;
+  uint8_t count;
+};
+
+// Wrap-safe "a is earlier than b" for times less than 2^31 us apart
+static inline bool eqBefore(uint32_t a, uint32_t b) {
+  return (int32_t)(a - b) < 0;
+}
+
+static inline void eqClear(EventQueue* q) {
+  q->head = 0;
+  q->count = 0;
+}
+
+static inline bool eqEmpty(const EventQueue* q) {
+  return q->count == 0;
+}
+
+static inline uint32_t eqNextTime(const EventQueue* q) {
+  return q->events[q->head].time;
+}
+
+// Insert in time order; events with equal times keep their arrival order. Events
+// usually arrive sorted, so the scan from the back stops after one comparison.
+static inline bool eqPush(EventQueue* q, uint32_t time, uint8_t channel, uint8_t state) {
+  if (q->count >= EVENT_QUEUE_CAPACITY) return false;
+  if (q->head + q->count == EVENT_QUEUE_CAPACITY) {
+    for (uint8_t i = 0; i < q->count; ++i) q->events[i] = q->events[q->head + i];
+    q->head = 0;
+  }
+  uint8_t i = q->head + q->count;
+  while (i > q->head && eqBefore(time, q->events[i - 1].time)) {
+    q->events[i] = q->events[i - 1];
+    --i;
+  }
+  q->events[i].time = time;
+  q->events[i].channel = channel;
+  q->events[i].state = state;
+  q->count++;
+  return true;
+}
+
+// If the earliest events are due by `now`, pop all events sharing that time and
+// merge them into channel masks (bit n = channel n) to drive high and low; on
+// the same channel the later event wins. Returns the number of events popped.
+static inline uint8_t eqPopDue(EventQueue* q, uint32_t now, uint8_t* high, uint8_t* low) {
+  *high = 0;
+  *low = 0;
+  if (q->count == 0 || eqBefore(now, eqNextTime(q))) return 0;
+  uint32_t time = eqNextTime(q);
+  uint8_t popped = 0;
+  while (q->count && q->events[q->head].time == time) {
+    const QueuedEvent* e = &q->events[q->head];
+    uint8_t bit = 1 << e->channel;
+    if (e->state) {
+      *high |= bit;
+      *low &= ~bit;
+    } else {
+      *low |= bit;
+      *high &= ~bit;
+    }
+    q->head++;
+    q->count--;
+    popped++;
+  }
+  if (q->count == 0) q->head = 0;
+  return popped;
+}
+
+#endif
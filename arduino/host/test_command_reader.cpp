@@ -0,0 +1,277 @@
+// Host tests and benchmark of the sketch's incremental command reader (../command_reader.h).
+//
+//   make -C arduino/host test
+//   make -C arduino/host bench   # ns per event: text "(ch,time,state);" vs binary records
+#include <stdio.h>
+#include <string.h>
+#include <time.h>
+
+#include "../command_reader.h"
+#include "../event_queue.h"
+
+static int failures = 0;
+
+#define CHECK(cond)                                                  \
+  do {                                                               \
+    if (!(cond)) {                                                   \
+      printf("FAIL %s:%d: %s\n", __FILE__, __LINE__, #cond);         \
+      failures++;                                                    \
+    }                                                                \
+  } while (0)
+
+// Feed `bytes` in chunks of `chunk`; returns the number of complete commands, the last in r
+static int feed(CommandReader* r, const char* bytes, size_t chunk, uint8_t* fired = NULL) {
+  int commands = 0;
+  uint8_t slot = 0xFF;
+  size_t n = strlen(bytes);
+  for (size_t start = 0; start < n; start += chunk) {
+    for (size_t i = start; i < start + chunk && i < n; ++i) {
+      uint8_t result = crFeed(r, bytes[i], 0, &slot);
+      if (result == CR_COMMAND) commands++;
+      if (result == CR_FIRE && fired) *fired = slot;
+    }
+  }
+  return commands;
+}
+
+static void testFragmentedFrames() {
+  const char* frame = "<#12|(1,10,1);(1,15,0);(2,1500u,1);23>";
+  for (size_t chunk = 1; chunk <= strlen(frame); ++chunk) {
+    CommandReader r;
+    crReset(&r);
+    CHECK(feed(&r, frame, chunk) == 1);
+    CHECK(strcmp(r.buffer, "#12|(1,10,1);(1,15,0);(2,1500u,1);23") == 0);
+    CHECK(r.len == strlen(r.buffer));
+  }
+}
+
+static void testFireAndGarbage() {
+  CommandReader r;
+  uint8_t fired = 0xFF;
+  crReset(&r);
+  CHECK(feed(&r, "xx!3yy", 1, &fired) == 0 && fired == 3);
+  fired = 0xFF;
+  // "!" whose digit was lost: the '<' still starts a frame
+  CHECK(feed(&r, "!<STOP;5>", 2, &fired) == 1 && fired == 0xFF);
+  CHECK(strcmp(r.buffer, "STOP;5") == 0);
+  // A frame that lost its '>' is dropped when the next one starts
+  CHECK(feed(&r, "<(1,5,<PING;1>", 3) == 1);
+  CHECK(strcmp(r.buffer, "PING;1") == 0);
+}
+
+static void testOverflowAndTimeout() {
+  CommandReader r;
+  uint8_t slot;
+  crReset(&r);
+  crFeed(&r, '<', 0, &slot);
+  for (int i = 0; i < 2 * COMMAND_BUFFER_SIZE; ++i) crFeed(&r, '(', 0, &slot);
+  CHECK(crFeed(&r, '>', 0, &slot) == CR_COMMAND);
+  CHECK(r.len == COMMAND_BUFFER_SIZE - 1 && strlen(r.buffer) == r.len);
+
+  crReset(&r);
+  crFeed(&r, '<', 100, &slot);
+  crFeed(&r, 'S', 200, &slot);
+  CHECK(!crExpired(&r, 200 + 999999, 1000000));
+  CHECK(crExpired(&r, 200 + 1000000, 1000000));
+  CHECK(strcmp(r.buffer, "S") == 0);
+  CHECK(!crExpired(&r, 200 + 2000000, 1000000));  // Only once
+  CHECK(!crExpired(&r, 0xFFFFFFFFUL, 1000000));  // Nothing in progress
+}
+
+static bool parses(const char* token, ParsedEvent* e) {
+  return parseEvent(token, token + strlen(token), e);
+}
+
+static void testParseEvent() {
+  ParsedEvent e;
+  CHECK(parses("(3,1500u,1)", &e) && e.channel == 3 && e.time == 1500 && e.micro && e.state == 1);
+  CHECK(parses("(0,5,0)", &e) && e.channel == 0 && e.time == 5 && !e.micro && e.state == 0);
+  CHECK(!parses("(3,,1)", &e));
+  CHECK(!parses("3,5,1)", &e));
+  CHECK(!parses("(3,5u1)", &e));
+  CHECK(!parses("(3,5,1", &e));
+  CHECK(!parses("(a,5,1)", &e));
+  CHECK(!parses("(1,5,)", &e));
+  // Fields are only read up to `end`, never past it
+  const char* token = "(1,5,1);(2,6,0)";
+  CHECK(parseEvent(token, token + 7, &e) && e.channel == 1);
+  CHECK(!parseEvent(token, token + 5, &e));
+}
+
+// protocol.binary_frame_command("+@123456;(1,10,1);(2,1500u,0);", seq=12) on the host
+static const uint8_t binaryFrame[] = {0xA5, 0x11, 0x0C, 0x00, 0x03, 0x40, 0xE2, 0x01, 0x00, 0x81, 0x10,
+                                      0x27, 0x00, 0x00, 0x02, 0xDC, 0x05, 0x00, 0x00, 0x2C, 0x71};
+
+static uint8_t feedBytes(CommandReader* r, const uint8_t* bytes, size_t n) {
+  uint8_t result = CR_NONE, slot;
+  for (size_t i = 0; i < n; ++i) {
+    uint8_t fed = crFeed(r, bytes[i], 0, &slot);
+    if (fed != CR_NONE) result = fed;
+  }
+  return result;
+}
+
+static void testBinaryFrames() {
+  CommandReader r;
+  crReset(&r);
+  // Garbage before the sync byte is skipped, like before a '<'
+  const uint8_t noise[] = {'x', '>', 0x00};
+  CHECK(feedBytes(&r, noise, sizeof(noise)) == CR_NONE);
+  CHECK(feedBytes(&r, binaryFrame, sizeof(binaryFrame)) == CR_BINARY);
+  CHECK(crBinaryOk(&r) && r.binLen == 0x11);
+  const uint8_t* payload = (const uint8_t*)r.buffer;
+  CHECK(readLE(payload, 2) == 12 && payload[2] == (BIN_APPEND | BIN_ORIGIN));
+  CHECK(readLE(payload + 3, 4) == 123456);
+  ParsedEvent e;
+  binaryEvent(payload + 7, &e);
+  CHECK(e.channel == 1 && e.state == 1 && e.time == 10000 && e.micro);
+  binaryEvent(payload + 7 + BINARY_EVENT_SIZE, &e);
+  CHECK(e.channel == 2 && e.state == 0 && e.time == 1500);
+
+  // A text command right after a binary frame is read normally
+  CHECK(feed(&r, "<STOP;5>", 1) == 1 && strcmp(r.buffer, "STOP;5") == 0);
+
+  // Every flipped bit is caught by the CRC-16
+  for (size_t i = 2; i < sizeof(binaryFrame); ++i) {
+    for (int bit = 0; bit < 8; ++bit) {
+      uint8_t corrupt[sizeof(binaryFrame)];
+      memcpy(corrupt, binaryFrame, sizeof(corrupt));
+      corrupt[i] ^= 1 << bit;
+      crReset(&r);
+      CHECK(feedBytes(&r, corrupt, sizeof(corrupt)) == CR_BINARY && !crBinaryOk(&r));
+    }
+  }
+
+  // Payload bytes that look like '<', '>' or the sync byte don't end or restart the frame
+  uint8_t frame[4 + 3 + BINARY_EVENT_SIZE] = {BINARY_SYNC, 3 + BINARY_EVENT_SIZE, '<', '>', 0, BINARY_SYNC,
+                                              '>', 0, 0, 0};
+  uint16_t crc = 0xFFFF;
+  for (size_t i = 1; i < sizeof(frame) - 2; ++i) crc = crc16Update(crc, frame[i]);
+  frame[sizeof(frame) - 2] = crc >> 8;
+  frame[sizeof(frame) - 1] = crc & 0xFF;
+  crReset(&r);
+  CHECK(feedBytes(&r, frame, sizeof(frame)) == CR_BINARY && crBinaryOk(&r));
+
+  // A frame that lost bytes is handed over as incomplete after the timeout
+  uint8_t slot;
+  crReset(&r);
+  for (size_t i = 0; i < 10; ++i) crFeed(&r, binaryFrame[i], 100, &slot);
+  CHECK(crExpired(&r, 100 + 1000000, 1000000) == CR_BINARY && !crBinaryOk(&r));
+  CHECK(crExpired(&r, 100 + 2000000, 1000000) == CR_NONE);
+}
+
+// A 500-byte frame arrives at 115200 baud (~87 us per byte) while events are due. Each
+// simulated loop() pass consumes only the bytes that have arrived, so events are
+// serviced between bytes instead of after the whole frame.
+static void testReceptionDoesNotStallEvents() {
+  const uint32_t byteUs = 87;
+  CommandReader r;
+  EventQueue q;
+  crReset(&r);
+  eqClear(&q);
+  for (int i = 0; i < EVENT_QUEUE_CAPACITY; ++i) eqPush(&q, 1000 + 2000 * i, i % 6, i % 2);
+
+  char frame[501];
+  memset(frame, 'x', sizeof(frame) - 1);
+  frame[0] = '<';
+  frame[sizeof(frame) - 2] = '>';
+  frame[sizeof(frame) - 1] = '\0';
+
+  uint32_t worstLateness = 0;
+  size_t received = 0;
+  int commands = 0;
+  for (uint32_t now = 0; received < strlen(frame) || !eqEmpty(&q); now += 10) {
+    uint8_t high, low, slot;
+    uint32_t due = eqEmpty(&q) ? 0 : eqNextTime(&q);
+    if (eqPopDue(&q, now, &high, &low) && now - due > worstLateness) worstLateness = now - due;
+    while (received < strlen(frame) && received * byteUs <= now) {
+      if (crFeed(&r, frame[received++], now, &slot) == CR_COMMAND) commands++;
+    }
+  }
+  CHECK(commands == 1);
+  CHECK(worstLateness < 10);  // One simulated loop pass, not the ~43 ms the frame takes
+}
+
+static double nowNs() {
+  struct timespec ts;
+  clock_gettime(CLOCK_MONOTONIC, &ts);
+  return ts.tv_sec * 1e9 + ts.tv_nsec;
+}
+
+static volatile unsigned long sink;
+
+// Receive and decode 20 events per frame both ways: reader + CRC + field parsing per event
+static void bench() {
+  const int events = 20, rounds = 100000;
+  char text[512] = "";
+  for (int i = 0; i < events; ++i) sprintf(text + strlen(text), "(%d,%du,%d);", i % 6, 5000 + 2000 * i, i % 2);
+  char xorCrc = 0;
+  for (const char* c = text; *c; ++c) xorCrc ^= *c;
+  char textFrame[600];
+  sprintf(textFrame, "<%s%d>", text, xorCrc);
+
+  uint8_t binary[2 + 3 + events * BINARY_EVENT_SIZE + 2] = {BINARY_SYNC, 3 + events * BINARY_EVENT_SIZE, 0xFF,
+                                                             0xFF, 0};
+  for (int i = 0; i < events; ++i) {
+    uint8_t* p = binary + 5 + i * BINARY_EVENT_SIZE;
+    uint32_t delay = 5000 + 2000 * i;
+    p[0] = (i % 6) | ((i % 2) << 7);
+    for (int b = 0; b < 4; ++b) p[1 + b] = delay >> (8 * b);
+  }
+  uint16_t crc = 0xFFFF;
+  for (size_t i = 1; i < sizeof(binary) - 2; ++i) crc = crc16Update(crc, binary[i]);
+  binary[sizeof(binary) - 2] = crc >> 8;
+  binary[sizeof(binary) - 1] = crc & 0xFF;
+
+  CommandReader r;
+  ParsedEvent e;
+  uint8_t slot;
+  crReset(&r);
+  double start = nowNs();
+  for (int round = 0; round < rounds; ++round) {
+    for (const char* c = textFrame; *c; ++c) crFeed(&r, *c, 0, &slot);
+    char calc = 0;
+    char* lastSemi = strrchr(r.buffer, ';');
+    for (char* c = r.buffer; c <= lastSemi; ++c) calc ^= *c;
+    sink = calc == atoi(lastSemi + 1);
+    for (char* token = r.buffer; token <= lastSemi;) {
+      char* semi = strchr(token, ';');
+      if (parseEvent(token, semi, &e)) sink += e.time;
+      token = semi + 1;
+    }
+  }
+  double textNs = (nowNs() - start) / rounds / events;
+
+  start = nowNs();
+  for (int round = 0; round < rounds; ++round) {
+    for (size_t i = 0; i < sizeof(binary); ++i) crFeed(&r, binary[i], 0, &slot);
+    sink = crBinaryOk(&r);
+    for (const uint8_t* p = (const uint8_t*)r.buffer + 3; p < (const uint8_t*)r.buffer + r.binLen;
+         p += BINARY_EVENT_SIZE) {
+      binaryEvent(p, &e);
+      sink += e.time;
+    }
+  }
+  double binaryNs = (nowNs() - start) / rounds / events;
+
+  printf("%d events per frame   %12s %12s\n", events, "text", "binary");
+  printf("bytes per event       %12.1f %12.1f\n", (double)strlen(textFrame) / events, (double)sizeof(binary) / events);
+  printf("wire us per event     %12.1f %12.1f   (115200 baud, 8N1)\n", strlen(textFrame) * 86.8 / events,
+         sizeof(binary) * 86.8 / events);
+  printf("ns per event (host)   %12.1f %12.1f\n", textNs, binaryNs);
+}
+
+int main(int argc, char** argv) {
+  if (argc > 1 && strcmp(argv[1], "bench") == 0) {
+    bench();
+    return 0;
+  }
+  testFragmentedFrames();
+  testFireAndGarbage();
+  testOverflowAndTimeout();
+  testParseEvent();
+  testBinaryFrames();
+  testReceptionDoesNotStallEvents();
+  printf(failures ? "%d check(s) failed\n" : "all command reader tests passed\n", failures);
+  return failures ? 1 : 0;
+}
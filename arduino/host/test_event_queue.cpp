@@ -0,0 +1,142 @@
+// Host tests and benchmark of the sketch's event queue (../event_queue.h).
+//
+//   make -C arduino/host test    # ordering, merging, wrap-around, capacity
+//   make -C arduino/host bench   # ns per push/pop and worst-case element moves
+#include <stdio.h>
+#include <stdlib.h>
+#include <string.h>
+#include <time.h>
+
+#include "../event_queue.h"
+
+static int failures = 0;
+
+#define CHECK(cond)                                                  \
+  do {                                                               \
+    if (!(cond)) {                                                   \
+      printf("FAIL %s:%d: %s\n", __FILE__, __LINE__, #cond);         \
+      failures++;                                                    \
+    }                                                                \
+  } while (0)
+
+static void testSortedPops() {
+  EventQueue q;
+  srand(1);
+  for (int round = 0; round < 1000; ++round) {
+    eqClear(&q);
+    int n = 1 + rand() % EVENT_QUEUE_CAPACITY;
+    for (int i = 0; i < n; ++i) CHECK(eqPush(&q, 1000 + rand() % 50, rand() % 6, rand() % 2));
+    uint32_t last = 0;
+    int popped = 0;
+    uint8_t high, low;
+    while (!eqEmpty(&q)) {
+      uint32_t time = eqNextTime(&q);
+      CHECK(popped == 0 || eqBefore(last, time));
+      uint8_t count = eqPopDue(&q, 2000, &high, &low);
+      CHECK(count > 0 && (high & low) == 0);
+      CHECK(eqEmpty(&q) || eqNextTime(&q) != time);
+      last = time;
+      popped += count;
+    }
+    CHECK(popped == n);
+    CHECK(eqEmpty(&q));
+  }
+}
+
+static void testMergeAndArrivalOrder() {
+  EventQueue q;
+  uint8_t high, low;
+  eqClear(&q);
+  eqPush(&q, 100, 3, 1);  // SyncPulseAndEdge: pulse up and edge down at the same time
+  eqPush(&q, 100, 4, 0);
+  eqPush(&q, 100, 1, 1);
+  eqPush(&q, 100, 1, 0);  // Same channel and time: the later event wins
+  eqPush(&q, 102, 3, 0);
+  CHECK(eqPopDue(&q, 99, &high, &low) == 0);
+  CHECK(eqPopDue(&q, 100, &high, &low) == 4);
+  CHECK(high == (1 << 3));
+  CHECK(low == ((1 << 4) | (1 << 1)));
+  CHECK(eqPopDue(&q, 101, &high, &low) == 0);
+  CHECK(eqPopDue(&q, 105, &high, &low) == 1);
+  CHECK(low == (1 << 3) && high == 0);
+}
+
+static void testWrapAround() {
+  EventQueue q;
+  uint8_t high, low;
+  eqClear(&q);
+  eqPush(&q, 0x00000010UL, 2, 1);  // After micros() wrapped
+  eqPush(&q, 0xFFFFFFF0UL, 1, 1);  // Before
+  CHECK(eqNextTime(&q) == 0xFFFFFFF0UL);
+  CHECK(eqPopDue(&q, 0xFFFFFFF8UL, &high, &low) == 1 && high == (1 << 1));
+  CHECK(eqPopDue(&q, 0xFFFFFFFCUL, &high, &low) == 0);
+  CHECK(eqPopDue(&q, 0x00000020UL, &high, &low) == 1 && high == (1 << 2));
+}
+
+static void testCapacity() {
+  EventQueue q;
+  uint8_t high, low;
+  eqClear(&q);
+  for (int i = 0; i < EVENT_QUEUE_CAPACITY; ++i) CHECK(eqPush(&q, 10 * i, 0, i % 2));
+  CHECK(!eqPush(&q, 5, 0, 1));
+  // Popping frees room at the front; the next push compacts the queue
+  CHECK(eqPopDue(&q, 15, &high, &low) == 1);
+  CHECK(eqPopDue(&q, 15, &high, &low) == 1);
+  CHECK(eqPush(&q, 12, 5, 1));
+  CHECK(q.head == 0 && q.count == EVENT_QUEUE_CAPACITY - 1);
+  CHECK(eqNextTime(&q) == 12);
+}
+
+static double nowNs() {
+  struct timespec ts;
+  clock_gettime(CLOCK_MONOTONIC, &ts);
+  return ts.tv_sec * 1e9 + ts.tv_nsec;
+}
+
+static volatile uint8_t sink;
+
+// Fill the queue with times from `next(i)`, then pop it empty; ns per push and per pop group
+static void benchFill(const char* name, uint32_t (*next)(int)) {
+  const int rounds = 200000;
+  EventQueue q;
+  uint8_t high, low;
+  double pushNs = 0, popNs = 0;
+  long groups = 0;
+  for (int round = 0; round < rounds; ++round) {
+    eqClear(&q);
+    double start = nowNs();
+    for (int i = 0; i < EVENT_QUEUE_CAPACITY; ++i) eqPush(&q, next(i), i % 6, i % 2);
+    double pushed = nowNs();
+    while (eqPopDue(&q, 0x7FFFFFFF, &high, &low)) {
+      sink = high ^ low;
+      groups++;
+    }
+    popNs += nowNs() - pushed;
+    pushNs += pushed - start;
+  }
+  printf("%-14s %8.1f ns/push %8.1f ns/pop-group\n", name, pushNs / rounds / EVENT_QUEUE_CAPACITY,
+         popNs / groups);
+}
+
+static uint32_t sortedTimes(int i) { return 1000 + 10 * i; }
+static uint32_t reversedTimes(int i) { return 1000 - 10 * i; }
+static uint32_t sameTimes(int) { return 1000; }
+static uint32_t randomTimes(int) { return 1000 + (uint32_t)(rand() % 1000); }
+
+int main(int argc, char** argv) {
+  if (argc > 1 && strcmp(argv[1], "bench") == 0) {
+    printf("capacity %d, worst-case element moves per push %d\n", EVENT_QUEUE_CAPACITY,
+           EVENT_QUEUE_CAPACITY - 1);
+    benchFill("sorted", sortedTimes);
+    benchFill("reversed", reversedTimes);
+    benchFill("simultaneous", sameTimes);
+    benchFill("random", randomTimes);
+    return 0;
+  }
+  testSortedPops();
+  testMergeAndArrivalOrder();
+  testWrapAround();
+  testCapacity();
+  printf(failures ? "%d check(s) failed\n" : "all event queue tests passed\n", failures);
+  return failures ? 1 : 0;
+}
@@ -0,0 +1,97 @@
+// Host tests of the sketch's slot pool (../slot_pool.h).
+//
+//   make -C arduino/host test
+#include <stdio.h>
+#include <stdlib.h>
+#include <string.h>
+
+#include "../slot_pool.h"
+
+static int failures = 0;
+
+#define CHECK(cond)                                                  \
+  do {                                                               \
+    if (!(cond)) {                                                   \
+      printf("FAIL %s:%d: %s\n", __FILE__, __LINE__, #cond);         \
+      failures++;                                                    \
+    }                                                                \
+  } while (0)
+
+// Store `count` events in slot n the way a "S<n>;" command does
+static int store(SlotPool* p, uint8_t n, int count, uint32_t base) {
+  spBegin(p, n);
+  int added = 0;
+  for (int i = 0; i < count; ++i) added += spAdd(p, n, base + 10 * i, i % 6, i % 2);
+  return added;
+}
+
+// The shot the timer interrupt would load from slot n, as (time, channel, state) triples
+static int shot(const SlotPool* p, uint8_t n, uint32_t* out) {
+  EventQueue q;
+  spLoad(p, n, &q, 1000);
+  for (int i = 0; i < q.count; ++i) {
+    const QueuedEvent* e = &q.events[q.head + i];
+    out[3 * i] = e->time;
+    out[3 * i + 1] = e->channel;
+    out[3 * i + 2] = e->state;
+  }
+  return q.count;
+}
+
+static void testStoreAndLoad() {
+  SlotPool p;
+  spReset(&p);
+  CHECK(store(&p, 0, 3, 100) == 3);
+  CHECK(store(&p, 1, 2, 500) == 2);
+  uint32_t events[3 * SLOT_POOL_SLOT_EVENTS];
+  CHECK(shot(&p, 1, events) == 2);
+  CHECK(events[0] == 1500 && events[3] == 1510 && events[4] == 1 && events[5] == 1);
+  // Replacing slot 0 moves slot 1 down without changing it
+  CHECK(store(&p, 0, 1, 200) == 1);
+  CHECK(p.used == 3 && p.start[1] == 0 && p.start[0] == 2);
+  CHECK(shot(&p, 1, events) == 2 && events[0] == 1500);
+}
+
+static void testCapacity() {
+  SlotPool p;
+  spReset(&p);
+  CHECK(store(&p, 0, SLOT_POOL_SLOT_EVENTS + 1, 0) == SLOT_POOL_SLOT_EVENTS);
+  CHECK(store(&p, 1, SLOT_POOL_SLOT_EVENTS, 0) == SLOT_POOL_SLOT_EVENTS);
+  CHECK(store(&p, 2, 1, 0) == 0);  // The pool is full
+  CHECK(store(&p, 0, 5, 0) == 5);  // Replacing a slot frees its events first
+  CHECK(p.used == SLOT_POOL_SLOT_EVENTS + 5);
+}
+
+// A repeat run loads shots of slot r from the timer interrupt while loop() stores other
+// slots. The sketch runs spBegin and spAdd with interrupts disabled, so the interrupt
+// only ever sees the pool between two of these calls; there, slot r must be unchanged.
+static void testRepeatSlotUnchangedBetweenStoreSteps() {
+  const uint8_t r = 3;
+  SlotPool p;
+  uint32_t expected[3 * SLOT_POOL_SLOT_EVENTS], seen[3 * SLOT_POOL_SLOT_EVENTS];
+  srand(1);
+  for (int round = 0; round < 1000; ++round) {
+    spReset(&p);
+    for (uint8_t n = 0; n < SLOT_POOL_SLOTS; ++n) store(&p, n, rand() % 6, 100 * n);
+    store(&p, r, 1 + rand() % 5, 7000);
+    int count = shot(&p, r, expected);
+    for (int step = 0; step < 20; ++step) {
+      uint8_t n = rand() % SLOT_POOL_SLOTS;
+      if (n == r) continue;  // Refused by beginSlot while r repeats
+      spBegin(&p, n);
+      CHECK(shot(&p, r, seen) == count && memcmp(seen, expected, 3 * count * sizeof(uint32_t)) == 0);
+      for (int i = rand() % 8; i > 0; --i) {
+        spAdd(&p, n, rand() % 1000, rand() % 6, rand() % 2);
+        CHECK(shot(&p, r, seen) == count && memcmp(seen, expected, 3 * count * sizeof(uint32_t)) == 0);
+      }
+    }
+  }
+}
+
+int main() {
+  testStoreAndLoad();
+  testCapacity();
+  testRepeatSlotUnchangedBetweenStoreSteps();
+  printf(failures ? "%d check(s) failed\n" : "all slot pool tests passed\n", failures);
+  return failures ? 1 : 0;
+}
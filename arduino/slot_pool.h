@@ -0,0 +1,74 @@
+// Preloaded sequences ("slots") used by arduino.ino. It has no Arduino dependencies, so
+// host/test_slot_pool.cpp can test it with gcc on Linux.
+//
+// Slot n holds count[n] events from events[start[n]]; the events of all slots share
+// one pool. The timer interrupt loads repeat shots from the pool, so the sketch
+// calls every function that changes it with interrupts disabled.
+#ifndef SLOT_POOL_H
+#define SLOT_POOL_H
+
+#include <stdint.h>
+#include <string.h>
+
+#include "event_queue.h"
+
+#ifndef SLOT_POOL_SLOTS
+#define SLOT_POOL_SLOTS 8  // numSlots in arduino.ino
+#endif
+#ifndef SLOT_POOL_SLOT_EVENTS
+#define SLOT_POOL_SLOT_EVENTS 20  // maxEvents in arduino.ino
+#endif
+#define SLOT_POOL_SIZE (2 * SLOT_POOL_SLOT_EVENTS)
+
+struct SlotEvent {
+  uint32_t delay;  // in micros, relative to the fire command
+  uint8_t channel;
+  uint8_t state;
+};
+
+struct SlotPool {
+  SlotEvent events[SLOT_POOL_SIZE];
+  uint8_t start[SLOT_POOL_SLOTS];
+  uint8_t count[SLOT_POOL_SLOTS];
+  int used;
+};
+
+static inline void spReset(SlotPool* p) {
+  memset(p->count, 0, sizeof(p->count));
+  p->used = 0;
+}
+
+// Empty slot n and make it the one that the next spAdd calls fill, closing the gap in the pool
+static inline void spBegin(SlotPool* p, uint8_t n) {
+  int start = p->start[n], count = p->count[n];
+  if (count) {
+    memmove(&p->events[start], &p->events[start + count], (p->used - start - count) * sizeof(SlotEvent));
+    p->used -= count;
+    for (uint8_t i = 0; i < SLOT_POOL_SLOTS; ++i) {
+      if (p->count[i] && p->start[i] > start) p->start[i] -= count;
+    }
+    p->count[n] = 0;
+  }
+  p->start[n] = p->used;
+}
+
+// Append an event to slot n, the slot last passed to spBegin; false if it or the pool is full
+static inline bool spAdd(SlotPool* p, uint8_t n, uint32_t delay, uint8_t channel, uint8_t state) {
+  if (p->count[n] >= SLOT_POOL_SLOT_EVENTS || p->used >= SLOT_POOL_SIZE) return false;
+  SlotEvent* e = &p->events[p->used++];
+  e->delay = delay;
+  e->channel = channel;
+  e->state = state;
+  p->count[n]++;
+  return true;
+}
+
+// Replace the queue's events with slot n's, timed from origin
+static inline void spLoad(const SlotPool* p, uint8_t n, EventQueue* q, uint32_t origin) {
+  eqClear(q);
+  for (int i = p->start[n]; i < p->start[n] + p->count[n]; ++i) {
+    eqPush(q, origin + p->events[i].delay, p->events[i].channel, p->events[i].state);
+  }
+}
+
+#endif
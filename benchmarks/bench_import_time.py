@@ -0,0 +1,58 @@
+"""Cold-start cost of the headless import path.
+
+Imports `trigger` and `trigger_events` in fresh interpreters, reports the median
+import time, and checks that none of the heavy optional stacks (Qt, arduino-cli,
+pyleco, numpy) were loaded along the way:
+
+    python benchmarks/bench_import_time.py -n 10 --max-ms 150
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+SRC = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src")
+HEAVY_MODULES = ("qtpy", "PyQt5", "PyQt6", "PySide2", "PySide6", "pyduinocli", "pyleco", "pyqtgraph", "numpy")
+
+PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+heavy = sorted(m for m in {heavy!r} if m in sys.modules)
+print(json.dumps({{"ms": elapsed * 1e3, "heavy": heavy}}))
+"""
+
+
+def measure(module, runs):
+    times, heavy = [], set()
+    for _ in range(runs):
+        output = subprocess.run([sys.executable, "-c", PROBE.format(module=module, heavy=HEAVY_MODULES)],
+                                cwd=SRC, capture_output=True, text=True, check=True).stdout
+        result = json.loads(output)
+        times.append(result["ms"])
+        heavy.update(result["heavy"])
+    return statistics.median(times), max(times), sorted(heavy)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("-n", "--runs", type=int, default=10)
+    parser.add_argument("--max-ms", type=float, default=None,
+                        help="exit non-zero if a median import time exceeds this")
+    args = parser.parse_args(argv)
+
+    failed = False
+    print(f"{'module':<16}{'median ms':>10}{'max ms':>10}  heavy modules loaded")
+    for module in ("trigger_events", "trigger"):
+        median, worst, heavy = measure(module, args.runs)
+        print(f"{module:<16}{median:>10.1f}{worst:>10.1f}  {', '.join(heavy) or '-'}")
+        if heavy or (args.max_ms is not None and median > args.max_ms):
+            failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
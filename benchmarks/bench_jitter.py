@@ -0,0 +1,67 @@
+"""Achieved timing jitter of µs-resolution events, measured with the emulator.
+
+Sends microsecond pulse trains through ArduinoTrigger and reports how late each
+edge fired relative to its scheduled device time, and the error of the resulting
+pulse widths. The emulator runs the sketch's scheduling on the host, so this
+checks the protocol and scheduling logic end to end; the AVR's own loop jitter
+needs a logic analyzer on the output pins.
+
+    python benchmarks/bench_jitter.py --pulses 10 --period-us 500 --width-us 200 -n 20
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from arduino_emulator import ArduinoEmulator
+from trigger import ArduinoTrigger
+from trigger_events import PulseTrain
+
+
+def summarize(name, samples_us):
+    ordered = sorted(samples_us)
+    p = lambda q: ordered[min(int(round(q / 100.0 * (len(ordered) - 1))), len(ordered) - 1)]
+    print(f"{name:<16}{len(ordered):>7}{p(50):>10.1f}{p(99):>10.1f}{max(ordered):>10.1f}"
+          f"{statistics.pstdev(ordered):>10.1f}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("-n", "--iterations", type=int, default=20)
+    parser.add_argument("--pulses", type=int, default=10, help="pulses per command (max 10 fit the buffer)")
+    parser.add_argument("--period-us", type=int, default=500)
+    parser.add_argument("--width-us", type=int, default=200)
+    parser.add_argument("--delay-us", type=int, default=2000)
+    args = parser.parse_args(argv)
+
+    lateness = []
+    width_error = []
+    with ArduinoEmulator(debug=False) as emulator:
+        device_info = {"port": emulator.port, "serial_number": "emulator", "pins": {}}
+        trigger = ArduinoTrigger(device_info, publisher_name=None, proxy_address=None, proxy_port=None)
+        train = PulseTrain.from_spec(0, args.period_us, args.pulses, args.width_us,
+                                     delay=args.delay_us, unit="us")
+        duration = (args.delay_us + args.period_us * args.pulses) / 1e6
+        try:
+            for _ in range(args.iterations):
+                emulator.fired.clear()
+                trigger.write_to_device(train.command)
+                time.sleep(duration + 0.01)
+                fired = sorted(emulator.fired)
+                lateness.extend((f - s) & 0xFFFFFFFF for s, f, _, _ in fired)
+                for rise, fall in zip(fired[0::2], fired[1::2]):
+                    width_error.append(((fall[1] - rise[1]) & 0xFFFFFFFF) - args.width_us)
+        finally:
+            trigger.arduino.close()
+
+    print(f"{'metric (us)':<16}{'n':>7}{'p50':>10}{'p99':>10}{'max':>10}{'stdev':>10}")
+    summarize("edge lateness", lateness)
+    summarize("width error", width_error)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
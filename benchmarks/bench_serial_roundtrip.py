@@ -0,0 +1,135 @@
+"""Serial round-trip benchmarks for ArduinoTrigger against the pty emulator.
+
+Measures commands/sec and p50/p99 latency of `ArduinoTrigger.write_to_device` for
+single pulses, SyncPulseAndEdge, a 10-pulse PulseSequence (a full event buffer)
+and the same sequence preloaded in a device slot (fired with "F0;") without
+hardware. Sequences longer than the buffer are timed separately through
+`streamSequence`, with their underruns:
+
+    python benchmarks/bench_serial_roundtrip.py -n 200
+    python benchmarks/bench_serial_roundtrip.py -n 200 --pipelined
+    python benchmarks/bench_serial_roundtrip.py --max-p99-ms 30   # fail on regression
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from arduino_emulator import ArduinoEmulator
+from protocol import is_error_response
+from trigger import ArduinoTrigger
+from trigger_events import Pulse, PulseSequence, SyncPulseAndEdge
+
+
+def percentile(samples, q):
+    ordered = sorted(samples)
+    index = min(int(round(q / 100.0 * (len(ordered) - 1))), len(ordered) - 1)
+    return ordered[index]
+
+
+def make_cases():
+    return {
+        "pulse": Pulse(pin=0, delay=5, width=1).command,
+        "sync_pulse_and_edge": SyncPulseAndEdge(pulse_pin=0, pulse_width=1, edge_pin=1,
+                                                edge_type="rising", delay=5).command,
+        "pulse_sequence_10": PulseSequence([Pulse(pin=i % 6, delay=5 + 2 * i, width=1)
+                                            for i in range(10)]).command,
+        # Stored with storeSlot(0, ...) first, so only the fire command crosses the wire
+        "fire_slot_10": "F0;",
+    }
+
+
+def make_stream_cases():
+    """Sequences over the firmware's MAX_EVENTS, which it only takes through streamSequence."""
+    return {
+        "stream_pulses_20": PulseSequence([Pulse(pin=i % 6, delay=5 + 2 * i, width=1)
+                                           for i in range(20)]).command,
+    }
+
+
+def run_stream(trigger, sequence, iterations):
+    """Play `sequence` to the end `iterations` times; returns wall times and the summed report."""
+    durations, underruns, errors = [], 0, 0
+    for _ in range(iterations):
+        t0 = time.perf_counter()
+        report = trigger.streamSequence(sequence, blocking=True)
+        durations.append(time.perf_counter() - t0)
+        underruns += report['underruns']
+        errors += len(report['errors']) + (not report['completed'])
+    return durations, underruns, errors
+
+
+def run_burst(trigger, command, iterations):
+    """Submit all commands at once and wait for every reply (pipelined throughput)."""
+    start = time.perf_counter()
+    futures = [trigger.submit(command) for _ in range(iterations)]
+    for future in futures:
+        future.result()
+    return iterations / (time.perf_counter() - start)
+
+
+def run_case(trigger, command, iterations):
+    latencies = []
+    start = time.perf_counter()
+    for _ in range(iterations):
+        t0 = time.perf_counter()
+        trigger.write_to_device(command)
+        latencies.append(time.perf_counter() - t0)
+    elapsed = time.perf_counter() - start
+    return iterations / elapsed, latencies
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("-n", "--iterations", type=int, default=100)
+    parser.add_argument("--no-debug", action="store_true", help="emulate firmware built with DEBUG=0")
+    parser.add_argument("--baudrate", type=int, default=115200, help="0 disables wire-time emulation")
+    parser.add_argument("--pipelined", action="store_true", help="use the sequence-numbered command pipeline")
+    parser.add_argument("--max-p99-ms", type=float, default=None,
+                        help="exit non-zero if any case exceeds this p99 latency")
+    args = parser.parse_args(argv)
+
+    failed = False
+    with ArduinoEmulator(debug=not args.no_debug, baudrate=args.baudrate or None) as emulator:
+        device_info = {"port": emulator.port, "serial_number": "emulator", "pins": {}}
+        trigger = ArduinoTrigger(device_info, publisher_name=None, proxy_address=None, proxy_port=None,
+                                 pipelined=args.pipelined)
+        try:
+            print(f"{'case':<22}{'bytes':>7}{'cmd/s':>10}{'p50 ms':>10}{'p99 ms':>10}{'burst/s':>10}")
+            cases = make_cases()
+            trigger.storeSlot(0, cases["pulse_sequence_10"])
+            for name, command in cases.items():
+                trigger.write_to_device("STOP;")
+                response = trigger.write_to_device(command)
+                if is_error_response(response):
+                    # Timing an error reply would look like a (fast) valid case
+                    raise RuntimeError(f"The firmware rejects case {name}: {response}")
+                rate, latencies = run_case(trigger, command, args.iterations)
+                p50 = percentile(latencies, 50) * 1e3
+                p99 = percentile(latencies, 99) * 1e3
+                burst = run_burst(trigger, command, args.iterations)
+                print(f"{name:<22}{len(command):>7}{rate:>10.1f}{p50:>10.2f}{p99:>10.2f}{burst:>10.1f}")
+                if args.max_p99_ms is not None and p99 > args.max_p99_ms:
+                    failed = True
+
+            # Not comparable with the table above: a run lasts as long as the sequence plays
+            print(f"\n{'streamed case':<22}{'events':>7}{'runs':>6}{'p50 ms':>10}{'p99 ms':>10}"
+                  f"{'underruns':>11}{'errors':>8}")
+            for name, sequence in make_stream_cases().items():
+                trigger.write_to_device("STOP;")
+                runs = max(args.iterations // 10, 1)
+                durations, underruns, errors = run_stream(trigger, sequence, runs)
+                print(f"{name:<22}{sequence.count(';'):>7}{runs:>6}{percentile(durations, 50) * 1e3:>10.2f}"
+                      f"{percentile(durations, 99) * 1e3:>10.2f}{underruns:>11}{errors:>8}")
+                failed = failed or errors > 0
+        finally:
+            if trigger.pipeline is not None:
+                trigger.pipeline.close()
+            trigger.arduino.close()
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,94 @@
+"""Text vs binary wire format: bytes per event and command latency against the pty emulator.
+
+Sends the same event commands with `ArduinoTrigger(binary=False)` (text
+"(pin,delay,state);" frames with the XOR CRC) and with the negotiated binary
+frames (packed records, CRC-16), and reports frame bytes, bytes per event, the
+host's encode time from the command string and the p50/p99 round trip:
+
+    python benchmarks/bench_wire_format.py -n 200
+    python benchmarks/bench_wire_format.py -n 200 --no-debug
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from arduino_emulator import ArduinoEmulator
+from protocol import binary_frame_command, frame_command
+from trigger import ArduinoTrigger
+from trigger_events import EventBlock, Pulse, PulseSequence, SyncPulseAndEdge
+
+
+def percentile(samples, q):
+    ordered = sorted(samples)
+    index = min(int(round(q / 100.0 * (len(ordered) - 1))), len(ordered) - 1)
+    return ordered[index]
+
+
+def make_cases():
+    sequence = PulseSequence([Pulse(pin=i % 6, delay=5 + 2 * i, width=1) for i in range(10)])
+    return {
+        "pulse": Pulse(pin=0, delay=5, width=1).command,
+        "pulse_us": Pulse(pin=0, delay=1500, width=250, unit="us").command,
+        "sync_pulse_and_edge": SyncPulseAndEdge(pulse_pin=0, pulse_width=1, edge_pin=1,
+                                                edge_type="rising", delay=5).command,
+        "pulse_sequence_10": sequence.command,
+        "store_slot_10": f"S0;{sequence.command}",
+    }
+
+
+def encode_us(encode, command, rounds=2000):
+    start = time.perf_counter()
+    for _ in range(rounds):
+        encode(command)
+    return (time.perf_counter() - start) / rounds * 1e6
+
+
+def run_case(trigger, command, iterations):
+    latencies = []
+    for _ in range(iterations):
+        t0 = time.perf_counter()
+        trigger.write_to_device(command)
+        latencies.append(time.perf_counter() - t0)
+    return latencies
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("-n", "--iterations", type=int, default=100)
+    parser.add_argument("--no-debug", action="store_true", help="emulate firmware built with DEBUG=0")
+    parser.add_argument("--baudrate", type=int, default=115200, help="0 disables wire-time emulation")
+    args = parser.parse_args(argv)
+
+    cases = make_cases()
+    results = {}
+    with ArduinoEmulator(debug=not args.no_debug, baudrate=args.baudrate or None) as emulator:
+        for binary in (False, True):
+            device_info = {"port": emulator.port, "serial_number": "emulator", "pins": {}}
+            trigger = ArduinoTrigger(device_info, publisher_name=None, proxy_address=None, proxy_port=None,
+                                     binary=binary)
+            try:
+                if trigger.binary != binary:
+                    raise RuntimeError("The emulator did not negotiate binary frames.")
+                for name, command in cases.items():
+                    trigger.write_to_device("STOP;")
+                    results[name, binary] = run_case(trigger, command, args.iterations)
+            finally:
+                trigger.arduino.close()
+
+    print(f"{'case':<22}{'events':>7}{'format':>8}{'bytes':>7}{'B/event':>9}{'encode us':>11}"
+          f"{'p50 ms':>9}{'p99 ms':>9}")
+    for name, command in cases.items():
+        events = len(EventBlock.from_command(command.partition(";")[2] if command.startswith("S") else command))
+        for binary, label, encode in ((False, "text", frame_command), (True, "binary", binary_frame_command)):
+            size = len(encode(command))
+            latencies = results[name, binary]
+            print(f"{name:<22}{events:>7}{label:>8}{size:>7}{size / events:>9.1f}{encode_us(encode, command):>11.1f}"
+                  f"{percentile(latencies, 50) * 1e3:>9.2f}{percentile(latencies, 99) * 1e3:>9.2f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,32 +1,27 @@
 from PyQt5.QtWidgets import (
     QWidget, QVBoxLayout, QPushButton, QMessageBox, QDialog, QFormLayout,
-    QLineEdit, QDialogButtonBox, QSpinBox, QApplication, QLabel, QTextEdit
+    QLineEdit, QDialogButtonBox, QSpinBox, QApplication, QLabel, QPlainTextEdit, QComboBox
 )
-from PyQt5.QtCore import pyqtSignal, Qt, QObject
+from PyQt5.QtCore import pyqtSignal, Qt, QTimer
 import logging
 import sys
-from trigger import find_arduino_ports
-from trigger_actor import ArduinoActor
+from console_sink import ConsoleSink, ConsoleStream
+from device_registry import get_registry
+from pin_timeline import PinTimeline
+from trigger_actor import ArduinoActor, ArduinoFleetActor
 
 
 logger = logging.getLogger(__name__)
 
 
-class EmittingStream(QObject):
-    """Redirects console output to a Qt signal."""
-    text_written = pyqtSignal(str)
-
-    def write(self, text):
-        if text.strip():  # ignore empty writes
-            self.text_written.emit(text)
-
-    def flush(self):
-        pass
+# Lines kept in the console box and waiting in the sink, and the view refresh period
+CONSOLE_CAPACITY = 1000
+CONSOLE_FLUSH_MS = 100
 
 
 class ActorInitDialog(QDialog):
-    """Dialog to input parameters for ArduinoActor initialization."""
-    def __init__(self, parent=None):
+    """Dialog to input parameters for ArduinoActor initialization and pick the board(s)."""
+    def __init__(self, devices: list, parent=None):
         super().__init__(parent)
         self.setWindowTitle("Initialize ArduinoActor")
         self.setModal(True)
@@ -43,6 +38,12 @@ class ActorInitDialog(QDialog):
         self.proxy_port_input = QSpinBox()
         self.proxy_port_input.setRange(1, 65535)
         self.proxy_port_input.setValue(11100)
+        # One board by serial number, or all of them through one ArduinoFleetActor
+        self.board_input = QComboBox()
+        if len(devices) > 1:
+            self.board_input.addItem(f"All boards ({len(devices)})", None)
+        for device in devices:
+            self.board_input.addItem(f"{device['serial_number']} ({device['port']})", device['serial_number'])
 
         layout.addRow("Actor Name:", self.name_input)
         layout.addRow("Publisher Name:", self.publisher_input)
@@ -50,6 +51,7 @@ class ActorInitDialog(QDialog):
         layout.addRow("Proxy Address:", self.proxy_ip_input)
         layout.addRow("Host Port:", self.host_port_input)
         layout.addRow("Proxy Port:", self.proxy_port_input)
+        layout.addRow("Board:", self.board_input)
 
         buttons = QDialogButtonBox(QDialogButtonBox.Ok | QDialogButtonBox.Cancel)
         buttons.accepted.connect(self.accept)
@@ -66,13 +68,19 @@ class ActorInitDialog(QDialog):
             "proxy_port": int(self.proxy_port_input.value())
         }
 
+    def selected_serial(self):
+        """Serial number of the chosen board, None for all boards."""
+        return self.board_input.currentData()
+
 
 class ActorWidget(QWidget):
     """Widget that allows initializing and connecting ArduinoActor."""
+    devices_changed = pyqtSignal(dict)  # emitted from the registry's hotplug thread
 
-    def __init__(self, parent=None):
+    def __init__(self, parent=None, console_level: int = logging.INFO):
         super().__init__(parent)
         self.actor = None
+        self.timeline_source = None  # The ArduinoTrigger feeding the timeline
         self.connected = False  # track connection state
 
         layout = QVBoxLayout(self)
@@ -81,6 +89,14 @@ class ActorWidget(QWidget):
         self.title.setAlignment(Qt.AlignCenter)
         layout.addWidget(self.title, alignment=Qt.AlignCenter)
 
+        # Connected boards, refreshed on hotplug instead of rescanning
+        self.devices_label = QLabel()
+        self.devices_label.setAlignment(Qt.AlignCenter)
+        layout.addWidget(self.devices_label, alignment=Qt.AlignCenter)
+        self.devices_changed.connect(self.update_devices_display)
+        self.update_devices_display(get_registry().devices())
+        get_registry().watch(self.devices_changed.emit)
+
         # LED indicator
         self.led = QLabel()
         self.led.setFixedSize(20, 20)
@@ -96,6 +112,11 @@ class ActorWidget(QWidget):
         self.update_pins_display()
         layout.addWidget(self.pins_label, alignment=Qt.AlignCenter)
 
+        # Scheduled and fired edges per channel, fed by the connected actor's device
+        self.timeline = PinTimeline()
+        self.timeline.setMinimumHeight(180)
+        layout.addWidget(self.timeline)
+
         # Buttons
         self.init_button = QPushButton("Connect Actor")
         self.init_button.clicked.connect(self.open_actor_init_dialog)
@@ -105,9 +126,10 @@ class ActorWidget(QWidget):
         layout.addWidget(self.init_button)
         layout.addWidget(self.uninit_button)
 
-        # Console output text box
-        self.console_output = QTextEdit()
+        # Console output text box, bounded like the sink feeding it
+        self.console_output = QPlainTextEdit()
         self.console_output.setReadOnly(True)
+        self.console_output.setMaximumBlockCount(CONSOLE_CAPACITY)
         self.console_output.setFixedHeight(120)
         self.console_output.setStyleSheet(
             "background-color: #1e1e1e; color: #00ff88; font-family: Consolas, monospace; font-size: 10pt;"
@@ -117,14 +139,52 @@ class ActorWidget(QWidget):
 
         self.setLayout(layout)
 
-        # Redirect stdout and stderr to the console box
-        sys.stdout = EmittingStream(text_written=self.append_console_text)
-        sys.stderr = EmittingStream(text_written=self.append_console_text)
-
-    def append_console_text(self, text):
-        """Append text to console output box."""
-        self.console_output.append(text)
-        self.console_output.ensureCursorVisible()
+        # Redirect stdout, stderr and logging to the console box. Writers only fill the
+        # sink; the GUI thread moves its lines to the box at most every CONSOLE_FLUSH_MS.
+        self.console_sink = ConsoleSink(capacity=CONSOLE_CAPACITY, level=console_level)
+        self.console_sink.setFormatter(logging.Formatter("%(levelname)s %(name)s: %(message)s"))
+        root = logging.getLogger()
+        self._saved_logging = (root.level, sys.stdout, sys.stderr)
+        root.addHandler(self.console_sink)
+        # The root logger defaults to WARNING, which would drop records before the sink sees them
+        if root.getEffectiveLevel() > console_level:
+            root.setLevel(console_level)
+        sys.stdout = ConsoleStream(self.console_sink, logging.INFO)
+        sys.stderr = ConsoleStream(self.console_sink, logging.ERROR)
+        self._console_streams = (sys.stdout, sys.stderr)
+        self.console_timer = QTimer(self)
+        self.console_timer.timeout.connect(self.flush_console)
+        self.console_timer.start(CONSOLE_FLUSH_MS)
+
+    def closeEvent(self, event):
+        """Give logging and stdout/stderr back, so later widgets don't duplicate lines."""
+        self.console_timer.stop()
+        root = logging.getLogger()
+        if self.console_sink in root.handlers:
+            root.removeHandler(self.console_sink)
+            level, stdout, stderr = self._saved_logging
+            root.setLevel(level)
+            # Unless someone redirected them again since
+            if sys.stdout is self._console_streams[0]:
+                sys.stdout = stdout
+            if sys.stderr is self._console_streams[1]:
+                sys.stderr = stderr
+        super().closeEvent(event)
+
+    def flush_console(self):
+        """Append everything written since the last flush to the console box in one go."""
+        lines, dropped = self.console_sink.drain()
+        if not lines:
+            return
+        if dropped:
+            lines.insert(0, f"... {dropped} lines dropped ...")
+        self.console_output.appendPlainText("\n".join(lines))
+        scrollbar = self.console_output.verticalScrollBar()
+        scrollbar.setValue(scrollbar.maximum())
+
+    def update_devices_display(self, devices):
+        """Update label with the number of connected Arduinos"""
+        self.devices_label.setText(f"Arduinos found: {len(devices)}")
 
     def update_led(self):
         """Update LED color based on self.connected"""
@@ -142,20 +202,37 @@ class ActorWidget(QWidget):
             self.pins_label.setText("(no actor connected)")
 
     def open_actor_init_dialog(self):
-        dialog = ActorInitDialog(self)
+        # Cached by the registry; only rescanned after a hotplug event
+        devices = list(get_registry().devices().values())
+        if not devices:
+            msg = "Failed to initialize ArduinoActor: No Arduino devices found."
+            print(msg)
+            logger.error(msg)
+            QMessageBox.critical(self, "Error", msg)
+            return
+        dialog = ActorInitDialog(devices, self)
         if dialog.exec_() == QDialog.Accepted:
             values = dialog.get_values()
+            serial = dialog.selected_serial()
             try:
-                devices = find_arduino_ports()
                 pins = {"Pin1": 0, "Pin2": 1, "Pin3": 2, "Pin4": 3, "Pin5": 4, "Pin6": 5}
                 pins_to_letter = {"Pin1": "E", "Pin2": "F", "Pin3": "A", "Pin4": "B", "Pin5": "C", "Pin6": "D"}
-                device_info = {
-                    "port": devices["ports"][0],
-                    "serial_number": devices["serial_numbers"][0],
+                device_infos = [{
+                    "port": device["port"],
+                    "serial_number": device["serial_number"],
                     "pins": pins,
                     "pins_to_letter": pins_to_letter
-                }
-                self.actor = ArduinoActor(device_info=device_info, **values)
+                } for device in devices if serial is None or device["serial_number"] == serial]
+                if serial is None:
+                    # Channel names are prefixed with each board's serial number; the
+                    # timeline shows the first board
+                    self.actor = ArduinoFleetActor(devices=device_infos, **values)
+                    self.timeline_source = next(iter(self.actor.device.triggers.values()))
+                else:
+                    self.actor = ArduinoActor(device_info=device_infos[0], **values)
+                    self.timeline_source = self.actor.device
+                self.timeline.set_labels(self.timeline_source.pins, pins_to_letter)
+                self.timeline_source.schedule_listeners.append(self.timeline.notify)
                 self.actor.start_listening()
                 self.connected = True
                 self.update_led()
@@ -177,8 +254,10 @@ class ActorWidget(QWidget):
     def close_actor(self):
         try:
             if self.actor:
+                self.timeline_source.schedule_listeners.remove(self.timeline.notify)
                 self.actor.stop_listening()
             self.actor = None
+            self.timeline_source = None
             self.connected = False
             self.update_led()
             self.update_pins_display()
@@ -199,7 +278,7 @@ def main():
 
     widget = ActorWidget()
     widget.setWindowTitle("ArduinoActor Connector")
-    widget.resize(400, 400)
+    widget.resize(400, 600)
     widget.show()
 
     sys.exit(app.exec_())
@@ -0,0 +1,616 @@
+import binascii
+import fcntl
+import os
+import pty
+import select
+import struct
+import termios
+import threading
+import time
+import tty
+from collections import deque
+from typing import List, Optional
+
+MAX_EVENTS = 20
+BUFFER_SIZE = 512
+NUM_CHANNELS = 6
+MAX_DELAY_US = 0x7FFFFFFF
+NUM_SLOTS = 8
+SLOT_POOL_SIZE = 2 * MAX_EVENTS
+FRAME_TIMEOUT = 1.0  # s, frameTimeoutUs: a frame stalled this long is handled as is
+BOOTLOADER_EXIT = 0.016  # s, optiboot's watchdog reset after a byte that isn't an STK500 command
+READY_BANNER = "READY"
+# Binary frames of command_reader.h
+BINARY_VERSION = 1
+BINARY_SYNC = 0xA5
+BINARY_NO_SEQ = 0xFFFF
+BINARY_EVENT_SIZE = 5
+BIN_APPEND, BIN_ORIGIN, BIN_STORE = 0x01, 0x02, 0x04
+
+
+def _atoi(text: str, bits: int = 16) -> int:
+    """Mimic avr-libc atoi() (16-bit int) or, with bits=32, atol()."""
+    text = text.lstrip(" \t\n\r\f\v")
+    sign = 1
+    if text[:1] in ("+", "-"):
+        sign = -1 if text[0] == "-" else 1
+        text = text[1:]
+    digits = ""
+    for char in text:
+        if not char.isdigit():
+            break
+        digits += char
+    value = sign * int(digits) if digits else 0
+    value &= (1 << bits) - 1
+    return value - (1 << bits) if value >= 1 << (bits - 1) else value
+
+
+def _strtoul(text: str) -> int:
+    """Mimic strtoul(text, NULL, 10) on a 32-bit unsigned long (saturating)."""
+    digits = ""
+    for char in text.lstrip(" \t\n\r\f\v"):
+        if not char.isdigit():
+            break
+        digits += char
+    return min(int(digits), 0xFFFFFFFF) if digits else 0
+
+
+def _to_char(value: int) -> int:
+    """Truncate to a signed 8-bit char like the firmware's CRC variables."""
+    value &= 0xFF
+    return value - 0x100 if value >= 0x80 else value
+
+
+class ArduinoEmulator:
+    """Software stand-in for arduino/arduino.ino exposed on a pseudo-terminal.
+
+    `port` is the slave device name, so `Serial(emulator.port, 115200)` (and thus
+    `ArduinoTrigger`) can open it unchanged. The emulator models the sketch's
+    blocking command reception, `<...CRC>` framing, XOR CRC, the `STOP;` path,
+    `maxEvents`, the 512-byte buffer, `atoi`/`strtoul`, the DEBUG/non-DEBUG
+    replies, "u" (µs) delay suffixes, the streaming "+" append command,
+    "@<micros>;" origins, `PING;`, `ID;` (reporting `firmware_id`) and the
+    preloaded slots ("S<n>;" store, "F<n>;" and unframed "!<n>" fire) with the
+    "R<slot>,<period>,<count>;" repeat mode and its "D<n>" shot notifications.
+    Binary event frames (CRC-16, negotiated with "BIN;") are understood unless
+    `binary` is False, which emulates a sketch from before them.
+    With `baudrate` set, bytes are delivered at the wire rate in both directions.
+    `drift_ppm` makes the device clock run fast or slow. Fired edges are recorded
+    in `fired` as `(scheduled_us, fired_us, channel, state)` tuples.
+
+    With `boot_time` set, opening the port resets the board like the Uno's DTR
+    auto-reset: everything is cleared and the sketch prints "READY" after
+    `boot_time` s, or shortly after the first byte received while booting (the
+    bootloader gives up on non-STK500 input). `unplug()`/`replug()` drop and
+    re-enumerate the board; the port name changes like a real re-enumeration can.
+    """
+
+    def __init__(self, debug: bool = True, baudrate: Optional[int] = 115200, drift_ppm: float = 0.0,
+                 firmware_id: int = 0, boot_time: Optional[float] = None, binary: bool = True):
+        self.debug = debug
+        self.binary = binary
+        self.firmware_id = firmware_id
+        self.boot_time = boot_time
+        self.resets = 0
+        self._booting_until = None
+        self.clock_rate = 1.0 + drift_ppm * 1e-6  # device µs per real µs (resonator error)
+        self.byte_time = 10.0 / baudrate if baudrate else 0.0  # 8N1
+        self._open_pty()
+
+        self.events = []  # [start_us, channel, state]
+        self.slots = [[] for _ in range(NUM_SLOTS)]  # (delay_us, channel, state) per slot
+        self._bang = False  # a "!" arrived and its slot byte is awaited
+        self.repeat_slot = -1
+        self.repeat_period = 0
+        self.repeat_count = 0
+        self.next_shot_time = 0
+        self.shot_number = 0
+        self.shot_active = False
+        self.pin_states = [0] * NUM_CHANNELS
+        self.fired = []
+        self.commands_received = 0
+        self.current_seq = -1
+        self.stream_origin = 0
+        self._rx_time = 0
+
+        self._rx = deque()  # (arrival_time, byte)
+        self._rx_line_free = 0.0
+        self._tx = deque()  # (due_time, bytes)
+        self._tx_line_free = 0.0
+        self._frame = None  # bytearray while a '<' frame is being received (command_reader.h)
+        self._binary = None  # bytearray of payload and CRC while a binary frame is being received
+        self._binary_len = None  # its length byte, once received
+        self._frame_last = 0.0  # arrival of the last byte of either
+        self._t0 = time.monotonic()
+        self._lock = threading.Lock()
+        self._running = False
+        self._thread = None
+
+    def _open_pty(self):
+        self.master_fd, self.slave_fd = pty.openpty()
+        tty.setraw(self.slave_fd)
+        tty.setraw(self.master_fd)
+        if self.boot_time is not None:
+            # Packet mode reports the input flush pyserial does when it opens the port
+            fcntl.ioctl(self.master_fd, termios.TIOCPKT, struct.pack("i", 1))
+        self.port = os.ttyname(self.slave_fd)
+        self._connected = True
+
+    # ---------- Lifecycle ----------
+    def start(self):
+        self._running = True
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def close(self):
+        self._running = False
+        if self._thread is not None:
+            self._thread.join(timeout=1.0)
+        self._close_pty()
+
+    def _close_pty(self):
+        self._connected = False
+        for fd in (self.master_fd, self.slave_fd):
+            try:
+                os.close(fd)
+            except OSError:
+                pass
+
+    def unplug(self):
+        """Disconnect the board: the host's open port fails from now on."""
+        with self._lock:
+            self._close_pty()
+            self._rx.clear()
+            self._tx.clear()
+            self._frame = None
+            self._binary = None
+
+    def replug(self) -> str:
+        """Connect the board again on a new port (returned) and reset it."""
+        with self._lock:
+            self._open_pty()
+            self.reset()
+        return self.port
+
+    def reset(self):
+        """Restart the sketch: clear all state, restart micros() and print the banner once booted."""
+        self.resets += 1
+        self.events = []
+        self.slots = [[] for _ in range(NUM_SLOTS)]
+        self._bang = False
+        self.repeat_slot = -1
+        self.shot_active = False
+        self.pin_states = [0] * NUM_CHANNELS
+        self.current_seq = -1
+        self.stream_origin = 0
+        self._rx.clear()
+        self._frame = None
+        self._binary = None
+        self._booting_until = time.monotonic() + (self.boot_time or 0.0)
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # ---------- Device clock and serial line ----------
+    def micros(self) -> int:
+        return int((time.monotonic() - self._t0) * 1e6 * self.clock_rate) & 0xFFFFFFFF
+
+    def _println(self, text: str, seq: bool = True):
+        if seq and self.current_seq >= 0:
+            text = f"#{self.current_seq} {text}"
+        data = (text + "\r\n").encode()
+        now = time.monotonic()
+        self._tx_line_free = max(self._tx_line_free, now) + len(data) * self.byte_time
+        self._tx.append((self._tx_line_free, data))
+
+    def _available(self, now: float) -> bool:
+        return bool(self._rx) and self._rx[0][0] <= now
+
+    def _read(self) -> int:
+        return self._rx.popleft()[1]
+
+    def _pump_io(self, timeout: float):
+        """Deliver due replies and collect incoming bytes with their wire arrival time."""
+        if not self._connected:
+            time.sleep(max(timeout, 0.0))
+            return
+        now = time.monotonic()
+        try:
+            while self._tx and self._tx[0][0] <= now:
+                os.write(self.master_fd, self._tx.popleft()[1])
+            readable, _, _ = select.select([self.master_fd], [], [], max(timeout, 0.0))
+        except (OSError, ValueError):
+            if self._connected:
+                self._running = False
+            return
+        if readable:
+            try:
+                data = os.read(self.master_fd, 4096)
+            except OSError:
+                return
+            if self.boot_time is not None:
+                status, data = data[0], data[1:]
+                if status & termios.TIOCPKT_FLUSHREAD:
+                    # The host opened the port: DTR auto-reset
+                    with self._lock:
+                        self.reset()
+            now = time.monotonic()
+            if self._booting_until is not None and data:
+                # The bootloader swallows what arrives while it runs and then starts the sketch
+                self._booting_until = min(self._booting_until, now + BOOTLOADER_EXIT)
+                return
+            if self._booting_until is not None:
+                return
+            self._rx_line_free = max(self._rx_line_free, now)
+            for byte in data:
+                self._rx_line_free += self.byte_time
+                self._rx.append((self._rx_line_free, byte))
+
+    def _next_wakeup(self) -> float:
+        now = time.monotonic()
+        wakeups = [0.001]
+        if self._booting_until is not None:
+            wakeups.append(self._booting_until - now)
+        if self._tx:
+            wakeups.append(self._tx[0][0] - now)
+        if self._rx:
+            wakeups.append(self._rx[0][0] - now)
+        if self.events:
+            now_us = self.micros()
+            nearest = min(((e[0] - now_us) & 0xFFFFFFFF) for e in self.events)
+            wakeups.append(0.0 if nearest >= 0x80000000 else nearest / 1e6 / self.clock_rate)
+        return min(wakeups)
+
+    # ---------- Sketch logic ----------
+    def _run(self):
+        while self._running:
+            self._pump_io(self._next_wakeup())
+            with self._lock:
+                self._loop()
+
+    def _loop(self):
+        now = time.monotonic()
+        if self._booting_until is not None:
+            if now < self._booting_until:
+                return
+            # setup(): micros() starts over and the banner goes out
+            self._booting_until = None
+            self._t0 = now
+            self._println(READY_BANNER, seq=False)
+            return
+        # Events fire from the timer interrupt, also while a command is arriving
+        self.process_events()
+        # loop() consumes what has arrived, one byte at a time
+        while self._available(now):
+            self._feed(self._read(), now)
+        if now - self._frame_last >= FRAME_TIMEOUT:
+            if self._frame is not None:
+                self._finish_frame()
+            elif self._binary is not None:
+                self._finish_binary()
+
+    def _feed(self, byte: int, now: float):
+        """crFeed() of command_reader.h."""
+        if self._bang:
+            self._bang = False
+            if ord("0") <= byte <= ord("9"):
+                if byte - ord("0") < NUM_SLOTS:
+                    self.fire_slot(byte - ord("0"))
+                return
+            if byte != ord("<") and byte != BINARY_SYNC:
+                return
+        if self._binary is not None:
+            # Counted, not delimited: payload bytes may look like '<' or '>'
+            self._frame_last = now
+            if self._binary_len is None:
+                self._binary_len = byte
+            else:
+                self._binary.append(byte)
+                if len(self._binary) == self._binary_len + 2:
+                    self._finish_binary()
+            return
+        if self._frame is None:
+            if byte == ord("<"):
+                self._frame = bytearray()
+                self._frame_last = now
+            elif byte == ord("!"):
+                self._bang = True
+            elif byte == BINARY_SYNC and self.binary:
+                self._binary = bytearray()
+                self._binary_len = None
+                self._frame_last = now
+            return
+        self._frame_last = now
+        if byte == ord(">"):
+            self._finish_frame()
+        elif byte == ord("<"):
+            self._frame = bytearray()  # The previous frame lost its '>'
+        elif len(self._frame) < BUFFER_SIZE - 1:
+            self._frame.append(byte)
+
+    def _finish_frame(self):
+        buffer = self._frame.decode("latin-1")
+        self._rx_time = self.micros()
+        self._frame = None
+        self.commands_received += 1
+        self.handle_command(buffer)
+
+    def _finish_binary(self):
+        payload, length = bytes(self._binary), self._binary_len
+        self._rx_time = self.micros()
+        self._binary = None
+        self.commands_received += 1
+        self.handle_binary(payload, length)
+
+    def send_confirmation(self, success: bool, msg: str = ""):
+        if self.debug:
+            self._println(("OK: " if success else "ERR: ") + msg)
+        else:
+            self._println("1" if success else "0")
+
+    def reset_events(self):
+        self.events = []
+        self.repeat_slot = -1
+        self.shot_active = False
+        if self.debug:
+            self._println("Events reset.")
+
+    def schedule_event(self, delay_us: int, channel: int, state: bool):
+        if channel >= NUM_CHANNELS or channel < 0:
+            self.send_confirmation(False, "Bad channel.")
+            return
+        if len(self.events) < MAX_EVENTS:
+            self.events.append([(self.stream_origin + delay_us) & 0xFFFFFFFF, channel, int(state)])
+        else:
+            self.send_confirmation(False, "Event buffer full.")
+
+    def add_slot_event(self, slot: int, delay_us: int, channel: int, state: bool):
+        if channel >= NUM_CHANNELS or channel < 0:
+            self.send_confirmation(False, "Bad channel.")
+        elif len(self.slots[slot]) >= MAX_EVENTS or sum(map(len, self.slots)) >= SLOT_POOL_SIZE:
+            self.send_confirmation(False, "Slot full.")
+        else:
+            self.slots[slot].append((delay_us, channel, int(state)))
+
+    def load_slot(self, slot: int, origin: int):
+        self.stream_origin = origin
+        self.events = [[(self.stream_origin + delay) & 0xFFFFFFFF, channel, state]
+                       for delay, channel, state in self.slots[slot]]
+
+    def fire_slot(self, slot: int):
+        self.repeat_slot = -1
+        self.shot_active = False
+        self.load_slot(slot, self.micros())
+
+    def load_shot(self):
+        self.load_slot(self.repeat_slot, self.next_shot_time)
+        self.shot_active = True
+        self.shot_number += 1
+        self.next_shot_time = (self.next_shot_time + self.repeat_period) & 0xFFFFFFFF
+        if self.repeat_count and self.shot_number >= self.repeat_count:
+            self.repeat_slot = -1
+
+    def process_events(self):
+        """The sketch's timer interrupt: fire due events in time order (arrival order on ties)."""
+        now = self.micros()
+        due = [event for event in self.events if ((now - event[0]) & 0xFFFFFFFF) < 0x80000000]
+        if due:
+            self.events = [event for event in self.events if ((now - event[0]) & 0xFFFFFFFF) >= 0x80000000]
+            due.sort(key=lambda event: -((now - event[0]) & 0xFFFFFFFF))  # Oldest first, stable
+            for start, channel, state in due:
+                self.pin_states[channel] = state
+                self.fired.append((start, now, channel, state))
+        if self.shot_active and not self.events:
+            self.shot_active = False
+            self._println(f"D{self.shot_number}", seq=False)
+            if self.repeat_slot >= 0:
+                self.load_shot()
+
+    def begin_slot(self, slot: int) -> bool:
+        """beginSlot(): the slot being repeated can't be replaced while the timer loads shots from it."""
+        if not 0 <= slot < NUM_SLOTS or slot == self.repeat_slot:
+            self.send_confirmation(False, "Bad slot.")
+            return False
+        self.slots[slot] = []
+        return True
+
+    def add_event(self, slot: int, delay: int, micro: bool, channel: int, state: bool):
+        """addEvent(): store the event in `slot`, or schedule it if `slot` is -1."""
+        if delay > (MAX_DELAY_US if micro else MAX_DELAY_US // 1000):
+            self.send_confirmation(False, "Bad delay.")
+        elif slot >= 0:
+            self.add_slot_event(slot, delay if micro else delay * 1000, channel, state)
+        else:
+            self.schedule_event(delay if micro else delay * 1000, channel, state)
+
+    def finish_events(self, slot: int, append: bool):
+        if slot >= 0:
+            self.send_confirmation(True, "Stored.")
+        else:
+            self.send_confirmation(True, "Appended." if append else "Scheduled.")
+
+    def handle_binary(self, payload: bytes, length: Optional[int]):
+        """handleBinary(): `payload` holds payload and CRC of a frame whose length byte was `length`."""
+        self.current_seq = -1
+        if len(payload) >= 2 and int.from_bytes(payload[:2], "little") != BINARY_NO_SEQ:
+            self.current_seq = int.from_bytes(payload[:2], "little")
+        if (length is None or len(payload) != length + 2
+                or binascii.crc_hqx(bytes((length,)) + payload[:length], 0xFFFF)
+                != int.from_bytes(payload[length:], "big")):
+            self.send_confirmation(False, "CRC mismatch.")
+            return
+        flags = payload[2] if length > 2 else 0
+        header = 3 + (4 if flags & BIN_ORIGIN else 0) + (1 if flags & BIN_STORE else 0)
+        if length <= header or (length - header) % BINARY_EVENT_SIZE:
+            self.send_confirmation(False, "Bad length.")
+            return
+        slot = -1
+        append = False
+        if flags & BIN_STORE:
+            slot = payload[7 if flags & BIN_ORIGIN else 3]
+            if not self.begin_slot(slot):
+                return
+        else:
+            append = bool(flags & BIN_APPEND)
+            if not append:
+                self.reset_events()
+                self.stream_origin = self.micros()
+            if flags & BIN_ORIGIN:
+                self.stream_origin = int.from_bytes(payload[3:7], "little")
+        for offset in range(header, length, BINARY_EVENT_SIZE):
+            channel_state, delay = struct.unpack_from("<BI", payload, offset)
+            self.add_event(slot, delay, True, channel_state & 0x7F, channel_state >> 7 != 0)
+        self.finish_events(slot, append)
+
+    @staticmethod
+    def _fixed_command_crc(buffer: str, end: int) -> bool:
+        calc_crc = 0
+        for char in buffer[:end]:
+            calc_crc ^= ord(char)
+        return _to_char(calc_crc) == _to_char(_atoi(buffer[end:]))
+
+    def handle_command(self, buffer: str):
+        # Optional "#<seq>|" prefix, covered by the CRC like the rest of the command
+        self.current_seq = -1
+        body = 0
+        if buffer.startswith("#") and "|" in buffer:
+            self.current_seq = _atoi(buffer[1:], bits=32)
+            body = buffer.index("|") + 1
+
+        if len(buffer) == 0:
+            self.send_confirmation(False, "Empty.")
+            return
+
+        if buffer.startswith("STOP;", body):
+            if self._fixed_command_crc(buffer, body + 5):
+                self.reset_events()
+                self.pin_states = [0] * NUM_CHANNELS
+                self.send_confirmation(True, "Stopped.")
+            else:
+                self.send_confirmation(False, "Bad CRC.")
+            return
+
+        if buffer.startswith("PING;", body):
+            if self._fixed_command_crc(buffer, body + 5):
+                self._println(f"T{self._rx_time}")
+            else:
+                self.send_confirmation(False, "Bad CRC.")
+            return
+
+        if buffer.startswith("ID;", body):
+            if self._fixed_command_crc(buffer, body + 3):
+                self._println(f"ID:{self.firmware_id:X}")
+            else:
+                self.send_confirmation(False, "Bad CRC.")
+            return
+
+        if self.binary and buffer.startswith("BIN;", body):
+            if self._fixed_command_crc(buffer, body + 4):
+                self._println(f"BIN:{BINARY_VERSION}")
+            else:
+                self.send_confirmation(False, "Bad CRC.")
+            return
+
+        if buffer.startswith("F", body):
+            semi = buffer.find(";", body)
+            slot = _atoi(buffer[body + 1:])
+            if semi < 0 or not self._fixed_command_crc(buffer, semi + 1):
+                self.send_confirmation(False, "Bad CRC.")
+            elif not 0 <= slot < NUM_SLOTS:
+                self.send_confirmation(False, "Bad slot.")
+            else:
+                self.fire_slot(slot)
+                self.send_confirmation(True, "Fired.")
+            return
+
+        last_semi = buffer.rfind(";")
+        if last_semi < 0 or last_semi == len(buffer) - 1:
+            self.send_confirmation(False, "No CRC.")
+            return
+
+        received_crc = _atoi(buffer[last_semi + 1:])
+        data = buffer[:last_semi + 1]
+        calc_crc = 0
+        for char in data:
+            calc_crc ^= ord(char)
+        if _to_char(calc_crc) != received_crc:
+            self.send_confirmation(False, "CRC mismatch.")
+            return
+
+        # "S<n>;" stores the events in slot n instead of scheduling them
+        slot = -1
+        append = False
+        if buffer.startswith("S", body):
+            slot = _atoi(buffer[body + 1:])
+            if not self.begin_slot(slot):
+                return
+            body = buffer.index(";", body) + 1
+        else:
+            # "+" appends to the running event list (streaming) instead of replacing it
+            append = buffer.startswith("+", body)
+            if append:
+                body += 1
+            else:
+                self.reset_events()
+                self.stream_origin = self.micros()
+            # "@<micros>;" anchors the delays to an absolute device time (host clock sync)
+            if buffer.startswith("@", body):
+                self.stream_origin = _strtoul(buffer[body + 1:])
+                body = buffer.index(";", body) + 1
+
+        # "R<slot>,<period>[u],<count>;" replays a slot every period, count times (0 = until STOP)
+        if slot < 0 and not append and buffer.startswith("R", body):
+            n = _atoi(buffer[body + 1:])
+            rest = buffer[buffer.find(",", body) + 1:]
+            period = _strtoul(rest)
+            rest = rest.lstrip(" \t\n\r\f\v0123456789")
+            micro = rest.startswith("u")
+            count = _strtoul(rest[2 if micro else 1:])
+            if not micro:
+                period = 0 if period > MAX_DELAY_US // 1000 else period * 1000
+            if not 0 <= n < NUM_SLOTS or not self.slots[n]:
+                self.send_confirmation(False, "Bad slot.")
+            elif period == 0 or period > MAX_DELAY_US:
+                self.send_confirmation(False, "Bad period.")
+            else:
+                self.repeat_slot = n
+                self.repeat_period = period
+                self.repeat_count = count
+                self.shot_number = 0
+                self.next_shot_time = self.stream_origin
+                self.load_shot()
+                self.send_confirmation(True, "Repeating.")
+            return
+        for token in (t for t in data[body:].split(";") if t):
+            p1 = token.find("(")
+            c1 = token.find(",", p1 + 1) if p1 >= 0 else -1
+            c2 = token.find(",", c1 + 1) if c1 >= 0 else -1
+            p2 = token.find(")", c2 + 1) if c2 >= 0 else -1
+            if min(p1, c1, c2, p2) >= 0:
+                channel = _atoi(token[p1 + 1:c1])
+                field = token[c1 + 1:c2]
+                delay = _strtoul(field)
+                state = _atoi(token[c2 + 1:p2])
+                micro = field.lstrip(" \t\n\r\f\v0123456789").startswith("u")
+                self.add_event(slot, delay, micro, channel, state != 0)
+            elif self.debug:
+                self._println("Skip: " + token)
+        self.finish_events(slot, append)
+
+    def fired_latencies_us(self) -> List[int]:
+        """Lateness of each fired edge relative to its scheduled time, in µs."""
+        return [(fired - scheduled) & 0xFFFFFFFF for scheduled, fired, _, _ in self.fired]
+
+
+if __name__ == "__main__":
+    with ArduinoEmulator() as emulator:
+        print(f"Arduino emulator listening on {emulator.port} (Ctrl+C to quit)")
+        try:
+            while True:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            pass
@@ -0,0 +1,118 @@
+import time
+from collections import deque
+from typing import Optional
+
+from protocol import PONG_PATTERN, frame_command
+
+DEVICE_CLOCK_MASK = 0xFFFFFFFF  # micros() is an unsigned 32-bit counter (wraps after ~71.6 min)
+
+
+class ClockSync:
+    """Maps host `time.time_ns()` to the device's `micros()` using PING/PONG exchanges.
+
+    Each `sync()` sends `samples` pings and keeps the one with the smallest round
+    trip. Its host time is the midpoint of the exchange, corrected for the
+    different request and reply lengths on the wire. Samples from successive
+    syncs (up to `history`) are fitted linearly, so the Uno's resonator drift is
+    tracked as well as the offset. `to_device_us()` then turns any absolute host
+    timestamp into the device time to send with an "@<micros>;" command.
+    """
+
+    def __init__(self, trigger, samples: int = 8, history: int = 16, max_age: float = 10.0,
+                 baudrate: int = 115200):
+        self.trigger = trigger
+        self.samples = samples
+        self.max_age = max_age
+        self.byte_time_ns = 10e9 / baudrate  # 8N1
+        self._history = deque(maxlen=history)  # (host_ns, unwrapped device_us)
+        self.slope = 1.0  # device µs per host µs
+        self.rtt_ns = None
+        self.last_sync = None
+
+    def ping(self):
+        """One exchange; returns (host_ns at device reception, raw device_us, rtt_ns) or None."""
+        t0 = time.time_ns()
+        response = self.trigger.write_to_device("PING;")
+        t1 = time.time_ns()
+        lines = response.splitlines()
+        match = PONG_PATTERN.fullmatch(lines[-1]) if lines else None
+        if match is None:
+            return None
+        device_us = int(match.group(1))
+        # The device timestamps the end of the request, so shift the midpoint by the
+        # difference between request and reply transmission times.
+        request_bytes = len(frame_command("PING;"))
+        reply_bytes = len(lines[-1]) + 2
+        host_ns = (t0 + t1) // 2 + int((request_bytes - reply_bytes) * self.byte_time_ns / 2)
+        return host_ns, device_us, t1 - t0
+
+    def sync(self, samples: Optional[int] = None) -> dict:
+        best = None
+        for _ in range(samples or self.samples):
+            sample = self.ping()
+            if sample is not None and (best is None or sample[2] < best[2]):
+                best = sample
+        if best is None:
+            raise RuntimeError("Clock sync failed: the device did not answer PING.")
+        host_ns, device_us, rtt_ns = best
+        self._history.append((host_ns, self._unwrap(host_ns, device_us)))
+        self._fit()
+        self.rtt_ns = rtt_ns
+        self.last_sync = time.monotonic()
+        return {'offset_us': self.offset_us(), 'rtt_us': rtt_ns / 1e3,
+                'drift_ppm': (self.slope - 1.0) * 1e6, 'samples': len(self._history)}
+
+    def is_stale(self) -> bool:
+        return self.last_sync is None or time.monotonic() - self.last_sync > self.max_age
+
+    def to_device_us(self, host_ns: int) -> int:
+        """Device micros() value at absolute host time `host_ns`."""
+        if not self._history:
+            raise RuntimeError("Clock is not synchronized; call sync() first.")
+        ref_host, ref_device = self._history[-1]
+        return int(round(ref_device + (host_ns - ref_host) / 1e3 * self.slope)) & DEVICE_CLOCK_MASK
+
+    def to_host_ns(self, device_us: int) -> int:
+        """Host time_ns() at which the device's micros() reads `device_us` (the nearest such instant)."""
+        if not self._history:
+            raise RuntimeError("Clock is not synchronized; call sync() first.")
+        ref_host, ref_device = self._history[-1]
+        delta = (device_us - ref_device) & DEVICE_CLOCK_MASK
+        if delta >= 1 << 31:
+            delta -= 1 << 32
+        return ref_host + int(delta * 1e3 / self.slope)
+
+    def reset(self):
+        """Forget all samples, e.g. after the device rebooted and micros() restarted."""
+        self._history.clear()
+        self.slope = 1.0
+        self.rtt_ns = None
+        self.last_sync = None
+
+    def offset_us(self) -> int:
+        """Device clock minus host clock (in µs, modulo the 32-bit device counter) right now."""
+        now_ns = time.time_ns()
+        return (self.to_device_us(now_ns) - now_ns // 1000) & DEVICE_CLOCK_MASK
+
+    def _unwrap(self, host_ns, device_us):
+        """Place a raw 32-bit reading on the continuous timeline of the previous samples."""
+        if not self._history:
+            return device_us
+        ref_host, ref_device = self._history[-1]
+        predicted = ref_device + (host_ns - ref_host) / 1e3 * self.slope
+        delta = (device_us - int(predicted)) & DEVICE_CLOCK_MASK
+        if delta >= 1 << 31:
+            delta -= 1 << 32
+        return int(predicted) + delta
+
+    def _fit(self):
+        """Least-squares slope over the history once it spans at least a second."""
+        if len(self._history) < 2 or self._history[-1][0] - self._history[0][0] < 1e9:
+            return
+        n = len(self._history)
+        mean_host = sum(h for h, _ in self._history) / n
+        mean_device = sum(d for _, d in self._history) / n
+        cov = sum((h - mean_host) / 1e3 * (d - mean_device) for h, d in self._history)
+        var = sum(((h - mean_host) / 1e3) ** 2 for h, _ in self._history)
+        if var > 0:
+            self.slope = cov / var
@@ -0,0 +1,67 @@
+import logging
+import threading
+from collections import deque
+from typing import List, Tuple
+
+
+class ConsoleSink(logging.Handler):
+    """Ring buffer of console lines that a GUI drains at its own pace.
+
+    Writers (any thread) only append to a deque of at most `capacity` lines;
+    when it is full the oldest lines are dropped and counted. `drain()` hands the
+    pending lines over in one piece, so the view is updated once per flush
+    instead of once per print. Lines below `level` are discarded on entry, before
+    any formatting: log records are filtered by the handler level, and
+    ConsoleStream writes are checked before the text is touched.
+    """
+
+    def __init__(self, capacity: int = 1000, level: int = logging.INFO):
+        super().__init__(level=level)
+        self.capacity = capacity
+        self._lines = deque(maxlen=capacity)
+        self._lock = threading.Lock()
+        self.dropped = 0
+
+    def add(self, line: str):
+        with self._lock:
+            if len(self._lines) == self.capacity:
+                self.dropped += 1
+            self._lines.append(line)
+
+    def emit(self, record: logging.LogRecord):
+        try:
+            self.add(self.format(record))
+        except Exception:
+            self.handleError(record)
+
+    def drain(self) -> Tuple[List[str], int]:
+        """Pending lines and how many were dropped since the last drain."""
+        with self._lock:
+            lines = list(self._lines)
+            self._lines.clear()
+            dropped, self.dropped = self.dropped, 0
+        return lines, dropped
+
+
+class ConsoleStream:
+    """File-like replacement for sys.stdout/sys.stderr that feeds a ConsoleSink."""
+
+    def __init__(self, sink: ConsoleSink, level: int = logging.INFO):
+        self.sink = sink
+        self.level = level
+        self._partial = ""
+
+    def write(self, text: str):
+        if self.level < self.sink.level:
+            return len(text)
+        # print() writes the text and the newline separately; keep unfinished lines
+        *lines, self._partial = (self._partial + text).split("\n")
+        for line in lines:
+            if line.strip():
+                self.sink.add(line)
+        return len(text)
+
+    def flush(self):
+        if self._partial.strip():
+            self.sink.add(self._partial)
+        self._partial = ""
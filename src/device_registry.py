@@ -0,0 +1,161 @@
+import os
+import platform
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+try:
+    import pyudev
+except ImportError:
+    pyudev = None
+
+# Stable per-device symlinks maintained by udev; listing it is far cheaper than comports()
+SERIAL_BY_ID = "/dev/serial/by-id"
+
+
+def scan_arduino_ports() -> Dict[str, dict]:
+    """Enumerate USB serial devices and return the Arduinos keyed by serial number."""
+    from serial.tools import list_ports
+
+    devices = {}
+    for port in list_ports.comports():
+        if port.manufacturer == None:
+            continue
+        if platform.system() == "Windows":
+            if port.serial_number != '85133323136351201241':
+                continue
+        elif "Arduino" not in port.manufacturer:
+            continue
+        devices[port.serial_number] = {'port': port.device, 'serial_number': port.serial_number,
+                                       'description': port.description}
+    return devices
+
+
+class DeviceRegistry:
+    """Lazily discovered, cached Arduino devices keyed by serial number.
+
+    Nothing is scanned until a device is first asked for. After that the cached
+    result is reused until a hotplug event invalidates it:
+    - with `watch()` and pyudev installed, udev tty add/remove events;
+    - otherwise on Linux, a change in the /dev/serial/by-id listing (checked on access);
+    - elsewhere, the cache expires after `max_age` seconds.
+    Callbacks registered with `watch()` get the new device dict after each rescan
+    triggered by a hotplug event.
+    """
+
+    def __init__(self, scan: Callable[[], Dict[str, dict]] = scan_arduino_ports, max_age: float = 5.0):
+        self.scan = scan
+        self.max_age = max_age
+        self._devices: Optional[Dict[str, dict]] = None
+        self._fingerprint = None
+        self._scanned_at = 0.0
+        self._lock = threading.Lock()
+        self._callbacks: List[Callable[[Dict[str, dict]], None]] = []
+        self._observer = None
+        self._poller = None
+        self._stop = threading.Event()
+
+    def devices(self, refresh: bool = False) -> Dict[str, dict]:
+        with self._lock:
+            fingerprint = self._current_fingerprint()
+            if refresh or self._is_stale(fingerprint):
+                self._devices = self.scan()
+                self._fingerprint = fingerprint
+                self._scanned_at = time.monotonic()
+            return dict(self._devices)
+
+    def get(self, serial_number: str) -> dict:
+        device = self.devices().get(serial_number)
+        if device is None:
+            # A board plugged in since the last scan that no event has reported yet
+            device = self.devices(refresh=True).get(serial_number)
+        if device is None:
+            raise KeyError(f"No Arduino with serial number {serial_number} found.")
+        return device
+
+    def port_for(self, serial_number: str) -> str:
+        return self.get(serial_number)['port']
+
+    def find_arduino_ports(self) -> dict:
+        """Devices in the legacy {'ports': [...], 'serial_numbers': [...]} format."""
+        devices = self.devices()
+        return {'ports': [d['port'] for d in devices.values()],
+                'serial_numbers': [d['serial_number'] for d in devices.values()]}
+
+    def invalidate(self):
+        with self._lock:
+            self._devices = None
+
+    def watch(self, callback: Optional[Callable[[Dict[str, dict]], None]] = None, interval: float = 1.0):
+        """Refresh on hotplug in the background and notify `callback` with the new devices."""
+        if callback is not None:
+            self._callbacks.append(callback)
+        if self._observer is not None or self._poller is not None:
+            return
+        if pyudev is not None:
+            monitor = pyudev.Monitor.from_netlink(pyudev.Context())
+            monitor.filter_by(subsystem='tty')
+            self._observer = pyudev.MonitorObserver(monitor, callback=lambda device: self._on_hotplug())
+            self._observer.start()
+        else:
+            self._stop.clear()
+            self._poller = threading.Thread(target=self._poll, args=(interval,), daemon=True)
+            self._poller.start()
+
+    def stop_watching(self):
+        if self._observer is not None:
+            self._observer.stop()
+            self._observer = None
+        if self._poller is not None:
+            self._stop.set()
+            self._poller.join(timeout=2.0)
+            self._poller = None
+
+    def _on_hotplug(self):
+        with self._lock:
+            previous = self._devices
+        self.invalidate()
+        devices = self.devices()
+        if devices == previous:
+            return
+        for callback in list(self._callbacks):
+            try:
+                callback(devices)
+            except Exception as e:
+                print(f"[DeviceRegistry] Callback error: {e}")
+
+    def _poll(self, interval):
+        last = self._current_fingerprint()
+        while not self._stop.wait(interval):
+            fingerprint = self._current_fingerprint()
+            if fingerprint != last or (fingerprint is None and self._is_stale(None)):
+                last = fingerprint
+                self._on_hotplug()
+
+    def _current_fingerprint(self):
+        if platform.system() != "Linux":
+            return None
+        try:
+            return tuple(sorted(os.listdir(SERIAL_BY_ID)))
+        except OSError:
+            return ()
+
+    def _is_stale(self, fingerprint):
+        if self._devices is None:
+            return True
+        if fingerprint is not None:
+            return fingerprint != self._fingerprint
+        return time.monotonic() - self._scanned_at > self.max_age
+
+
+_registry = None
+_registry_lock = threading.Lock()
+
+
+def get_registry() -> DeviceRegistry:
+    """Process-wide registry shared by ArduinoTrigger, ArduinoActor and ActorWidget."""
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            _registry = DeviceRegistry()
+        return _registry
@@ -0,0 +1,75 @@
+import threading
+from collections import deque
+from concurrent.futures import Future
+from typing import Callable
+
+
+class _Lane:
+    """One long-lived thread running submitted calls in order."""
+
+    def __init__(self, name: str):
+        self._queue = deque()
+        self._cond = threading.Condition()
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+
+    def submit(self, func: Callable, *args) -> Future:
+        future = Future()
+        with self._cond:
+            if not self._running:
+                raise RuntimeError("Device worker is closed.")
+            self._queue.append((future, func, args))
+            self._cond.notify()
+        return future
+
+    def pending(self) -> int:
+        with self._cond:
+            return len(self._queue)
+
+    def close(self, timeout: float):
+        with self._cond:
+            self._running = False
+            self._cond.notify()
+        self._thread.join(timeout=timeout)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._queue or not self._running)
+                if not self._queue:
+                    return
+                future, func, args = self._queue.popleft()
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                future.set_result(func(*args))
+            except BaseException as e:
+                future.set_exception(e)
+
+
+class DeviceWorker:
+    """Runs device calls off the actor's message loop.
+
+    `submit()` calls run one at a time in arrival order, so commands reach the
+    device in the order they were requested. `submit_priority()` calls (stop) run
+    on their own lane and never wait behind a long call such as a firmware update.
+    """
+
+    def __init__(self, name: str = "device-worker"):
+        self._device = _Lane(name)
+        self._priority = _Lane(f"{name}-priority")
+
+    def submit(self, func: Callable, *args) -> Future:
+        return self._device.submit(func, *args)
+
+    def submit_priority(self, func: Callable, *args) -> Future:
+        return self._priority.submit(func, *args)
+
+    def pending(self) -> int:
+        """Calls waiting on the normal lane (not counting the running one)."""
+        return self._device.pending()
+
+    def close(self, timeout: float = 1.0):
+        self._priority.close(timeout)
+        self._device.close(timeout)
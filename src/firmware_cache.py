@@ -0,0 +1,75 @@
+import hashlib
+import os
+import subprocess
+from typing import Optional
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "arduino_trigger", "firmware")
+DEFAULT_FQBN = "arduino:avr:uno"
+SKETCH_EXTENSIONS = (".ino", ".h", ".hpp", ".c", ".cpp")
+
+
+class FirmwareCache:
+    """Content-addressed store of compiled sketches.
+
+    A build is keyed by the SHA-256 of the sketch sources, the FQBN and the
+    arduino-cli version, and lives in `<cache_dir>/<key>/`. The first 32 bits of
+    the key are compiled into the sketch as FIRMWARE_ID, so a running board can
+    report (with "ID;") which build it has and an identical upload can be skipped.
+    """
+
+    def __init__(self, cache_dir: str = DEFAULT_CACHE_DIR, fqbn: str = DEFAULT_FQBN, cli_path: str = "arduino-cli"):
+        self.cache_dir = cache_dir
+        self.fqbn = fqbn
+        self.cli_path = cli_path
+        self._cli_version = None
+
+    def cli_version(self) -> str:
+        if self._cli_version is None:
+            try:
+                self._cli_version = subprocess.run([self.cli_path, "version"], capture_output=True,
+                                                   text=True, check=True).stdout.strip()
+            except (OSError, subprocess.CalledProcessError):
+                self._cli_version = "unknown"
+        return self._cli_version
+
+    def key(self, sketch_dir: str) -> str:
+        digest = hashlib.sha256()
+        for name in sorted(os.listdir(sketch_dir)):
+            if not name.endswith(SKETCH_EXTENSIONS):
+                continue
+            digest.update(name.encode())
+            with open(os.path.join(sketch_dir, name), "rb") as f:
+                digest.update(hashlib.sha256(f.read()).digest())
+        digest.update(self.fqbn.encode())
+        digest.update(self.cli_version().encode())
+        return digest.hexdigest()
+
+    @staticmethod
+    def firmware_id(key: str) -> int:
+        return int(key[:8], 16)
+
+    def build_dir(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key)
+
+    def lookup(self, key: str) -> Optional[str]:
+        """Directory of a finished build for `key`, or None."""
+        build_dir = self.build_dir(key)
+        if os.path.isdir(build_dir) and any(name.endswith(".hex") for name in os.listdir(build_dir)):
+            return build_dir
+        return None
+
+    def build(self, sketch_dir: str, force: bool = False):
+        """Compile `sketch_dir` unless it is cached; returns (build_dir, firmware_id, cached)."""
+        key = self.key(sketch_dir)
+        firmware_id = self.firmware_id(key)
+        build_dir = self.lookup(key)
+        if build_dir is not None and not force:
+            return build_dir, firmware_id, True
+
+        import pyduinocli  # Only needed when something has to be compiled
+        cli = pyduinocli.Arduino(self.cli_path)
+        build_dir = self.build_dir(key)
+        os.makedirs(build_dir, exist_ok=True)
+        cli.compile(sketch=sketch_dir, fqbn=self.fqbn, output_dir=build_dir,
+                    build_properties=[f"compiler.cpp.extra_flags=-DFIRMWARE_ID=0x{firmware_id:08X}UL"])
+        return build_dir, firmware_id, False
@@ -0,0 +1,93 @@
+import functools
+import threading
+import time
+from collections import deque
+from typing import Dict
+
+
+def command_type(signal: str) -> str:
+    """Coarse type of a firmware command, used to group its timings."""
+    if signal.startswith("STOP;"):
+        return "stop"
+    if signal.startswith("PING;"):
+        return "ping"
+    if signal.startswith("ID;"):
+        return "id"
+    if signal.startswith("BIN;"):
+        return "negotiate"
+    if signal.startswith("S"):
+        return "store_slot"
+    if signal.startswith(("F", "!")):
+        return "fire_slot"
+    if signal.startswith("+"):
+        return "append"
+    body = signal[signal.index(";") + 1:] if signal.startswith("@") else signal
+    if body.startswith("R"):
+        return "repeat"
+    return "timestamped" if signal.startswith("@") else "events"
+
+
+class LatencyWindow:
+    """The last `size` samples (s) of one timing; percentiles are only computed when read."""
+
+    __slots__ = ("samples", "count")
+
+    def __init__(self, size: int):
+        self.samples = deque(maxlen=size)
+        self.count = 0
+
+    def add(self, seconds: float):
+        self.samples.append(seconds)
+        self.count += 1
+
+    def summary(self) -> dict:
+        ordered = sorted(self.samples)
+        if not ordered:
+            return {'count': self.count}
+        pick = lambda q: ordered[min(int(q * len(ordered)), len(ordered) - 1)] * 1e3
+        return {'count': self.count, 'p50_ms': pick(0.5), 'p90_ms': pick(0.9), 'p99_ms': pick(0.99),
+                'max_ms': ordered[-1] * 1e3}
+
+
+class LatencyStats:
+    """Rolling latency windows keyed by (kind, stage), e.g. ("events", "response").
+
+    `record()` is an append to a bounded deque, cheap enough to leave on; `summary()`
+    returns {kind: {stage: {'count', 'p50_ms', 'p90_ms', 'p99_ms', 'max_ms'}}}
+    over the last `window` samples of each.
+    """
+
+    def __init__(self, window: int = 1000):
+        self.window = window
+        self._windows: Dict[tuple, LatencyWindow] = {}
+        self._lock = threading.Lock()
+
+    def record(self, kind: str, stage: str, seconds: float):
+        window = self._windows.get((kind, stage))
+        if window is None:
+            with self._lock:
+                window = self._windows.setdefault((kind, stage), LatencyWindow(self.window))
+        window.add(seconds)
+
+    def timed(self, kind: str, stage: str, func):
+        """Wrap `func` so every call is recorded (also when it raises)."""
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                self.record(kind, stage, time.perf_counter() - start)
+        return wrapper
+
+    def summary(self) -> dict:
+        with self._lock:
+            items = list(self._windows.items())
+        result = {}
+        for (kind, stage), window in sorted(items):
+            result.setdefault(kind, {})[stage] = window.summary()
+        return result
+
+    def reset(self):
+        with self._lock:
+            self._windows = {}
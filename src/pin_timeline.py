@@ -0,0 +1,154 @@
+import threading
+import time
+from typing import Optional
+
+import numpy as np
+import pyqtgraph as pg
+from PyQt5.QtCore import QTimer
+from PyQt5.QtWidgets import QVBoxLayout, QWidget
+
+from protocol import NUM_CHANNELS
+
+LANE_HEIGHT = 1.5  # y distance between channel traces; a trace spans 0 (low) to 1 (high)
+TAIL_S = 3600.0  # the last level is drawn this far ahead instead of being extended every frame
+
+
+class ChannelTrace:
+    """Step trace of one channel in preallocated arrays.
+
+    Every edge adds two points (the vertical segment), plus one trailing point that
+    holds the current level. When the arrays are full the older half is discarded,
+    so adding an edge is amortized O(1) and never allocates.
+    """
+
+    __slots__ = ("x", "y", "size", "level", "dirty")
+
+    def __init__(self, capacity: int):
+        self.x = np.empty(2 * capacity + 1)
+        self.y = np.empty(2 * capacity + 1)
+        self.size = 0
+        self.level = 0
+        self.dirty = False
+
+    def add(self, t: float, state: int):
+        if self.size + 3 > len(self.x):
+            keep = (len(self.x) // 2) & ~1
+            self.x[:keep] = self.x[self.size - keep:self.size]
+            self.y[:keep] = self.y[self.size - keep:self.size]
+            self.size = keep
+        self.x[self.size:self.size + 3] = (t, t, t + TAIL_S)
+        self.y[self.size:self.size + 3] = (self.level, state, state)
+        self.size += 2
+        self.level = state
+        self.dirty = True
+
+    def data(self):
+        """Copies of the points to draw (the arrays keep changing after setData)."""
+        return self.x[:self.size + 1].copy(), self.y[:self.size + 1].copy()
+
+
+class PinTimeline(QWidget):
+    """Scrolling timeline of the edges scheduled on and fired by each channel.
+
+    Fed by ArduinoTrigger.schedule_listeners (`notify` may be called from any
+    thread) with the host's mirror of the armed events, so fired edges are the
+    predicted ones, not a readback. Scheduled edges are drawn as markers; once due
+    they move into the channel's step trace. The view is refreshed by a QTimer every
+    `refresh_ms` and only traces that changed get new data, so bursts of events cost
+    one update per frame.
+    """
+
+    def __init__(self, pins: Optional[dict] = None, pins_to_letter: Optional[dict] = None,
+                 history: float = 10.0, lookahead: float = 2.0, capacity: int = 4096,
+                 refresh_ms: int = 40, parent=None):
+        super().__init__(parent)
+        self.history = history
+        self.lookahead = lookahead
+        self._t0 = time.time_ns()
+        self._lock = threading.Lock()
+        self._armed = []
+        self._armed_dirty = False
+        self.traces = [ChannelTrace(capacity) for _ in range(NUM_CHANNELS)]
+
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(0, 0, 0, 0)
+        self.plot = pg.PlotWidget()
+        self.plot.setMouseEnabled(x=False, y=False)
+        self.plot.hideButtons()
+        self.plot.setMenuEnabled(False)
+        self.plot.setLabel('bottom', "time", units="s")
+        self.plot.setYRange(-0.25, (NUM_CHANNELS - 1) * LANE_HEIGHT + 1.25, padding=0)
+        layout.addWidget(self.plot)
+
+        self.curves = []
+        for channel in range(NUM_CHANNELS):
+            curve = self.plot.plot(pen=pg.mkPen(pg.intColor(channel, NUM_CHANNELS), width=2))
+            curve.setClipToView(True)
+            curve.setDownsampling(auto=True, method='peak')
+            self.curves.append(curve)
+        self.scheduled = pg.ScatterPlotItem(size=9, pen=None, brush=pg.mkBrush(255, 200, 0))
+        self.plot.addItem(self.scheduled)
+        self.now_line = pg.InfiniteLine(angle=90, movable=False, pen=pg.mkPen(150, 150, 150))
+        self.plot.addItem(self.now_line)
+        self.set_labels(pins, pins_to_letter)
+
+        self.timer = QTimer(self)
+        self.timer.timeout.connect(self.refresh)
+        self.timer.start(refresh_ms)
+
+    def set_labels(self, pins: Optional[dict] = None, pins_to_letter: Optional[dict] = None):
+        """Name each lane by its letter from `pins_to_letter` (via the `pins` name -> channel map)."""
+        names = {channel: name for name, channel in (pins or {}).items()}
+        ticks = []
+        for channel in range(NUM_CHANNELS):
+            name = names.get(channel)
+            label = f"{(pins_to_letter or {}).get(name, name)}" if name is not None else f"ch {channel}"
+            ticks.append((channel * LANE_HEIGHT + 0.5, label))
+        self.plot.getAxis('left').setTicks([ticks])
+
+    def _x(self, host_ns: int) -> float:
+        return (host_ns - self._t0) / 1e9
+
+    def notify(self, armed: list, cleared: bool = False):
+        """New armed list [(host_ns, pin, state), ...]; `cleared` means every pin went low."""
+        now_ns = time.time_ns()
+        with self._lock:
+            # What fired under the old list is history; the new list replaces the rest
+            self._settle(now_ns)
+            if cleared:
+                for trace in self.traces:
+                    if trace.level:
+                        trace.add(self._x(now_ns), 0)
+            self._armed = armed
+            self._armed_dirty = True
+
+    def _settle(self, now_ns: int):
+        fired = 0
+        for due_ns, pin, state in self._armed:
+            if due_ns > now_ns:
+                break
+            if pin < NUM_CHANNELS:
+                self.traces[pin].add(self._x(due_ns), state)
+            fired += 1
+        if fired:
+            self._armed = self._armed[fired:]
+            self._armed_dirty = True
+
+    def refresh(self):
+        now_ns = time.time_ns()
+        with self._lock:
+            self._settle(now_ns)
+            for channel, (trace, curve) in enumerate(zip(self.traces, self.curves)):
+                if trace.dirty:
+                    x, y = trace.data()
+                    curve.setData(x, y + channel * LANE_HEIGHT)
+                    trace.dirty = False
+            if self._armed_dirty:
+                armed = [(due_ns, pin, state) for due_ns, pin, state in self._armed if pin < NUM_CHANNELS]
+                self.scheduled.setData(x=[self._x(due_ns) for due_ns, _, _ in armed],
+                                       y=[pin * LANE_HEIGHT + state for _, pin, state in armed],
+                                       symbol=['t1' if state else 't' for _, _, state in armed])
+                self._armed_dirty = False
+        now = self._x(now_ns)
+        self.now_line.setValue(now)
+        self.plot.setXRange(now - self.history, now + self.lookahead, padding=0)
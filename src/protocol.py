@@ -0,0 +1,134 @@
+"""Wire format shared by the drivers talking to arduino/arduino.ino."""
+import binascii
+import re
+import struct
+from typing import Iterable, Optional, Tuple
+
+# Replies that terminate a command in arduino.ino. With DEBUG=1 every command ends
+# with exactly one "OK: ..." line or one of the fatal "ERR: ..." lines below
+# ("ERR: Bad channel." / "ERR: Event buffer full." / "ERR: Slot full." are per-event
+# and followed by "OK: ..."). With DEBUG=0 the firmware only answers "1" or "0".
+FINAL_ERRORS = ("ERR: Empty.", "ERR: Bad CRC.", "ERR: No CRC.", "ERR: CRC mismatch.", "ERR: Bad slot.",
+                "ERR: Bad period.", "ERR: Bad length.")
+MAX_EVENTS = 20  # maxEvents in arduino.ino
+NUM_SLOTS = 8  # numSlots in arduino.ino
+NUM_CHANNELS = 6  # numChannels in arduino.ino; events address channels 0..NUM_CHANNELS-1
+MAX_DELAY_US = 0x7FFFFFFF  # maxDelayUs in arduino.ino
+DEFAULT_RESPONSE_TIMEOUT = 0.1  # s, hard upper bound for a single reply
+NON_DEBUG_LINGER = 0.005  # s, time to wait for a trailing "1" after a per-event "0"
+
+# The firmware prefixes every reply line with "#<seq> " when the command carried "#<seq>|"
+SEQ_REPLY_PATTERN = re.compile(r"#(\d+) (.*)")
+SEQ_MODULO = 10000
+
+# Reply to "PING;": the device's micros() when the command was received
+PONG_PATTERN = re.compile(r"T(\d+)")
+# Reply to "ID;": FIRMWARE_ID of the running build in hex (0 = unknown build)
+ID_PATTERN = re.compile(r"ID:([0-9A-Fa-f]+)")
+# Reply to "BIN;": the binary frame version the sketch understands (older sketches have none)
+BINARY_PATTERN = re.compile(r"BIN:(\d+)")
+# Printed once (untagged) at the end of setup(), i.e. after every reset
+READY_BANNER = "READY"
+# Unsolicited (untagged) "shot <n> completed" line of the repeat mode
+SHOT_PATTERN = re.compile(r"D(\d+)")
+
+# Binary event frames, an alternative to the text "(pin,delay,state);" commands once
+# "BIN;" was answered with "BIN:<BINARY_VERSION>" (see arduino/command_reader.h):
+#   BINARY_SYNC, payload length, payload, CRC-16 of length and payload (big endian)
+# Payload: seq (uint16, BINARY_NO_SEQ if untagged), flags, origin (uint32, with
+# BINARY_ORIGIN), slot (uint8, with BINARY_STORE), then one EVENT_RECORD per event.
+# Integers are little endian. Replies stay text.
+BINARY_VERSION = 1
+BINARY_SYNC = 0xA5
+BINARY_NO_SEQ = 0xFFFF
+BINARY_APPEND, BINARY_ORIGIN, BINARY_STORE = 0x01, 0x02, 0x04
+MAX_BINARY_PAYLOAD = 255
+EVENT_RECORD = struct.Struct("<BI")  # channel | state << 7, delay in µs
+BINARY_HEADER = struct.Struct("<BBHB")  # sync, length, seq, flags
+# Event commands that have a binary form: "[+][@<micros>;]events" or "S<n>;events"
+EVENT_COMMAND_PATTERN = re.compile(r"(?:S(\d+);|(\+)?(?:@(\d+);)?)((?:\(\d+,\d+u?,\d+\);)+)")
+EVENT_FIELDS_PATTERN = re.compile(r"\((\d+),(\d+)(u?),(\d+)\);")
+
+
+def calculate_crc(data: str) -> int:
+    crc = 0
+    for char in data:
+        crc ^= ord(char)
+    return crc
+
+
+def frame_command(signal: str, seq: Optional[int] = None) -> bytes:
+    """Frame `signal` as `<[#seq|]signal CRC>`; the CRC covers the sequence prefix too."""
+    if seq is not None:
+        signal = f"#{seq}|{signal}"
+    return f"<{signal}{calculate_crc(signal)}>".encode('utf-8')
+
+
+def crc16(data: bytes) -> int:
+    """CRC-16/CCITT-FALSE (polynomial 0x1021, initial value 0xFFFF) of binary frames."""
+    return binascii.crc_hqx(data, 0xFFFF)
+
+
+def pack_events(events: Iterable[Tuple[int, int, int]]) -> Optional[bytes]:
+    """EVENT_RECORDs of (channel, delay_us, state) events; None if one doesn't fit a record."""
+    fields = []
+    for channel, delay_us, state in events:
+        if not 0 <= channel < 0x80 or not 0 <= delay_us <= MAX_DELAY_US:
+            return None
+        fields += (channel | (0x80 if state else 0), delay_us)
+    # One pack call for all records; EVENT_RECORD's format repeated
+    return struct.pack("<" + EVENT_RECORD.format[1:] * (len(fields) // 2), *fields)
+
+
+def frame_binary(records: bytes, seq: Optional[int] = None, append: bool = False,
+                 origin: Optional[int] = None, slot: Optional[int] = None) -> Optional[bytes]:
+    """Binary frame of packed events, like frame_command of their text; None if they don't fit one frame."""
+    flags = ((BINARY_STORE if slot is not None else 0) | (BINARY_APPEND if append else 0)
+             | (BINARY_ORIGIN if origin is not None else 0))
+    extra = (struct.pack("<I", origin) if origin is not None else b"") + (bytes((slot,)) if slot is not None else b"")
+    length = BINARY_HEADER.size - 2 + len(extra) + len(records)
+    if length > MAX_BINARY_PAYLOAD:
+        return None
+    frame = BINARY_HEADER.pack(BINARY_SYNC, length, BINARY_NO_SEQ if seq is None else seq, flags) + extra + records
+    return frame + crc16(frame[1:]).to_bytes(2, "big")
+
+
+def binary_frame_command(signal: str, seq: Optional[int] = None) -> Optional[bytes]:
+    """Binary frame of a text event command, or None for commands that stay text (STOP;, R..., ...)."""
+    match = EVENT_COMMAND_PATTERN.fullmatch(signal)
+    if match is None:
+        return None
+    slot, append, origin, body = match.groups()
+    if (slot is not None and int(slot) > 0xFF) or (origin is not None and int(origin) > 0xFFFFFFFF):
+        return None
+    records = pack_events((int(channel), int(delay) if micro else int(delay) * 1000, int(state))
+                          for channel, delay, micro, state in EVENT_FIELDS_PATTERN.findall(body))
+    if records is None:
+        return None
+    return frame_binary(records, seq, append=bool(append), origin=None if origin is None else int(origin),
+                        slot=None if slot is None else int(slot))
+
+
+def is_final_response(line: str) -> bool:
+    """Return True if `line` is the last line the firmware sends for a command."""
+    return (line.startswith("OK: ") or line in FINAL_ERRORS or line == "1"
+            or PONG_PATTERN.fullmatch(line) is not None or ID_PATTERN.fullmatch(line) is not None
+            or BINARY_PATTERN.fullmatch(line) is not None)
+
+
+def is_error_response(response: str) -> bool:
+    """Return True if any line of a reply reports an error (DEBUG or non-DEBUG firmware)."""
+    return any(line.startswith("ERR: ") or line == "0" for line in response.splitlines())
+
+
+def is_notification(line: str) -> bool:
+    """True for lines the firmware sends on its own rather than in reply to a command."""
+    return line == READY_BANNER or SHOT_PATTERN.fullmatch(line) is not None
+
+
+def split_seq(line: str) -> Tuple[Optional[int], str]:
+    """Split a reply line into its echoed sequence number (or None) and the message."""
+    match = SEQ_REPLY_PATTERN.fullmatch(line)
+    if match:
+        return int(match.group(1)), match.group(2)
+    return None, line
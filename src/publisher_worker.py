@@ -0,0 +1,136 @@
+import threading
+import time
+from collections import deque
+from typing import Callable, List, Optional
+
+OVERFLOW_POLICIES = ("block", "drop_oldest", "drop_newest")
+
+
+class PublisherWorker:
+    """Single long-lived thread publishing payloads from a bounded queue.
+
+    `put()` never starts a thread. The worker takes up to `max_batch` queued
+    payloads at a time, coalesces them with `merge` (one send per batch) and calls
+    `send`. Payloads keep their submission order. When `max_queue` payloads are
+    waiting, `overflow` decides what happens: "block" waits for room (up to
+    `block_timeout` seconds, then drops the new payload), "drop_oldest" discards the
+    oldest queued payload and "drop_newest" discards the new one.
+    `stats()` returns the counters and send latency.
+    """
+
+    def __init__(self, send: Callable, merge: Optional[Callable[[List], object]] = None,
+                 max_queue: int = 1000, max_batch: int = 32, overflow: str = "drop_oldest",
+                 block_timeout: Optional[float] = None, name: str = "publisher-worker"):
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError(f"overflow must be one of {OVERFLOW_POLICIES}.")
+        self.send = send
+        self.merge = merge
+        self.max_queue = max_queue
+        self.max_batch = max_batch
+        self.overflow = overflow
+        self.block_timeout = block_timeout
+
+        self._queue = deque()
+        self._cond = threading.Condition()
+        self._running = True
+        self._busy = False
+
+        self.queued = 0
+        self.sent = 0
+        self.dropped = 0
+        self.batches = 0
+        self.errors = 0
+        self.last_latency = 0.0
+        self.max_latency = 0.0
+        self._total_latency = 0.0
+
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+
+    def put(self, payload) -> bool:
+        """Queue `payload` for publishing; returns False if it was dropped."""
+        with self._cond:
+            if not self._running:
+                self.dropped += 1
+                return False
+            if len(self._queue) >= self.max_queue:
+                if self.overflow == "drop_newest":
+                    self.dropped += 1
+                    return False
+                if self.overflow == "drop_oldest":
+                    self._queue.popleft()
+                    self.dropped += 1
+                else:
+                    has_room = self._cond.wait_for(
+                        lambda: len(self._queue) < self.max_queue or not self._running,
+                        timeout=self.block_timeout)
+                    if not has_room or not self._running:
+                        self.dropped += 1
+                        return False
+            self._queue.append(payload)
+            self.queued += 1
+            self._cond.notify_all()
+            return True
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Wait until everything queued so far has been sent."""
+        with self._cond:
+            return self._cond.wait_for(lambda: not self._queue and not self._busy, timeout=timeout)
+
+    def close(self, timeout: float = 1.0):
+        """Send what is still queued (within `timeout`) and stop the worker."""
+        self.flush(timeout=timeout)
+        with self._cond:
+            self._running = False
+            self._cond.notify_all()
+        self._thread.join(timeout=timeout)
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {
+                'queued': self.queued,
+                'pending': len(self._queue),
+                'sent': self.sent,
+                'dropped': self.dropped,
+                'batches': self.batches,
+                'errors': self.errors,
+                'last_send_latency_ms': self.last_latency * 1e3,
+                'mean_send_latency_ms': self._total_latency / self.batches * 1e3 if self.batches else 0.0,
+                'max_send_latency_ms': self.max_latency * 1e3,
+            }
+
+    def _run(self):
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._queue or not self._running)
+                if not self._queue:
+                    return
+                batch = [self._queue.popleft() for _ in range(min(self.max_batch, len(self._queue)))]
+                self._busy = True
+                self._cond.notify_all()
+
+            start = time.perf_counter()
+            try:
+                if self.merge is not None and len(batch) > 1:
+                    self.send(self.merge(batch))
+                else:
+                    for payload in batch:
+                        self.send(payload)
+                failed = False
+            except Exception as e:
+                print(f"[PublisherWorker] Error: {e}")
+                failed = True
+            latency = time.perf_counter() - start
+
+            with self._cond:
+                self._busy = False
+                self.batches += 1
+                if failed:
+                    self.errors += 1
+                    self.dropped += len(batch)
+                else:
+                    self.sent += len(batch)
+                self.last_latency = latency
+                self.max_latency = max(self.max_latency, latency)
+                self._total_latency += latency
+                self._cond.notify_all()
@@ -0,0 +1,246 @@
+import queue
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Callable, Optional
+
+from latency_stats import LatencyStats, command_type
+from protocol import (NON_DEBUG_LINGER, READY_BANNER, SEQ_MODULO, binary_frame_command, frame_command,
+                      is_final_response, is_notification, split_seq)
+
+# The Uno's hardware serial RX ring buffer. Commands written ahead of the one being
+# handled sit there until the sketch reads them, so don't queue more than this.
+RX_BUFFER_SIZE = 64
+
+
+class _PendingCommand:
+    __slots__ = ("seq", "signal", "frame", "future", "lines", "deadline", "submitted", "written")
+
+    def __init__(self, seq, signal, frame, future, submitted=None):
+        self.seq = seq
+        self.signal = signal
+        self.frame = frame
+        self.future = future
+        self.lines = []
+        self.deadline = None
+        self.submitted = submitted
+        self.written = None
+
+
+class SerialPipeline:
+    """Pipelined access to the trigger's serial port.
+
+    `submit()` queues a command and returns a `concurrent.futures.Future` resolving
+    to the reply text (the same string `ArduinoTrigger.read_response` returns).
+    A writer thread tags each command with a sequence number ("#<seq>|") and keeps
+    up to `max_in_flight` commands on the wire, bounded by the device's RX buffer.
+    A reader thread matches reply lines to commands by the sequence number the
+    firmware echoes; untagged lines (older firmware) go to the oldest command.
+    Commands that get no final reply within `response_timeout` resolve with
+    whatever was received, like `read_response` does. If the port fails, every
+    pending command raises the error, the pipeline shuts down and `on_failure` is
+    called with the error. Lines the
+    firmware sends on its own ("READY", "D<n>") go to `on_notification`. With
+    `latency`, each command's queue, first_line and response times are recorded.
+    With `binary`, event commands go out as binary frames (see protocol.frame_binary).
+    """
+
+    def __init__(self, arduino, response_timeout: float, max_in_flight: int = 4,
+                 max_in_flight_bytes: int = RX_BUFFER_SIZE,
+                 on_notification: Optional[Callable[[str], None]] = None,
+                 on_failure: Optional[Callable[[Exception], None]] = None,
+                 latency: Optional[LatencyStats] = None, binary: bool = False):
+        self.arduino = arduino
+        self.binary = binary
+        self.latency = latency
+        self.on_notification = on_notification
+        self.on_failure = on_failure
+        self.response_timeout = response_timeout
+        self.max_in_flight = max_in_flight
+        self.max_in_flight_bytes = max_in_flight_bytes
+
+        self._submissions = queue.Queue()
+        self._pending = OrderedDict()  # seq -> _PendingCommand, in write order
+        self._in_flight_bytes = 0
+        self._next_seq = 0
+        self._cond = threading.Condition()
+        self._running = True
+        self._error = None  # Port failure that shut the pipeline down
+
+        # Short port timeout so the reader can expire commands without a reply; close() restores it
+        self._port_timeout = self.arduino.timeout
+        self.arduino.timeout = min(self.response_timeout, 0.01)
+        self._writer = threading.Thread(target=self._write_loop, daemon=True)
+        self._reader = threading.Thread(target=self._read_loop, daemon=True)
+        self._writer.start()
+        self._reader.start()
+
+    def submit(self, signal: str) -> Future:
+        future = Future()
+        if not self._running:
+            future.set_exception(self._error or RuntimeError("Serial pipeline is closed."))
+            return future
+        self._submissions.put((signal, future, time.perf_counter()))
+        return future
+
+    def write_raw(self, data: bytes) -> Future:
+        """Queue unframed bytes that get no reply (e.g. "!<n>"); resolves once written."""
+        return self.submit(data)
+
+    def close(self):
+        """Stop the I/O threads; commands still pending resolve with their partial reply."""
+        with self._cond:
+            self._running = False
+            self._cond.notify_all()
+        self._submissions.put(None)
+        self._writer.join(timeout=1.0)
+        self._reader.join(timeout=1.0)
+        if self._error is None and getattr(self.arduino, 'is_open', False):
+            try:
+                self.arduino.timeout = self._port_timeout
+            except OSError:  # SerialException: the port is gone and gets reopened anyway
+                pass
+        with self._cond:
+            for pending in list(self._pending.values()):
+                self._resolve(pending)
+        while True:
+            try:
+                item = self._submissions.get_nowait()
+            except queue.Empty:
+                break
+            if item is not None:
+                item[1].set_exception(RuntimeError("Serial pipeline is closed."))
+
+    # ---------- Writer ----------
+    def _can_send(self, frame_size):
+        if not self._pending:
+            return True
+        return (len(self._pending) < self.max_in_flight
+                and self._in_flight_bytes + frame_size <= self.max_in_flight_bytes)
+
+    def _write_loop(self):
+        while self._running:
+            item = self._submissions.get()
+            if item is None:
+                break
+            signal, future, submitted = item
+            if not future.set_running_or_notify_cancel():
+                continue
+            if isinstance(signal, bytes):
+                # Written between frames, in submission order
+                try:
+                    self.arduino.write(signal)
+                    self.arduino.flush()
+                    future.set_result("")
+                except Exception as e:
+                    future.set_exception(e)
+                continue
+            with self._cond:
+                seq = self._next_seq
+                self._next_seq = (self._next_seq + 1) % SEQ_MODULO
+                frame = (self.binary and binary_frame_command(signal, seq)) or frame_command(signal, seq)
+                pending = _PendingCommand(seq, signal, frame, future, submitted)
+                while self._running and not self._can_send(len(pending.frame)):
+                    self._cond.wait()
+                if not self._running:
+                    future.set_exception(RuntimeError("Serial pipeline is closed."))
+                    break
+                pending.deadline = time.monotonic() + self.response_timeout
+                self._pending[seq] = pending
+                self._in_flight_bytes += len(pending.frame)
+            try:
+                self.arduino.write(pending.frame)
+                self.arduino.flush()
+                pending.written = time.perf_counter()
+            except Exception as e:
+                with self._cond:
+                    self._forget(pending)
+                future.set_exception(e)
+
+    # ---------- Reader ----------
+    def _read_loop(self):
+        partial = b""
+        while self._running:
+            try:
+                data = self.arduino.read(max(1, self.arduino.in_waiting))
+            except Exception as e:
+                if self._running:
+                    print(f"[SerialPipeline] Read error: {e}")
+                    self._fail(e)
+                break
+            if data:
+                partial += data
+                *lines, partial = partial.split(b"\n")
+                for raw in lines:
+                    line = raw.decode(errors='ignore').strip()
+                    if line:
+                        self._dispatch(line)
+            self._expire()
+
+    def _dispatch(self, line):
+        seq, message = split_seq(line)
+        if seq is None and is_notification(message):
+            if self.on_notification is not None:
+                self.on_notification(message)
+            elif message == READY_BANNER:
+                print("[SerialPipeline] Device was reset.")
+            return
+        with self._cond:
+            if seq is None:
+                pending = next(iter(self._pending.values()), None)
+            else:
+                pending = self._pending.get(seq)
+            if pending is None:
+                return
+            if not pending.lines and self.latency is not None and pending.written is not None:
+                self.latency.record(command_type(pending.signal), "first_line", time.perf_counter() - pending.written)
+            pending.lines.append(message)
+            if is_final_response(message):
+                self._resolve(pending)
+            elif message == "0":
+                # Non-DEBUG firmware: only linger briefly for a trailing "1"/"0"
+                pending.deadline = min(pending.deadline, time.monotonic() + NON_DEBUG_LINGER)
+
+    def _expire(self):
+        now = time.monotonic()
+        with self._cond:
+            for pending in [p for p in self._pending.values() if p.deadline <= now]:
+                self._resolve(pending)
+
+    def _fail(self, error):
+        """The port is gone: stop accepting commands and fail everything in flight with `error`."""
+        with self._cond:
+            self._running = False
+            self._error = error
+            pending = list(self._pending.values())
+            for command in pending:
+                self._forget(command)
+            self._cond.notify_all()
+        while True:
+            try:
+                item = self._submissions.get_nowait()
+            except queue.Empty:
+                break
+            if item is not None:
+                pending.append(_PendingCommand(None, item[0], b"", item[1]))
+        self._submissions.put(None)
+        for command in pending:
+            if not command.future.done():
+                command.future.set_exception(error)
+        if self.on_failure is not None:
+            self.on_failure(error)
+
+    def _forget(self, pending):
+        if self._pending.pop(pending.seq, None) is not None:
+            self._in_flight_bytes -= len(pending.frame)
+            self._cond.notify_all()
+
+    def _resolve(self, pending):
+        self._forget(pending)
+        if self.latency is not None and pending.written is not None:
+            kind = command_type(pending.signal)
+            self.latency.record(kind, "queue", pending.written - pending.submitted)
+            self.latency.record(kind, "response", time.perf_counter() - pending.written)
+        if not pending.future.done():
+            pending.future.set_result("\n".join(pending.lines))
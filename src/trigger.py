@@ -6,81 +6,502 @@ except ImportError:
 
 import os
 import re
-import pyduinocli
 import time
-from typing import Optional, List
-from serial.tools import list_ports
-from qtpy import QtCore
-from pyleco.utils.data_publisher import DataPublisher
-from trigger_events import Pulse, PulseSequence, RisingEdge, FallingEdge
-import platform
+from typing import Optional, List, Union
+from trigger_events import (NS_PER_UNIT, EventBlock, Pulse, PulseSequence, PulseTrain, RisingEdge, FallingEdge,
+                            SyncPulseAndEdge, as_event_block, check_unit)
+from protocol import (BINARY_PATTERN, BINARY_VERSION, DEFAULT_RESPONSE_TIMEOUT, MAX_EVENTS, NON_DEBUG_LINGER,
+                      NUM_SLOTS, binary_frame_command, calculate_crc, frame_command, ID_PATTERN, PONG_PATTERN,
+                      READY_BANNER, SHOT_PATTERN, is_error_response, is_final_response, is_notification)
+from serial_pipeline import SerialPipeline
+from publisher_worker import PublisherWorker
+from clock_sync import ClockSync
+from device_registry import get_registry
+from firmware_cache import DEFAULT_FQBN, FirmwareCache
+from latency_stats import LatencyStats, command_type
+from concurrent.futures import Future
 import threading
 
-RISING_FALLING_PATTERN = re.compile(r"\((\d+),(\d+),(\d+)\);")
-PULSE_SEQUENCE_PATTERN = re.compile(r"\((\d+),(\d+),1\);\(\d+?,(\d+),0\);")
+# Times are ms, or µs with a "u" suffix (see trigger_events.UNIT_SUFFIX)
+RISING_FALLING_PATTERN = re.compile(r"\((\d+),(\d+u?),(\d+)\);")
+PULSE_SEQUENCE_PATTERN = re.compile(r"\((\d+),(\d+u?),1\);\(\d+?,(\d+u?),0\);")
+
+# Reconnect backoff (s) and how far ahead re-armed events are anchored
+RECONNECT_BACKOFF_MIN = 0.05
+RECONNECT_BACKOFF_MAX = 2.0
+REPLAY_MARGIN = 0.05
+
+# Event classes by the 'type' of a sendBatch spec; the other spec keys are their arguments
+BATCH_EVENT_TYPES = {"rising": RisingEdge, "falling": FallingEdge, "pulse": Pulse,
+                     "sync": SyncPulseAndEdge, "train": PulseTrain}
+
+def time_to_ms(text: str) -> float:
+    """Convert a command time field ("5" ms or "1500u" µs) to milliseconds."""
+    return int(text[:-1]) / 1000 if text.endswith("u") else int(text)
+
+def parse_event_offsets(sequence: str):
+    """(offset_ns, pin, state) of every "(pin,delay,state);" event in a command."""
+    return [(int(round(time_to_ms(delay) * 1e6)), int(pin), int(state))
+            for pin, delay, state in RISING_FALLING_PATTERN.findall(sequence)]
 
 def find_arduino_ports():
-    ports = list_ports.comports()
-    arduino_ports = {'ports': [], 'serial_numbers': []}
-
-    for port in ports:
-        if port.manufacturer == None:
-            continue
-        if platform.system() == "Windows":
-            if port.serial_number == '85133323136351201241':
-            	arduino_ports["ports"].append(port.device)
-            	arduino_ports["serial_numbers"].append(port.serial_number)
-        else:
-            if "Arduino" in port.manufacturer:
-                arduino_ports["ports"].append(port.device)
-                arduino_ports["serial_numbers"].append(port.serial_number)
+    """Connected Arduinos as {'ports': [...], 'serial_numbers': [...]}, from the cached registry."""
+    return get_registry().find_arduino_ports()
 
-    return arduino_ports
-            
 
 class ArduinoTrigger:
-    def __init__(self, device_info: dict, publisher_name: str, proxy_address: str, proxy_port: int):
-        self.device_port = device_info['port']
+    def __init__(self, device_info: dict, publisher_name: str, proxy_address: str, proxy_port: int,
+                 response_timeout: float = DEFAULT_RESPONSE_TIMEOUT, pipelined: bool = False,
+                 max_in_flight: int = 4, publisher_queue_size: int = 1000,
+                 publisher_overflow: str = "drop_oldest", ready_timeout: float = 3.0,
+                 auto_reconnect: bool = True, reconnect_attempts: int = 8,
+                 latency_publish_interval: Optional[float] = None, binary: bool = True):
         self.serial_number = device_info['serial_number']
+        # Without a port, look the board up by serial number in the device registry
+        self._fixed_port = device_info.get('port')
+        self.device_port = self._fixed_port or get_registry().port_for(self.serial_number)
         self.pins = device_info['pins']
-        self.arduino = Serial(self.device_port, 115200, timeout=1, rtscts=False, dsrdtr=False)
+        self.response_timeout = response_timeout
+        self.ready_timeout = ready_timeout
+        self.auto_reconnect = auto_reconnect
+        self.reconnect_attempts = reconnect_attempts
+        self.pipelined = pipelined
+        self.max_in_flight = max_in_flight
+        # Send event commands as binary frames if the sketch supports them (negotiated on
+        # every open_port); `binary` tells whether the current connection does
+        self.prefer_binary = binary
+        self.binary = False
+        self._io_lock = threading.Lock()
+        # Rolling timings per command type and stage; see latency_stats
+        self.latency = LatencyStats()
+        self._first_line_at = None
+        self._reconnect_lock = threading.Lock()
+        self._generation = 0  # Bumped on every reconnect
+        self._closed = False
+        # Set while arduino-cli owns the port; the new sketch boots with nothing armed
+        self._uploading = False
+        self.stream = None
+        self.clock = ClockSync(self)
+        # Events the device still has to fire, as (host_ns, pin, state), and the pin levels
+        # the fired ones left behind; replayed after a reconnect (the board resets on open)
+        self._armed_lock = threading.Lock()
+        self._armed = []
+        self._armed_origin = 0
+        self._levels = {}
+        # Called as listener(armed, cleared) with a copy of the armed list after every change;
+        # cleared means STOP (or a new sketch) dropped the events and pulled every pin low
+        self.schedule_listeners = []
+        # Sequences stored on the device by storeSlot: slot -> {'sequence', 'events', 'payload'}
+        self.slots = {}
+        # Compiled sketches are reused across restarts; see updateCFile
+        self.firmware_cache = FirmwareCache(fqbn=device_info.get('fqbn', DEFAULT_FQBN))
+        # With pipelining a dedicated I/O thread owns the port and several commands can be in flight
+        self.pipeline = None
+        # True while a pipeline started by sendRepeated (not `pipelined`) reads the shot lines
+        self._repeat_pipeline = False
+        self.open_port()
+        # Shots completed in repeat mode (sendRepeated), counted across runs
         self.shotNumber = 0
-        self.data_publisher = DataPublisher(full_name=publisher_name, host=proxy_address, port=proxy_port)
+        self._shot_base = 0
+        self.repeat = None
+        self.publisher_name = publisher_name
+        # Without a publisher name (e.g. benchmarks against the emulator) nothing is published
+        self.data_publisher = None
+        self.publisher_worker = None
+        if publisher_name:
+            # Imported on first use so the core driver doesn't need pyleco
+            from pyleco.utils.data_publisher import DataPublisher
+            self.data_publisher = DataPublisher(full_name=publisher_name, host=proxy_address, port=proxy_port)
+            self.publisher_worker = PublisherWorker(self.data_publisher.send_data, merge=self.merge_payloads,
+                                                    max_queue=publisher_queue_size, overflow=publisher_overflow)
+        self._latency_stop = threading.Event()
+        if latency_publish_interval and self.publisher_worker is not None:
+            threading.Thread(target=self._publish_latency, args=(latency_publish_interval,), daemon=True).start()
+
+    def open_port(self):
+        """Open the serial port, wait for the sketch to come up and start the pipeline if enabled."""
+        self.arduino = Serial(self.device_port, 115200, timeout=self.response_timeout, rtscts=False, dsrdtr=False)
+        self.ready_time = self.wait_ready()
+        if self.ready_time is None:
+            print(f"Arduino on {self.device_port} did not answer within {self.ready_timeout} s.")
+        self.binary = False
+        if self.prefer_binary and self.ready_time is not None:
+            self.binary = self._negotiate_binary()
+        if self.pipelined or self._repeat_pipeline:
+            self._start_pipeline()
+
+    def _negotiate_binary(self) -> bool:
+        """Ask the sketch for binary event frames with "BIN;"; sketches without them stay on text.
+
+        Sketches from before binary frames take "BIN;" for an empty event list, so
+        this runs right after the (re)connect, before anything is armed.
+        """
+        response, _ = self._exchange("BIN;")
+        lines = response.splitlines()
+        match = BINARY_PATTERN.fullmatch(lines[-1]) if lines else None
+        return match is not None and int(match.group(1)) == BINARY_VERSION
+
+    def _start_pipeline(self):
+        self.pipeline = SerialPipeline(self.arduino, self.response_timeout, max_in_flight=self.max_in_flight,
+                                       on_notification=self._on_notification, on_failure=self._on_port_failure,
+                                       latency=self.latency, binary=self.binary)
+
+    def _on_port_failure(self, error: Exception):
+        """The pipeline's reader lost the port: reconnect in the background, even with nothing to send."""
+        if self._closed or not self.auto_reconnect:
+            return
+        generation = self._generation
+
+        def reconnect():
+            try:
+                self.reconnect(generation)
+            except ConnectionError as e:
+                print(e)
+
+        threading.Thread(target=reconnect, daemon=True).start()
+
+    def _on_notification(self, line: str):
+        if line == READY_BANNER:
+            print(f"Arduino on {self.device_port} was reset.")
+            return
+        match = SHOT_PATTERN.fullmatch(line)
+        if match:
+            # The device counts the shots of each repeat run from 1
+            self.shotNumber = self._shot_base + int(match.group(1))
+            self.send_data_async(self.make_metadata_payload(line, "", "shot", f"Shot {self.shotNumber} completed"))
+            repeat = self.repeat
+            if repeat is not None and repeat['count'] and int(match.group(1)) >= repeat['count']:
+                # Not on this thread: it may be the pipeline's reader or hold the I/O lock
+                threading.Thread(target=self._end_repeat, args=(repeat,), daemon=True).start()
+
+    def wait_ready(self, timeout: Optional[float] = None, probe_interval: float = 0.1) -> Optional[float]:
+        """Wait until the sketch answers after the reset that opening the port causes.
+
+        Returns the seconds waited as soon as the "READY" banner arrives, or None
+        after `timeout`. After each `probe_interval` without a banner a PING is
+        sent, which detects boards that did not reset or run firmware without the
+        banner (and makes the Uno's bootloader start the sketch right away).
+        """
+        if timeout is None:
+            timeout = self.ready_timeout
+        start = time.monotonic()
+        deadline = start + timeout
+        next_probe = start + probe_interval
+        port_timeout = self.arduino.timeout
+        partial = b""
+        ready = False
+        try:
+            while not ready:
+                now = time.monotonic()
+                if now >= deadline:
+                    return None
+                if now >= next_probe:
+                    self.arduino.write(frame_command("PING;"))
+                    next_probe = now + probe_interval
+                self.arduino.timeout = max(min(next_probe, deadline) - now, 0.001)
+                partial += self.arduino.read_until(b"\n")
+                *lines, partial = partial.split(b"\n")
+                for raw in lines:
+                    line = raw.decode(errors='ignore').strip()
+                    ready = ready or line == READY_BANNER or PONG_PATTERN.fullmatch(line) is not None
+            # Drop replies to probes that were still on their way
+            self.arduino.timeout = 0.02
+            while self.arduino.read(4096):
+                pass
+        finally:
+            self.arduino.timeout = port_timeout
+        return time.monotonic() - start
+
+    def reconnect(self, generation: Optional[int] = None):
+        """Reopen the port with exponential backoff and re-arm the events that had not fired yet.
+
+        `generation` is the connection a failed caller was using; if another thread
+        has reconnected since, nothing is done.
+        """
+        with self._reconnect_lock:
+            if generation is not None and generation != self._generation:
+                return
+            disconnected_ns = time.time_ns()
+            with self._armed_lock:
+                self._settle(disconnected_ns)
+            if self.pipeline is not None:
+                self.pipeline.close()
+                self.pipeline = None
+            self.arduino.close()
+            backoff = RECONNECT_BACKOFF_MIN
+            for attempt in range(1, self.reconnect_attempts + 1):
+                try:
+                    if not self._fixed_port:
+                        # The board may come back under another device name
+                        get_registry().invalidate()
+                        self.device_port = get_registry().port_for(self.serial_number)
+                    self.open_port()
+                    if self.ready_time is None:
+                        raise TimeoutError("no answer from the sketch")
+                    break
+                except (OSError, KeyError) as e:  # SerialException is an OSError
+                    print(f"Reconnect attempt {attempt} to {self.serial_number} failed: {e}")
+                    if self.pipeline is not None:
+                        self.pipeline.close()
+                        self.pipeline = None
+                    if getattr(self.arduino, 'is_open', False):
+                        self.arduino.close()
+                    if attempt == self.reconnect_attempts:
+                        raise ConnectionError(f"Could not reconnect to Arduino {self.serial_number}.") from e
+                    time.sleep(backoff)
+                    backoff = min(backoff * 2, RECONNECT_BACKOFF_MAX)
+            self._generation += 1
+            print(f"Reconnected to {self.device_port} after {attempt} attempt(s), "
+                  f"{(time.time_ns() - disconnected_ns) / 1e6:.0f} ms.")
+            # micros() restarted with the sketch, and RAM slots are gone
+            self.clock.reset()
+            for slot, stored in list(self.slots.items()):
+                self.write_to_device(f"S{slot};{stored['sequence']}")
+            self._replay_armed()
+            self._resume_repeat()
+
+    def close(self):
+        """Stop streaming and the I/O/publisher threads, then close the serial port."""
+        self._closed = True
+        self._latency_stop.set()
+        if self.stream is not None:
+            self.stream.cancel()
+        if self.pipeline is not None:
+            self.pipeline.close()
+        if self.publisher_worker is not None:
+            self.publisher_worker.close()
+        self.arduino.close()
     
-    def read_response(self):
-        start = time.time()
+    def read_response(self, timeout: Optional[float] = None):
+        """Read reply lines until the firmware's final confirmation line arrives.
+
+        Blocks on the port instead of polling and gives up after `timeout` seconds
+        (defaults to `response_timeout`), returning whatever was received so far.
+        """
+        if timeout is None:
+            timeout = self.response_timeout
+        hard_deadline = deadline = time.monotonic() + timeout
+        port_timeout = self.arduino.timeout
         lines = []
-        while time.time() - start < 0.1:  # Wait max 100ms
-            if self.arduino.in_waiting:
-                line = self.arduino.readline().decode(errors='ignore').strip()
-                if line:
-                    lines.append(line)
-            else:
-                time.sleep(0.001)
+        partial = b""
+        self._first_line_at = None
+        try:
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                if remaining < self.arduino.timeout:
+                    self.arduino.timeout = remaining
+                # A line split across USB packets can come back without its newline; keep reading it
+                partial += self.arduino.read_until(b"\n")
+                if not partial.endswith(b"\n"):
+                    continue
+                line, partial = partial.decode(errors='ignore').strip(), b""
+                if not line:
+                    continue
+                if is_notification(line):
+                    self._on_notification(line)
+                    continue
+                if not lines:
+                    self._first_line_at = time.perf_counter()
+                lines.append(line)
+                if is_final_response(line):
+                    break
+                if line == "0":
+                    # Non-DEBUG firmware: a "0" is either final or a per-event error
+                    # followed by "1"/"0", so only linger briefly for the latter.
+                    deadline = min(hard_deadline, time.monotonic() + NON_DEBUG_LINGER)
+        finally:
+            if self.arduino.timeout != port_timeout:
+                self.arduino.timeout = port_timeout
         return "\n".join(lines)
 
     def calculate_crc(self,data):
-        crc = 0
-        for char in data:
-            crc ^= ord(char)
-        return crc
+        return calculate_crc(data)
+
+    def submit(self, signal: str) -> Future:
+        """Send `signal` and return a Future for its reply, blocking only in pipelined mode's result()."""
+        if self.pipeline is not None:
+            return self.pipeline.submit(signal)
+        future = Future()
+        try:
+            future.set_result(self.write_to_device(signal))
+        except Exception as e:
+            future.set_exception(e)
+        return future
         
-    def write_to_device(self, signal: str):
-        crc = self.calculate_crc(signal)
-        signal = f"<{signal}{crc}>"
-        self.arduino.write(signal.encode('utf-8'))
-        self.arduino.flush()
-
-        # Wait only until a response is available (up to 50ms)
-        timeout_ms = 50
-        wait_time = 0
-        while not self.arduino.in_waiting and wait_time < timeout_ms:
-            time.sleep(0.001)
-            wait_time += 1
-
-        return self.read_response()
+    def write_to_device(self, signal: Union[str, EventBlock]):
+        """Send a command string, or an EventBlock whose cached frame and offsets are reused.
+
+        A block with a timestamp is sent as "@<device µs>;<events>", anchored to that
+        host time through the clock sync when it is sent.
+        """
+        block = None
+        if isinstance(signal, EventBlock):
+            block, signal = signal, signal.command
+            if block.timestamp is not None:
+                signal = f"@{self._device_time(block.timestamp)};{signal}"
+        frames = block if block is not None and block.timestamp is None else None
+        response, received_ns = self._with_reconnect(self._exchange, signal, frames)
+        self._track_armed(signal, response, received_ns, block)
+        return response
+
+    def write_raw(self, data: bytes):
+        """Write unframed bytes that get no reply (e.g. b"!3"), in order with framed commands."""
+        return self._with_reconnect(self._write_raw, data)
+
+    def _device_time(self, timestamp: int) -> int:
+        """Device time (µs) of host time `timestamp` (ns), syncing the clock first if it is stale."""
+        if self.clock.is_stale():
+            self.clock.sync()
+        return self.clock.to_device_us(timestamp)
+
+    def _with_reconnect(self, func, *args):
+        generation = self._generation
+        try:
+            return func(*args)
+        except OSError as e:  # SerialException is an OSError
+            if self._closed or not self.auto_reconnect:
+                raise
+            print(f"Serial error on {self.device_port}: {e}")
+            self.reconnect(generation)
+            return func(*args)
+
+    def _exchange(self, signal: str, block: Optional[EventBlock] = None):
+        """Send one command; returns the reply and the host time (ns) the device got it, roughly."""
+        sent_ns = time.time_ns()
+        kind = command_type(signal)
+        start = time.perf_counter()
+        if self.pipeline is not None:
+            # The pipeline records the queue/first_line/response stages itself
+            response = self.pipeline.submit(signal).result()
+        else:
+            frame = None
+            if self.binary:
+                frame = block.binary_frame if block is not None else binary_frame_command(signal)
+            if frame is None:
+                frame = block.frame if block is not None else frame_command(signal)
+            encoded = time.perf_counter()
+            with self._io_lock:
+                locked = time.perf_counter()
+                self.arduino.write(frame)
+                self.arduino.flush()
+                written = time.perf_counter()
+                response = self.read_response()
+                done = time.perf_counter()
+                first_line = self._first_line_at
+            self.latency.record(kind, "encode", encoded - start)
+            self.latency.record(kind, "queue", locked - encoded)
+            self.latency.record(kind, "write", written - locked)
+            if first_line is not None:
+                self.latency.record(kind, "first_line", first_line - written)
+            self.latency.record(kind, "response", done - written)
+        self.latency.record(kind, "total", time.perf_counter() - start)
+        return response, (sent_ns + time.time_ns()) // 2
+
+    def _write_raw(self, data: bytes):
+        sent_ns = time.time_ns()
+        if self.pipeline is not None:
+            self.pipeline.write_raw(data).result()
+        else:
+            with self._io_lock:
+                self.arduino.write(data)
+                self.arduino.flush()
+        return sent_ns + int(len(data) * self.clock.byte_time_ns)
+
+    def _track_armed(self, signal: str, response: str, received_ns: int, block: Optional[EventBlock] = None):
+        """Mirror the device's event list on the host so it can be replayed after a reset."""
+        if signal.startswith("STOP;"):
+            with self._armed_lock:
+                self._armed = []
+                self._levels = {}
+            self._notify_schedule(cleared=True)
+            return
+        lines = response.splitlines()
+        if signal.startswith("S") or not lines or not (lines[-1].startswith("OK:") or lines[-1] == "1"):
+            return  # Storing a slot doesn't touch the event list
+        if signal.startswith("F"):
+            stored = self.slots.get(int(signal[1:signal.index(";")]))
+            if stored is not None:
+                self._arm(stored['events'], received_ns)
+            return
+        events = block.offsets if block is not None else parse_event_offsets(signal)
+        append = signal.startswith("+")
+        body = signal[1:] if append else signal
+        origin_ns = received_ns
+        if body.startswith("@"):
+            if self.clock.last_sync:
+                origin_ns = self.clock.to_host_ns(int(body[1:body.index(";")]))
+            body = body[body.index(";") + 1:]
+        if body.startswith("R"):
+            # A repeat run replaces the event list; it is resumed by _resume_repeat instead
+            self._arm([], origin_ns)
+            if self.repeat is not None:
+                self.repeat['start_ns'] = origin_ns
+        elif events:
+            self._arm(events, None if append and not signal[int(append):].startswith("@") else origin_ns, append)
+
+    def _arm(self, events, origin_ns: Optional[int], append: bool = False):
+        """Record (offset_ns, pin, state) events from `origin_ns` (None: the current origin)."""
+        with self._armed_lock:
+            self._settle(time.time_ns())
+            if origin_ns is not None:
+                self._armed_origin = origin_ns
+            if not append:
+                self._armed = []
+            self._armed.extend((self._armed_origin + offset_ns, pin, state) for offset_ns, pin, state in events)
+            self._armed.sort()
+        self._notify_schedule()
+
+    def _notify_schedule(self, cleared: bool = False):
+        if not self.schedule_listeners:
+            return
+        with self._armed_lock:
+            armed = list(self._armed)
+        for listener in list(self.schedule_listeners):
+            try:
+                listener(armed, cleared)
+            except Exception as e:
+                print(f"Schedule listener error: {e}")
+
+    def _settle(self, now_ns: int):
+        """Move armed events that are due by `now_ns` into the pin levels (call with _armed_lock held)."""
+        fired = 0
+        for due_ns, pin, state in self._armed:
+            if due_ns > now_ns:
+                break
+            self._levels[pin] = state
+            fired += 1
+        del self._armed[:fired]
+        return fired
+
+    def _replay_armed(self):
+        """Restore the pin levels and re-arm the remaining events on a freshly reset device."""
+        with self._armed_lock:
+            missed = self._settle(time.time_ns())
+            high = sorted(pin for pin, state in self._levels.items() if state)
+            pending = list(self._armed)
+        if missed:
+            print(f"{missed} events fell due while disconnected; their final pin levels are restored.")
+        if not high and not pending:
+            return
+        if len(high) + len(pending) > MAX_EVENTS:
+            print(f"Only {MAX_EVENTS - len(high)} of {len(pending)} pending events can be re-armed.")
+            pending = pending[:MAX_EVENTS - len(high)]
+        self.clock.sync()
+        start_ns = time.time_ns() + int(REPLAY_MARGIN * 1e9)
+        sequence = "".join(f"({pin},0u,1);" for pin in high)
+        sequence += "".join(f"({pin},{max(due_ns - start_ns, 0) // 1000}u,{state});" for due_ns, pin, state in pending)
+        response = self.write_to_device(f"@{self.clock.to_device_us(start_ns)};{sequence}")
+        print(f"Re-armed {len(pending)} events and {len(high)} high pins: {response}")
     
     def stop(self):
+        if self.stream is not None:
+            self.stream.cancel()
+        self._end_repeat()
+        if self._uploading:
+            # Reopening the port now would break the upload; the new sketch starts stopped
+            return "Upload in progress, nothing armed."
         response = self.write_to_device("STOP;")
         print(response)
 
@@ -90,69 +511,95 @@ class ArduinoTrigger:
         self.send_data_async(payload)
         return response
     
-    def createRisingEdge(self, pin: int, delay: Optional[int] = None, timestamp: Optional[int] = None):
+    def createRisingEdge(self, pin: int, delay: Optional[int] = None, timestamp: Optional[int] = None, unit: str = "ms"):
         if delay is None and timestamp is None:
             raise ValueError("Either 'delay' or 'timestamp' must be provided.")
-        return RisingEdge(pin=pin, delay=delay, timestamp=timestamp).command
+        return self._anchored(RisingEdge(pin=pin, delay=delay, timestamp=timestamp, unit=unit))
     
-    def createFallingEdge(self, pin: int, delay: Optional[int] = None, timestamp: Optional[int] = None):
+    def createFallingEdge(self, pin: int, delay: Optional[int] = None, timestamp: Optional[int] = None, unit: str = "ms"):
         if delay is None and timestamp is None:
             raise ValueError("Either 'delay' or 'timestamp' must be provided.")
-        return FallingEdge(pin=pin, delay=delay, timestamp=timestamp).command
+        return self._anchored(FallingEdge(pin=pin, delay=delay, timestamp=timestamp, unit=unit))
     
-    def createPulse(self, pin: int, width: int, delay: Optional[int] = None, timestamp: Optional[int] = None):
+    def createPulse(self, pin: int, width: int, delay: Optional[int] = None, timestamp: Optional[int] = None, unit: str = "ms"):
         if delay is None and timestamp is None:
             raise ValueError("Either 'delay' or 'timestamp' must be provided.")
-        return Pulse(pin=pin, width=width, delay=delay, timestamp=timestamp).command
+        return self._anchored(Pulse(pin=pin, width=width, delay=delay, timestamp=timestamp, unit=unit))
+
+    def createPulseTrain(self, pins, delays, widths, timestamp: Optional[int] = None, unit: str = "ms"):
+        return self._anchored(PulseTrain(pins=pins, delays=delays, widths=widths, timestamp=timestamp, unit=unit))
+
+    def _anchored(self, event) -> str:
+        """The command of `event`; with a timestamp, "@<device µs>;" and its events relative to it.
+
+        The timestamp is converted to device time here, so the command fires at it however
+        late it is sent. Such commands can't be concatenated; combine the event objects.
+        """
+        block = as_event_block(event)
+        if block.timestamp is None:
+            return event.command
+        return f"@{self._device_time(block.timestamp)};{block.command}"
     
-    def sendRisingEdge(self, event: str):
+    def sendRisingEdge(self, event: Union[str, EventBlock, dict]):
+        block = as_event_block(event)
+        if block is not None:
+            return self.sendEvents(block)
         response = self.write_to_device(event)
         print(response)
 
-        match = RISING_FALLING_PATTERN.match(event)
+        match = RISING_FALLING_PATTERN.search(event)
         if match:
             pin = int(match.group(1))
-            delay = int(match.group(2))
+            delay = time_to_ms(match.group(2))
 
         # Tell proxy server we have issued a command
         payload = self.make_metadata_payload(event, response, "send_rising_edge", 
-                                             f"Sending a rising edge to pin {pin} with delay of {delay} ms")
+                                             f"Sending a rising edge to pin {pin} with delay of {delay:g} ms")
         self.send_data_async(payload)
         return response
     
-    def sendFallingEdge(self, event: str):
+    def sendFallingEdge(self, event: Union[str, EventBlock, dict]):
+        block = as_event_block(event)
+        if block is not None:
+            return self.sendEvents(block)
         response = self.write_to_device(event)
         print(response)
 
-        match = RISING_FALLING_PATTERN.match(event)
+        match = RISING_FALLING_PATTERN.search(event)
         if match:
             pin = int(match.group(1))
-            delay = int(match.group(2))
+            delay = time_to_ms(match.group(2))
         
         # Tell proxy server we have issued a command
         payload = self.make_metadata_payload(event, response, "send_falling_edge", 
-                                             f"Sending a falling edge to pin {pin} with delay of {delay} ms")
+                                             f"Sending a falling edge to pin {pin} with delay of {delay:g} ms")
         self.send_data_async(payload)
         return response
 
-    def sendPulse(self, pulse: str):
+    def sendPulse(self, pulse: Union[str, EventBlock, dict]):
+        block = as_event_block(pulse)
+        if block is not None:
+            return self.sendEvents(block)
         response = self.write_to_device(pulse)
         print(response)
 
-        match = PULSE_SEQUENCE_PATTERN.match(pulse)
+        match = PULSE_SEQUENCE_PATTERN.search(pulse)
         if match:
             pin = int(match.group(1))
-            delay = int(match.group(2))
-            delay2 = int(match.group(3))
+            delay = time_to_ms(match.group(2))
+            delay2 = time_to_ms(match.group(3))
             width = delay2 - delay
         
         # Tell proxy server we have issued a command
         payload = self.make_metadata_payload(pulse, response, "send_pulse", 
-                                             f"Sending a pulse to pin {pin} with delay of {delay} ms and pulse width of {width} ms")
+                                             f"Sending a pulse to pin {pin} with delay of {delay:g} ms and pulse width of {width:g} ms")
         self.send_data_async(payload)
         return response
     
-    def sendSyncPulseAndEdge(self, event: str):
+    def sendSyncPulseAndEdge(self, event: Union[str, EventBlock, dict]):
+        block = as_event_block(event)
+        if block is not None:
+            return self.sendEvents(block)
         response = self.write_to_device(event)
         print(response)
         payload = self.make_metadata_payload(event, response, "send_sync_pulse_and_edge",
@@ -160,7 +607,10 @@ class ArduinoTrigger:
         self.send_data_async(payload)
         return response
 
-    def sendPulseSequence(self, sequence: str):
+    def sendPulseSequence(self, sequence: Union[str, EventBlock, dict]):
+        block = as_event_block(sequence)
+        if block is not None:
+            return self.sendEvents(block)
         response = self.write_to_device(sequence)
         print(response)
 
@@ -171,8 +621,8 @@ class ArduinoTrigger:
         widths = []
         for match in matches:
             pin = int(match[0])
-            delay = int(match[1])
-            delay2 = int(match[2])
+            delay = time_to_ms(match[1])
+            delay2 = time_to_ms(match[2])
             width = delay2 - delay
             delays.append(delay)
             widths.append(width)
@@ -186,23 +636,275 @@ class ArduinoTrigger:
 
         return response
 
+    def sendEvents(self, events: Union[EventBlock, dict]):
+        """Send an EventBlock (or its to_dict() form); its metadata needs no re-parsing."""
+        block = as_event_block(events).check_capacity()
+        response = self.write_to_device(block)
+        print(response)
+
+        payload = self.make_metadata_payload(block.command, response, block.kind, block.description)
+        self.send_data_async(payload)
+        return response
+
+    def batchEvents(self, specs: List[dict]) -> EventBlock:
+        """The events of all `specs` (see encodeBatch) as one EventBlock, validated together."""
+        blocks = []
+        for spec in specs:
+            spec = dict(spec)
+            kind = spec.pop("type", None)
+            if kind == "sequence":
+                blocks.append(EventBlock.from_command(spec["sequence"]))
+            elif kind in BATCH_EVENT_TYPES:
+                blocks.append(BATCH_EVENT_TYPES[kind](**spec).events)
+            else:
+                raise ValueError(f"Batch spec type must be 'sequence' or one of {tuple(BATCH_EVENT_TYPES)}, not {kind!r}.")
+        return EventBlock.concat(blocks, kind="send_batch",
+                                 description=f"Sending a batch of {len(specs)} specs ({sum(map(len, blocks))} events)")
+
+    def encodeBatch(self, specs: List[dict]) -> str:
+        """Encode event specs, e.g. [{'type': 'pulse', 'pin': 2, 'width': 5, 'delay': 10}, ...], as one command.
+
+        'type' is one of BATCH_EVENT_TYPES, or 'sequence' with an already encoded 'sequence'.
+        Specs with timestamps give an anchored command, as in createPulse.
+        """
+        return self._anchored(self.batchEvents(specs))
+
+    def sendBatch(self, specs: List[dict], timestamp: Optional[int] = None):
+        """Arm all `specs` (see encodeBatch) with a single device write.
+
+        With `timestamp` (host time_ns()) the spec delays are relative to it, as in
+        sendAtTimestamp; specs can also carry their own timestamps instead.
+        Batches of more than MAX_EVENTS events are streamed.
+        Returns {'response', 'events', 'specs'} for the whole batch.
+        """
+        block = self.batchEvents(specs)
+        if timestamp is not None:
+            if block.timestamp is not None:
+                raise ValueError("Give either a batch timestamp or spec timestamps, not both.")
+            block.timestamp = timestamp
+        if len(block) > MAX_EVENTS:
+            if block.timestamp is not None:
+                raise ValueError(f"Timestamped batches are limited to {MAX_EVENTS} events.")
+            response = self.streamSequence(block.command)
+        else:
+            response = self.write_to_device(block)
+        print(response)
+
+        payload = self.make_metadata_payload(block.command, response, block.kind, block.description)
+        self.send_data_async(payload)
+        return {'response': response, 'events': len(block), 'specs': len(specs)}
+
+    def syncClock(self, samples: int = 8):
+        """Measure offset, round trip and drift between host time_ns() and device micros()."""
+        result = self.clock.sync(samples)
+        print(result)
+        return result
+
+    def sendAtTimestamp(self, sequence: str, timestamp: int):
+        """Schedule `sequence` with its delays relative to absolute host time `timestamp` (ns).
+
+        The timestamp is converted to device time when sending, so serial transit and
+        queueing before this call no longer shift the events.
+        """
+        device_time = self._device_time(timestamp)
+        response = self.write_to_device(f"@{device_time};{sequence}")
+        print(response)
+
+        num_events = len(RISING_FALLING_PATTERN.findall(sequence))
+        payload = self.make_metadata_payload(sequence, response, "send_at_timestamp",
+                                             f"Sending {num_events} events relative to timestamp {timestamp} ns (device time {device_time} us)")
+        self.send_data_async(payload)
+        return response
+
+    def sendRepeated(self, sequence: str, period: int, count: int = 0, unit: str = "ms",
+                     slot: int = NUM_SLOTS - 1):
+        """Let the device replay `sequence` every `period` (in `unit`), `count` times or until STOP (0).
+
+        The sequence is stored in `slot` (skipped if it already holds it) and the device
+        runs the shots on its own clock; a slot holding another sequence from storeSlot
+        is refused. Each completed shot comes back as "D<n>", which updates `shotNumber`
+        and is published. Without `pipelined`, a pipeline reads those lines as they arrive
+        until the run ends or stop().
+        """
+        check_unit(unit)
+        events = parse_event_offsets(sequence)
+        if not events:
+            raise ValueError("sequence has no events.")
+        period_ns = period * NS_PER_UNIT[unit]
+        if max(offset_ns for offset_ns, _, _ in events) > period_ns:
+            raise ValueError("The sequence is longer than the period.")
+        stored = self.slots.get(slot)
+        if stored is None or stored['sequence'] != sequence:
+            if stored is not None and not stored.get('repeat'):
+                raise ValueError(f"Slot {slot} holds another sequence stored with storeSlot; pass a free slot.")
+            if self.repeat is not None and self.repeat['slot'] == slot:
+                # The device refuses to replace the slot it is repeating
+                self.write_to_device("STOP;")
+                self.repeat = None
+            self.storeSlot(slot, sequence)
+            if slot in self.slots:
+                # Ours to replace by the next sendRepeated
+                self.slots[slot]['repeat'] = True
+        if self.pipeline is None:
+            with self._io_lock:
+                self._start_pipeline()
+                self._repeat_pipeline = True
+        self._shot_base = self.shotNumber
+        self.repeat = {'slot': slot, 'period_us': period_ns // 1000, 'count': count, 'start_ns': None}
+        response = self.write_to_device(f"R{slot},{period_ns // 1000}u,{count};")
+        print(response)
+        if is_error_response(response):
+            self._end_repeat()
+        payload = self.make_metadata_payload(sequence, response, "send_repeated",
+                                             f"Repeating {len(events)} events every {period} {unit}, "
+                                             f"{count or 'unlimited'} times")
+        self.send_data_async(payload)
+        return response
+
+    def _resume_repeat(self):
+        """Continue an interrupted repeat run in phase with its original schedule."""
+        repeat = self.repeat
+        if repeat is None or repeat['start_ns'] is None:
+            return
+        done = self.shotNumber - self._shot_base
+        if repeat['count'] and done >= repeat['count']:
+            self._end_repeat()
+            return
+        period_ns = repeat['period_us'] * 1000
+        start_ns = time.time_ns() + int(REPLAY_MARGIN * 1e9)
+        # Next shot on the original grid; shots that fell due while disconnected are skipped
+        shots = -(-(start_ns - repeat['start_ns']) // period_ns)
+        next_ns = repeat['start_ns'] + shots * period_ns
+        count = repeat['count'] - done if repeat['count'] else 0
+        self.clock.sync()
+        self._shot_base = self.shotNumber
+        response = self.write_to_device(f"@{self.clock.to_device_us(next_ns)};"
+                                        f"R{repeat['slot']},{repeat['period_us']}u,{count};")
+        repeat['start_ns'] = next_ns
+        # The device counts the resumed run's shots from 1 again
+        repeat['count'] = count
+        print(f"Resumed repeat of slot {repeat['slot']} ({count or 'unlimited'} shots left): {response}")
+
+    def _end_repeat(self, repeat: Optional[dict] = None):
+        """Forget the repeat run (only if it is still `repeat`) and close the pipeline it started."""
+        if repeat is not None and self.repeat is not repeat:
+            return
+        self.repeat = None
+        if self._repeat_pipeline:
+            with self._io_lock:
+                self._repeat_pipeline = False
+                pipeline, self.pipeline = self.pipeline, None
+            if pipeline is not None:
+                pipeline.close()
+
+    def storeSlot(self, slot: int, sequence: str):
+        """Upload `sequence` once into device slot `slot`; fireSlot() then starts it with two bytes.
+
+        Delays are relative to the fire command. A slot holds up to MAX_EVENTS events
+        and all slots share 2 * MAX_EVENTS. Slots live in the sketch's RAM (EEPROM
+        with SLOT_EEPROM) and are restored by the driver after a reconnect.
+        The slot of a running repeat run (sendRepeated) can't be replaced until STOP.
+        """
+        if not 0 <= slot < NUM_SLOTS:
+            raise ValueError(f"slot must be between 0 and {NUM_SLOTS - 1}.")
+        if self.repeat is not None and self.repeat['slot'] == slot:
+            raise ValueError(f"Slot {slot} is being repeated; stop() first.")
+        response = self.write_to_device(f"S{slot};{sequence}")
+        print(response)
+        if is_error_response(response):
+            self.slots.pop(slot, None)
+        else:
+            events = parse_event_offsets(sequence)
+            # Built once here, so firing doesn't redo the per-shot parsing
+            self.slots[slot] = {'sequence': sequence, 'events': events,
+                                'payload': self.make_metadata_payload(f"!{slot}", "", "fire_slot",
+                                                                      f"Firing slot {slot} ({len(events)} events)")}
+        payload = self.make_metadata_payload(sequence, response, "store_slot",
+                                             f"Storing {len(RISING_FALLING_PATTERN.findall(sequence))} events in slot {slot}")
+        self.send_data_async(payload)
+        return response
+
+    def fireSlot(self, slot: int, confirm: bool = False):
+        """Start the sequence stored in `slot`, replacing the scheduled events.
+
+        By default this writes the unframed two bytes "!<n>", which get no reply.
+        With `confirm` the CRC-checked "F<n>;" is sent instead and its reply returned.
+        """
+        stored = self.slots.get(slot)
+        if stored is None:
+            raise KeyError(f"Slot {slot} has not been stored.")
+        if confirm:
+            response = self.write_to_device(f"F{slot};")
+        else:
+            self._arm(stored['events'], self.write_raw(f"!{slot}".encode()))
+            response = ""
+        self.send_data_async(stored['payload'])
+        return response
+
+    def streamSequence(self, sequence: str, blocking: bool = False):
+        """Play a sequence of any length by refilling the device's event buffer as events fire."""
+        if self.stream is not None:
+            self.stream.cancel()
+        self.stream = StreamingScheduler(self)
+        num_events = len(RISING_FALLING_PATTERN.findall(sequence))
+        payload = self.make_metadata_payload(sequence, "", "send_stream",
+                                             f"Streaming a sequence of {num_events} events")
+        self.send_data_async(payload)
+        if blocking:
+            report = self.stream.play(sequence)
+            print(report)
+            return report
+        self.stream.start(sequence)
+        return f"Streaming {num_events} events"
+
     def send_data_async(self, payload):
-        if self.data_publisher is None:
+        if self.publisher_worker is None:
             return
+        start = time.perf_counter()
+        self.publisher_worker.put(payload)
+        self.latency.record("publish", "put", time.perf_counter() - start)
 
-        def send():
-            try:
-                self.data_publisher.send_data(payload)
-            except Exception as e:
-                print(f"[send_data_async] Error: {e}")
+    @property
+    def latency_stats(self):
+        """p50/p90/p99/max per command type and stage, plus the publisher worker's counters.
+
+        Stages: encode (framing + CRC), queue (waiting for the port), write (write +
+        flush), first_line and response (from the end of the write), total (the whole
+        write_to_device). Actor RPCs appear under their method names.
+        """
+        stats = self.latency.summary()
+        stats['publisher'] = self.publisher_stats()
+        return stats
+
+    def resetLatencyStats(self):
+        self.latency.reset()
+        return "Latency statistics reset"
 
-        thread = threading.Thread(target=send)
-        thread.daemon = True
-        thread.start()
+    def _publish_latency(self, interval: float):
+        while not self._latency_stop.wait(interval):
+            self.send_data_async({self.publisher_name: {'latency': self.latency.summary(),
+                                                        'message_type': 'latency_stats',
+                                                        'serial_number': self.serial_number}})
+
+    def publisher_stats(self):
+        """Counters (queued, sent, dropped, ...) and send latency of the publisher worker."""
+        if self.publisher_worker is None:
+            return {}
+        return self.publisher_worker.stats()
+
+    def merge_payloads(self, payloads: List[dict]):
+        """Coalesce several metadata payloads into one 'trigger_batch' message."""
+        return {
+            self.publisher_name: {
+                'messages': [payload[self.publisher_name] for payload in payloads],
+                'message_type': 'trigger_batch',
+                'serial_number': self.serial_number
+            }
+        }
 
     def make_metadata_payload(self, command: str, response: str, msg_type: str, description: str):
         return {
-            self.data_publisher.full_name: {
+            self.publisher_name: {
                 'metadata': {
                     'trigger_command': command,
                     'response': response,
@@ -214,68 +916,171 @@ class ArduinoTrigger:
             }
         }
 
-    def updateCFile(self, CFilePath: str):
-        self.compileCFile(CFilePath)
+    def firmwareId(self) -> Optional[int]:
+        """FIRMWARE_ID of the running sketch (0 for builds made outside the cache), None if not supported."""
+        lines = self.write_to_device("ID;").splitlines()
+        match = ID_PATTERN.fullmatch(lines[-1]) if lines else None
+        return int(match.group(1), 16) if match else None
+
+    def updateCFile(self, CFilePath: str, force: bool = False):
+        firmware_id, cached = self.compileCFile(CFilePath, force=force)
+        if firmware_id is None:
+            return "Arduino sketch compilation failed"
+        if not force and self.firmwareId() == firmware_id:
+            info = f"Arduino already runs firmware {firmware_id:08X}, upload skipped"
+            print(info)
+            return info
         self.uploadCompiledFile()
-        QtCore.QThread.msleep(2000)
-        info = "Arduino sketch compiled and uploaded successfully"
+        info = f"Arduino sketch {'taken from cache' if cached else 'compiled'} and uploaded successfully"
         return info
 
-    def compileCFile(self, CFilePath: str):
-        # Initialize Arduino CLI
-        cli = arduino = pyduinocli.Arduino("arduino-cli")
-
-        # Define the sketch directory and output paths
+    def compileCFile(self, CFilePath: str, force: bool = False):
+        """Build the sketch through the firmware cache; returns (firmware_id, cached) or (None, False)."""
         sketch_dir = os.path.dirname(CFilePath)
-        self.compiledHexPath = CFilePath.replace(".ino", ".hex")  # For uploading
-
+        self.sketchDir = sketch_dir
         try:
-            # Compile the sketch
-            cli.compile(sketch = sketch_dir,  fqbn="arduino:avr:uno", output_dir=os.path.dirname(self.compiledHexPath))
-            print("Compilation successful.")
+            self.compiledDir, firmware_id, cached = self.firmware_cache.build(sketch_dir, force=force)
+            print("Using cached build." if cached else "Compilation successful.")
         except Exception as e:
             print(f"Compilation failed: {str(e)}")
+            self.compiledDir = None
+            return None, False
+        self.compiledHexPath = os.path.join(self.compiledDir, os.path.basename(CFilePath) + ".hex")
+        return firmware_id, cached
 
     def uploadCompiledFile(self):
-        if hasattr(self, 'compiledHexPath') and self.compiledHexPath:
-            cli = pyduinocli.Arduino("arduino-cli")
+        if getattr(self, 'compiledDir', None):
+            import pyduinocli
+            cli = pyduinocli.Arduino(self.firmware_cache.cli_path)
             try:
+                self._uploading = True
                 # Close the serial port if it's open
+                if self.pipeline is not None:
+                    self.pipeline.close()
+                    self.pipeline = None
                 if hasattr(self, 'arduino') and self.arduino and self.arduino.is_open:
                     print("Closing serial port to allow upload...")
                     self.arduino.close()
-                    time.sleep(1)
 
-                # Upload via arduino-cli
-                cli.upload(sketch=os.path.dirname(self.compiledHexPath), fqbn="arduino:avr:uno", port=self.device_port)
+                # Upload the cached build via arduino-cli
+                cli.upload(sketch=self.sketchDir, fqbn=self.firmware_cache.fqbn, port=self.device_port,
+                           input_dir=self.compiledDir)
                 print("Upload successful.")
 
-                # Reopen serial port after upload
-                self.arduino = Serial(self.device_port, 115200, timeout=1, rtscts=False, dsrdtr=False)
-                time.sleep(2)
-                self.arduino.reset_input_buffer()
+                # Reopen serial port after upload; the new sketch starts with no events and a new clock
+                self.open_port()
+                self.clock.reset()
+                with self._armed_lock:
+                    self._armed = []
+                    self._levels = {}
+                self._notify_schedule(cleared=True)
+                self.slots = {}
 
             except Exception as e:
                 print(f"Upload failed: {str(e)}")
+            finally:
+                self._uploading = False
+
+class StreamingScheduler:
+    """Plays event sequences longer than the firmware's MAX_EVENTS buffer.
+
+    The first MAX_EVENTS events (in time order) go out as a normal command, which
+    restarts the device's event list and time base. The rest follow in windows of
+    `window` events with the "+" append command, each sent as soon as enough
+    already-sent events have fired to free its slots. With the default
+    `window = MAX_EVENTS // 2` this is double buffering. Fire times are tracked
+    from when the first reply arrived. That is never earlier than the device's own
+    origin, so the host never overfills the buffer. `margin` (s) adds slack for
+    clock drift. Windows whose first event is due before the append can land
+    are counted as underruns; those events fire late rather than being dropped.
+    """
+
+    def __init__(self, trigger: "ArduinoTrigger", window: int = MAX_EVENTS // 2, margin: float = 0.002):
+        if not 0 < window <= MAX_EVENTS:
+            raise ValueError(f"window must be between 1 and {MAX_EVENTS}.")
+        self.trigger = trigger
+        self.window = window
+        self.margin = margin
+        self.report = {}
+        self._cancelled = threading.Event()
+        self._thread = None
+
+    @staticmethod
+    def parse_events(sequence: str):
+        events = [(round(time_to_ms(delay) * 1000), int(pin), int(state))
+                  for pin, delay, state in RISING_FALLING_PATTERN.findall(sequence)]
+        events.sort(key=lambda event: event[0])
+        return events
+
+    @staticmethod
+    def encode_events(events) -> str:
+        return "".join(f"({pin},{delay_us}u,{state});" for delay_us, pin, state in events)
+
+    def start(self, sequence: str):
+        self._thread = threading.Thread(target=self.play, args=(sequence,), daemon=True)
+        self._thread.start()
+
+    def cancel(self):
+        self._cancelled.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout=1.0)
+
+    def play(self, sequence: str) -> dict:
+        events = self.parse_events(sequence)
+        self.report = {'events': len(events), 'windows': 0, 'underruns': 0, 'errors': [], 'completed': False}
+        if not events:
+            return self.report
+
+        sent = min(len(events), MAX_EVENTS)
+        response = self.trigger.write_to_device(self.encode_events(events[:sent]))
+        origin = time.monotonic()
+        self.report['windows'] = 1
+        if is_error_response(response) or not response:
+            self.report['errors'].append(response)
+        lead = 0.0
+
+        while sent < len(events) and not self._cancelled.is_set():
+            window = events[sent:sent + self.window]
+            # Slots are free once all but MAX_EVENTS - len(window) sent events have fired
+            must_have_fired = sent - MAX_EVENTS + len(window)
+            if must_have_fired > 0:
+                ready_at = origin + events[must_have_fired - 1][0] / 1e6 + self.margin
+                if self._cancelled.wait(max(ready_at - time.monotonic(), 0)):
+                    break
+            start = time.monotonic()
+            if origin + window[0][0] / 1e6 < start + lead:
+                self.report['underruns'] += 1
+            response = self.trigger.write_to_device("+" + self.encode_events(window))
+            lead = time.monotonic() - start
+            if is_error_response(response) or not response:
+                self.report['errors'].append(response)
+            sent += len(window)
+            self.report['windows'] += 1
+
+        self.report['completed'] = sent == len(events) and not self._cancelled.is_set()
+        return self.report
+
 
 if __name__ == "__main__":
     # Create an instance on file execution
-    arduino_ports = find_arduino_ports()
-    print(arduino_ports)
-    if arduino_ports:
-        devices = find_arduino_ports()
-        device_port = devices["ports"][0]
-        pins = {"Pin1": 0, "Pin2": 1, "Pin3": 2, "Pin4": 3, "Pin5": 4, "Pin6": 5}
-        pins_to_letter = {"Pin1": "E", "Pin2": "F", "Pin3": "A", "Pin4": "B", "Pin5": "C", "Pin6": "D"}
+    devices = find_arduino_ports()
+    print(devices)
+    pins = {"Pin1": 0, "Pin2": 1, "Pin3": 2, "Pin4": 3, "Pin5": 4, "Pin6": 5}
+    pins_to_letter = {"Pin1": "E", "Pin2": "F", "Pin3": "A", "Pin4": "B", "Pin5": "C", "Pin6": "D"}
+    # Every connected board gets the sketch, one after the other
+    for device_port, serial_number in zip(devices["ports"], devices["serial_numbers"]):
         device_info = {
-            "port": devices["ports"][0],
-            "serial_number": devices["serial_numbers"][0],
+            "port": device_port,
+            "serial_number": serial_number,
             "pins": pins,
             "pins_to_letter": pins_to_letter
         }
         trigger = ArduinoTrigger(device_info, "test", "192.168.178.15", 11100)
         print(f"Arduino trigger initialized on port {device_port} with pins {pins}")
-        trigger.updateCFile("/home/ccabello/Documents/PCO/M2-Internship/arduino_trigger/arduino/arduino.ino")
+        try:
+            trigger.updateCFile("/home/ccabello/Documents/PCO/M2-Internship/arduino_trigger/arduino/arduino.ino")
+        finally:
+            trigger.close()
         print(f"Arduino trigger on port {device_port} closed")
-    else:
-        print("No Arduino devices found.")
\ No newline at end of file
+    if not devices["ports"]:
+        print("No Arduino devices found.")
@@ -1,18 +1,31 @@
 from pyleco.actors.actor import Actor
-from trigger import ArduinoTrigger, find_arduino_ports
+from trigger import ArduinoTrigger
+from trigger_fleet import TriggerFleet
+from device_worker import DeviceWorker
 import pyleco.utils.events as plev
-from threading import Thread, Event
+from collections import deque
+from threading import Thread, Event, local
+from typing import Any, Optional, Sequence
+import functools
+import json
+import socket
+import time
+import zmq
+
+# Device calls that skip the queue of pending device calls (and cancel it)
+PRIORITY_ACTIONS = {"stop"}
 
 # Parameters
-ports = find_arduino_ports()
 pins = {"Pin1": 0, "Pin2": 1, "Pin3": 2, "Pin4": 3, "Pin5": 4, "Pin6": 5}
 pins_to_letter = {"Pin1": "E", "Pin2": "F", "Pin3": "A", "Pin4": "B", "Pin5": "C", "Pin6": "D"}
 
 class ArduinoActor(Actor):
     def __init__(self, name: str, device_info: dict, publisher_name: str, proxy_address: str, proxy_port: int, **kwargs):
         super().__init__(name=name, device_class=ArduinoTrigger, **kwargs)
+        self._init_dispatch()
         self.connect(device_info=device_info, publisher_name=publisher_name, proxy_address=proxy_address, proxy_port=proxy_port)
-        self.device_port = device_info['port']
+        # The port may have been resolved from the serial number by the device registry
+        self.device_port = self.device.device_port
         self.pins = device_info['pins']
         self.pins_to_letter = device_info['pins_to_letter']
 
@@ -20,32 +33,151 @@ class ArduinoActor(Actor):
         self.register_device_method(self.device.createRisingEdge)
         self.register_device_method(self.device.createFallingEdge)
         self.register_device_method(self.device.createPulse)
+        self.register_device_method(self.device.createPulseTrain)
         self.register_device_method(self.device.sendRisingEdge)
         self.register_device_method(self.device.sendFallingEdge)
         self.register_device_method(self.device.sendPulse)
         self.register_device_method(self.device.sendSyncPulseAndEdge)
         self.register_device_method(self.device.sendPulseSequence)
+        self.register_device_method(self.device.sendEvents)
+        self.register_device_method(self.device.streamSequence)
+        self.register_device_method(self.device.sendAtTimestamp)
+        self.register_device_method(self.device.encodeBatch)
+        self.register_device_method(self.device.sendBatch)
+        self.register_device_method(self.device.syncClock)
+        self.register_device_method(self.device.storeSlot)
+        self.register_device_method(self.device.fireSlot)
+        self.register_device_method(self.device.sendRepeated)
+        self.register_device_method(self.device.firmwareId)
         self.register_device_method(self.device.updateCFile)
+        self.register_device_method(self.device.resetLatencyStats)
         self.register_device_method(self.device.stop)
 
+    def _init_dispatch(self):
+        self._device_methods = set()
+        self._stop_generation = 0
+        self._job = local()
+        self._replies = deque()
+        self.worker = None
+
+    def register_device_method(self, method):
+        """Register `method` for remote calls, timing every call in the device's latency stats."""
+        self._device_methods.add(method.__name__)
+        timed = self.device.latency.timed(method.__name__, "rpc", method)
+
+        def guarded(*args, **kwargs):
+            self._check_cancelled(method.__name__)
+            return timed(*args, **kwargs)
+        super().register_device_method(functools.wraps(method)(guarded))
+
+    def call_action(self, action: str, args: Optional[Sequence] = None, kwargs: Optional[dict] = None) -> Any:
+        self._check_cancelled(action)
+        start = time.perf_counter()
+        try:
+            return super().call_action(action, args, kwargs)
+        finally:
+            self.device.latency.record(action, "rpc", time.perf_counter() - start)
+
+    def _check_cancelled(self, name: str):
+        """Refuse a device call that was queued before a stop arrived."""
+        generation = getattr(self._job, 'generation', None)
+        if generation is not None and generation != self._stop_generation:
+            raise RuntimeError(f"{name} was cancelled by stop.")
+
+    def _request_lane(self, message) -> Optional[str]:
+        """"priority" or "device" for requests that reach the device, None for the rest (e.g. parameter reads)."""
+        try:
+            request = json.loads(message.payload[0])
+        except (ValueError, IndexError):
+            return None
+        names = set()
+        for entry in request if isinstance(request, list) else [request]:
+            if not isinstance(entry, dict):
+                continue
+            method = entry.get("method")
+            if method == "call_action":
+                params = entry.get("params")
+                names.add(params.get("action") if isinstance(params, dict) else None)
+            elif method in self._device_methods:
+                names.add(method)
+        if names & PRIORITY_ACTIONS:
+            return "priority"
+        return "device" if names else None
+
+    def handle_json_request(self, message) -> None:
+        """Hand device calls to the worker so the loop keeps serving heartbeats and parameter reads."""
+        lane = None if self.worker is None else self._request_lane(message)
+        if lane is None:
+            super().handle_json_request(message)
+            return
+        if lane == "priority":
+            # Device calls still waiting behind a long one are answered with an error instead
+            self._stop_generation += 1
+            future = self.worker.submit_priority(self._process_device_request, message, self._stop_generation)
+        else:
+            future = self.worker.submit(self._process_device_request, message, self._stop_generation)
+        future.add_done_callback(self._queue_reply)
+
+    def _process_device_request(self, message, generation: int):
+        self._job.generation = generation
+        try:
+            return self.process_json_message(message)
+        finally:
+            self._job.generation = None
+
+    def _queue_reply(self, future):
+        """Runs on a worker lane: the zmq socket belongs to the listen thread, which sends the reply."""
+        if future.exception() is not None:
+            print(f"[{self.name}] Device call failed: {future.exception()}")
+            return
+        self._replies.append(future.result())
+        try:
+            self._wake_writer.send(b"\0")
+        except OSError:
+            pass
+
+    def _send_replies(self):
+        try:
+            while self._wake_reader.recv(4096):
+                pass
+        except BlockingIOError:
+            pass
+        while self._replies:
+            self.send_message(self._replies.popleft())
+
     def listen(self, stop_event: plev.Event = plev.SimpleEvent(), waiting_time: int = 100, heartbeat_interval: float = 1.0, **kwargs) -> None:
         """Listen for zmq communication until `stop_event` is set or until KeyboardInterrupt.
         
-        Periodically sends a heartbeat every `heartbeat_interval` seconds.
+        Periodically sends a heartbeat every `heartbeat_interval` seconds. Device calls
+        run on a DeviceWorker; their replies wake the poller and are sent from here.
         """
         self.stop_event = stop_event
         poller = self._listen_setup(**kwargs)
+        self._wake_reader, self._wake_writer = socket.socketpair()
+        self._wake_reader.setblocking(False)
+        poller.register(self._wake_reader, zmq.POLLIN)
+        self.worker = DeviceWorker(name=f"{self.name}-device")
 
         try:
             while not stop_event.is_set():
+                # Longer than waiting_time means messages were handled (and others waited)
+                start = time.perf_counter()
                 self._listen_loop_element(poller=poller, waiting_time=waiting_time)
+                self._send_replies()
+                self.device.latency.record("actor", "loop_element", time.perf_counter() - start)
 
         except KeyboardInterrupt:
             pass
         finally:
+            worker, self.worker = self.worker, None
+            worker.close()
+            self._send_replies()
             # Make sure to close port connection when we stop listening
-            self.device.arduino.close()
+            self.device.close()
             print(f"Connection to arduino on port {self.device_port} has been closed.")
+            poller.unregister(self._wake_reader)
+            self._wake_reader.close()
+            self._wake_writer.close()
             self._listen_close(waiting_time=waiting_time)
 
     def stop_listening(self):
@@ -61,4 +193,28 @@ class ArduinoActor(Actor):
             kwargs={'stop_event': self.stop_event},
             daemon=True
         )
-        self.listening_thread.start()            
+        self.listening_thread.start()
+
+
+class ArduinoFleetActor(ArduinoActor):
+    """Single actor driving several Arduinos through a TriggerFleet.
+
+    `devices` is a list of `device_info` dicts; `pins`/`pins_to_letter` expose the
+    combined pin map of all boards.
+    """
+    def __init__(self, name: str, devices: list, publisher_name: str, proxy_address: str, proxy_port: int, **kwargs):
+        Actor.__init__(self, name=name, device_class=TriggerFleet, **kwargs)
+        self._init_dispatch()
+        self.connect(devices=devices, publisher_name=publisher_name, proxy_address=proxy_address, proxy_port=proxy_port)
+        self.device_port = self.device.ports
+        self.pins = self.device.pins
+        self.pins_to_letter = self.device.pins_to_letter
+
+        # Register functions for remote calls
+        self.register_device_method(self.device.splitChannelEvents)
+        self.register_device_method(self.device.sendToDevices)
+        self.register_device_method(self.device.sendSynchronized)
+        self.register_device_method(self.device.sendChannelEvents)
+        self.register_device_method(self.device.syncClocks)
+        self.register_device_method(self.device.resetLatencyStats)
+        self.register_device_method(self.device.stop)
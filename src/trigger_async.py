@@ -0,0 +1,240 @@
+try:
+    from serial import Serial
+except ImportError:
+    Serial = None
+
+import asyncio
+import os
+import time
+from collections import OrderedDict, deque
+from typing import Optional
+
+from protocol import (BINARY_PATTERN, BINARY_VERSION, DEFAULT_RESPONSE_TIMEOUT, NON_DEBUG_LINGER, PONG_PATTERN,
+                      READY_BANNER, SEQ_MODULO, binary_frame_command, frame_command, is_final_response,
+                      is_notification, split_seq)
+from serial_pipeline import RX_BUFFER_SIZE
+
+
+class AsyncArduinoTrigger:
+    """asyncio driver for arduino.ino.
+
+    The serial file descriptor is non-blocking and registered with the event loop
+    (`add_reader`, and `add_writer` while the OS buffer is full), so neither
+    replies nor writes block the loop or need a thread or sleep-polling per
+    call. Event commands go out as binary frames if the sketch supports them,
+    negotiated in `open` like in `ArduinoTrigger`. Commands are tagged with sequence numbers like in `SerialPipeline`, so
+    several can be in flight and any number can be awaited concurrently; one
+    loop can drive several triggers. The coroutines return the reply text, the
+    same string the blocking `ArduinoTrigger` methods return.
+
+        trigger = await AsyncArduinoTrigger.open(device_info)
+        response = await trigger.send_pulse(Pulse(pin=0, delay=10, width=5).command)
+    """
+
+    def __init__(self, device_info: dict, response_timeout: float = DEFAULT_RESPONSE_TIMEOUT,
+                 max_in_flight: int = 4, loop: Optional[asyncio.AbstractEventLoop] = None, binary: bool = True):
+        self.device_port = device_info['port']
+        self.serial_number = device_info['serial_number']
+        self.pins = device_info['pins']
+        self.response_timeout = response_timeout
+        self.max_in_flight = max_in_flight
+        self.prefer_binary = binary
+        self.binary = False  # Whether the sketch takes binary frames; set by open()
+        self.loop = loop or asyncio.get_running_loop()
+        # timeout=0: reads return immediately with whatever is buffered
+        self.arduino = Serial(self.device_port, 115200, timeout=0, rtscts=False, dsrdtr=False)
+
+        self._waiting = deque()  # (signal, future) not yet written
+        self._pending = OrderedDict()  # seq -> [future, frame, lines, timer]
+        self._in_flight_bytes = 0
+        self._next_seq = 0
+        self._partial = b""
+        self._out = bytearray()  # Framed bytes the OS has not taken yet
+        self._error = None  # Port failure that stopped the reader
+        self._ready = self.loop.create_future()  # Set by the firmware's "READY" banner
+        self.on_notification = None  # Called with unsolicited lines such as "D<n>" (shot completed)
+        self._fd = self.arduino.fileno()
+        os.set_blocking(self._fd, False)
+        self.loop.add_reader(self._fd, self._on_readable)
+
+    @classmethod
+    async def open(cls, device_info: dict, ready_timeout: float = 3.0, **kwargs):
+        trigger = cls(device_info, loop=asyncio.get_running_loop(), **kwargs)
+        if await trigger.wait_ready(ready_timeout) is None:
+            print(f"Arduino on {trigger.device_port} did not answer within {ready_timeout} s.")
+        elif trigger.prefer_binary:
+            trigger.binary = await trigger._negotiate_binary()
+        return trigger
+
+    async def _negotiate_binary(self) -> bool:
+        """Ask for binary event frames with "BIN;" before anything is armed; see ArduinoTrigger."""
+        lines = (await self.write_to_device("BIN;")).splitlines()
+        match = BINARY_PATTERN.fullmatch(lines[-1]) if lines else None
+        return match is not None and int(match.group(1)) == BINARY_VERSION
+
+    async def wait_ready(self, timeout: float = 3.0, probe_interval: float = 0.1) -> Optional[float]:
+        """Wait for the sketch after the reset caused by opening the port; see ArduinoTrigger.wait_ready."""
+        start = time.monotonic()
+        while time.monotonic() - start < timeout:
+            try:
+                await asyncio.wait_for(asyncio.shield(self._ready), probe_interval)
+                return time.monotonic() - start
+            except asyncio.TimeoutError:
+                pass
+            lines = (await self.write_to_device("PING;")).splitlines()
+            if lines and PONG_PATTERN.fullmatch(lines[-1]):
+                return time.monotonic() - start
+        return None
+
+    def close(self):
+        self.loop.remove_reader(self._fd)
+        self.loop.remove_writer(self._fd)
+        for seq in list(self._pending):
+            self._resolve(seq)
+        while self._waiting:
+            _, future = self._waiting.popleft()
+            if not future.done():
+                future.set_exception(RuntimeError("Trigger is closed."))
+        self.arduino.close()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        self.close()
+
+    # ---------- Commands ----------
+    async def write_to_device(self, signal: str) -> str:
+        if self._error is not None:
+            raise ConnectionError(f"Serial port {self.device_port} failed: {self._error}") from self._error
+        future = self.loop.create_future()
+        self._waiting.append((signal, future))
+        self._send_waiting()
+        return await future
+
+    async def stop(self) -> str:
+        return await self.write_to_device("STOP;")
+
+    async def send_rising_edge(self, event: str) -> str:
+        return await self.write_to_device(event)
+
+    async def send_falling_edge(self, event: str) -> str:
+        return await self.write_to_device(event)
+
+    async def send_pulse(self, pulse: str) -> str:
+        return await self.write_to_device(pulse)
+
+    async def send_sync_pulse_and_edge(self, event: str) -> str:
+        return await self.write_to_device(event)
+
+    async def send_pulse_sequence(self, sequence: str) -> str:
+        return await self.write_to_device(sequence)
+
+    # ---------- I/O ----------
+    def _can_send(self, frame_size):
+        if not self._pending:
+            return True
+        return (len(self._pending) < self.max_in_flight
+                and self._in_flight_bytes + frame_size <= RX_BUFFER_SIZE)
+
+    def _send_waiting(self):
+        while self._waiting:
+            signal, future = self._waiting[0]
+            if future.cancelled():
+                self._waiting.popleft()
+                continue
+            frame = (self.binary and binary_frame_command(signal, self._next_seq)) or frame_command(signal, self._next_seq)
+            if not self._can_send(len(frame)):
+                break
+            self._waiting.popleft()
+            seq = self._next_seq
+            self._next_seq = (self._next_seq + 1) % SEQ_MODULO
+            timer = self.loop.call_later(self.response_timeout, self._resolve, seq)
+            self._pending[seq] = [future, frame, [], timer]
+            self._in_flight_bytes += len(frame)
+            self._out += frame
+        self._on_writable()
+
+    def _on_writable(self):
+        """Write what the OS takes without blocking; the rest waits for the fd to become writable."""
+        if self._out and self._error is None:
+            try:
+                written = os.write(self._fd, self._out)
+            except BlockingIOError:
+                written = 0
+            except OSError as e:
+                print(f"[AsyncArduinoTrigger] Write error: {e}")
+                self._fail(e)
+                return
+            del self._out[:written]
+        if self._out:
+            self.loop.add_writer(self._fd, self._on_writable)
+        else:
+            self.loop.remove_writer(self._fd)
+
+    def _on_readable(self):
+        try:
+            data = self.arduino.read(max(1, self.arduino.in_waiting))
+        except Exception as e:
+            print(f"[AsyncArduinoTrigger] Read error: {e}")
+            self._fail(e)
+            return
+        if not data:
+            # Readable without data: the port hung up
+            self._fail(ConnectionError(f"Serial port {self.device_port} closed."))
+            return
+        self._partial += data
+        *lines, self._partial = self._partial.split(b"\n")
+        for raw in lines:
+            line = raw.decode(errors='ignore').strip()
+            if line:
+                self._dispatch(line)
+
+    def _fail(self, error: Exception):
+        """The port is gone: stop reading and fail every command in flight or waiting with `error`."""
+        self._error = error
+        self.loop.remove_reader(self._fd)
+        self.loop.remove_writer(self._fd)
+        self._out.clear()
+        while self._pending:
+            _, (future, _, _, timer) = self._pending.popitem(last=False)
+            timer.cancel()
+            if not future.done():
+                future.set_exception(error)
+        self._in_flight_bytes = 0
+        while self._waiting:
+            _, future = self._waiting.popleft()
+            if not future.done():
+                future.set_exception(error)
+
+    def _dispatch(self, line):
+        seq, message = split_seq(line)
+        if seq is None and is_notification(message):
+            if message == READY_BANNER and not self._ready.done():
+                self._ready.set_result(True)
+            elif self.on_notification is not None:
+                self.on_notification(message)
+            return
+        if seq is None:
+            seq = next(iter(self._pending), None)
+        entry = self._pending.get(seq)
+        if entry is None:
+            return
+        entry[2].append(message)
+        if is_final_response(message):
+            self._resolve(seq)
+        elif message == "0":
+            # Non-DEBUG firmware: only linger briefly for a trailing "1"/"0"
+            entry[3].cancel()
+            entry[3] = self.loop.call_later(NON_DEBUG_LINGER, self._resolve, seq)
+
+    def _resolve(self, seq):
+        entry = self._pending.pop(seq, None)
+        if entry is None:
+            return
+        future, frame, lines, timer = entry
+        timer.cancel()
+        self._in_flight_bytes -= len(frame)
+        if not future.done():
+            future.set_result("\n".join(lines))
+        self._send_waiting()
@@ -1,5 +1,14 @@
 from pyleco.directors.director import Director
-from typing import Optional
+from trigger_events import EventBlock, as_event_block
+import time
+from typing import List, Optional, Union
+
+
+def _wire(event):
+    """Legacy command strings pass through; EventBlocks and event objects travel as dicts."""
+    block = as_event_block(event)
+    return event if block is None else block.to_dict()
+
 
 class ArduinoDirector(Director):
     def __init__(self, actor: str, name:str, **kwargs):
@@ -11,47 +20,129 @@ class ArduinoDirector(Director):
     @property
     def pins(self):
         return self.get_parameters(parameters=["pins"])["pins"]
+    @property
+    def latency_stats(self):
+        return self.get_parameters(parameters=["latency_stats"])["latency_stats"]
+
+    def resetLatencyStats(self):
+        response_id = self.call_action_async(action="resetLatencyStats")
+        return response_id
     
     def stop(self):
         response_id = self.call_action_async(action="stop")
         return response_id
 
-    def createRisingEdge(self, pin: int, delay: Optional[str] = None, timestamp: Optional[str] = None):
-        response_id = self.call_action_async(action="createRisingEdge", pin=pin, delay=delay, timestamp=timestamp)
+    def createRisingEdge(self, pin: int, delay: Optional[str] = None, timestamp: Optional[str] = None, unit: str = "ms"):
+        response_id = self.call_action_async(action="createRisingEdge", pin=pin, delay=delay, timestamp=timestamp, unit=unit)
         return response_id
 
-    def createFallingEdge(self, pin: int, delay: Optional[str] = None, timestamp: Optional[str] = None):
-        response_id = self.call_action_async(action="createFallingEdge", pin=pin, delay=delay, timestamp=timestamp)
+    def createFallingEdge(self, pin: int, delay: Optional[str] = None, timestamp: Optional[str] = None, unit: str = "ms"):
+        response_id = self.call_action_async(action="createFallingEdge", pin=pin, delay=delay, timestamp=timestamp, unit=unit)
         return response_id
 
-    def createPulse(self, pin: int, width: int, delay: Optional[str] = None, timestamp: Optional[str] = None):
-        response_id = self.call_action_async(action="createPulse", pin=pin, width=width, delay=delay, timestamp=timestamp)
+    def createPulse(self, pin: int, width: int, delay: Optional[str] = None, timestamp: Optional[str] = None, unit: str = "ms"):
+        response_id = self.call_action_async(action="createPulse", pin=pin, width=width, delay=delay, timestamp=timestamp, unit=unit)
         return response_id
     
-    def createPulseSequence(self, pin: int, width: int, delay: Optional[str] = None, timestamp: Optional[str] = None):
-        response_id = self.call_action_async(action="createPulseSequence", pin=pin, width=width, delay=delay, timestamp=timestamp)
+    def createPulseTrain(self, pins, delays, widths, timestamp: Optional[str] = None, unit: str = "ms"):
+        response_id = self.call_action_async(action="createPulseTrain", pins=pins, delays=delays, widths=widths, timestamp=timestamp, unit=unit)
+        return response_id
+
+    def createPulseSequence(self, pulses: List[dict], unit: str = "ms"):
+        """Encode pulses given as Pulse arguments, e.g. [{'pin': 2, 'width': 5, 'delay': 10}, ...]."""
+        specs = [dict(pulse, type="pulse", unit=unit) for pulse in pulses]
+        response_id = self.call_action_async(action="encodeBatch", specs=specs)
+        return response_id
+
+    def sendBatch(self, specs: List[dict], timestamp: Optional[int] = None):
+        """Arm several events in one RPC and one device write (see ArduinoTrigger.encodeBatch for `specs`)."""
+        response_id = self.call_action_async(action="sendBatch", specs=specs, timestamp=timestamp)
         return response_id
+
+    def read_rpc_responses(self, response_ids: List[bytes], timeout: float = 1.0) -> list:
+        """Results of several call_action_async calls, in order, waiting at most `timeout` s for all of them."""
+        deadline = time.monotonic() + timeout
+        results = []
+        for i, response_id in enumerate(response_ids):
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise TimeoutError(f"{len(response_ids) - i} of {len(response_ids)} responses still pending.")
+            results.append(self.read_rpc_response(response_id, timeout=remaining))
+        return results
     
-    def sendRisingEdge(self, event: str):
-        response_id = self.call_action_async(action="sendRisingEdge", event=event)
+    def sendRisingEdge(self, event: Union[str, EventBlock]):
+        response_id = self.call_action_async(action="sendRisingEdge", event=_wire(event))
         return response_id
 
-    def sendFallingEdge(self, event: str):
-        response_id = self.call_action_async(action="sendFallingEdge", event=event)
+    def sendFallingEdge(self, event: Union[str, EventBlock]):
+        response_id = self.call_action_async(action="sendFallingEdge", event=_wire(event))
         return response_id    
     
-    def sendPulse(self, pulse: str):
-        response_id = self.call_action_async(action="sendPulse", pulse=pulse)
+    def sendPulse(self, pulse: Union[str, EventBlock]):
+        response_id = self.call_action_async(action="sendPulse", pulse=_wire(pulse))
         return response_id # self.read_rpc_response(response_id) later to get the response
     
-    def sendSyncPulseAndEdge(self, event: str):
-        response_id = self.call_action_async(action="sendSyncPulseAndEdge", event=event)
+    def sendSyncPulseAndEdge(self, event: Union[str, EventBlock]):
+        response_id = self.call_action_async(action="sendSyncPulseAndEdge", event=_wire(event))
         return response_id
     
-    def sendPulseSequence(self, sequence: str):
-        response_id = self.call_action_async(action="sendPulseSequence", sequence=sequence)
+    def sendPulseSequence(self, sequence: Union[str, EventBlock]):
+        response_id = self.call_action_async(action="sendPulseSequence", sequence=_wire(sequence))
         return response_id
     
-    def updateCFile(self, CFilePath: str):
-        response_id = self.call_action_async(action="updateCFile", CFilePath=CFilePath)
-        return response_id
\ No newline at end of file
+    def sendEvents(self, events: EventBlock):
+        response_id = self.call_action_async(action="sendEvents", events=_wire(events))
+        return response_id
+
+    def streamSequence(self, sequence: str):
+        response_id = self.call_action_async(action="streamSequence", sequence=sequence)
+        return response_id
+
+    def sendAtTimestamp(self, sequence: str, timestamp: int):
+        response_id = self.call_action_async(action="sendAtTimestamp", sequence=sequence, timestamp=timestamp)
+        return response_id
+
+    def syncClock(self, samples: int = 8):
+        response_id = self.call_action_async(action="syncClock", samples=samples)
+        return response_id
+
+    def storeSlot(self, slot: int, sequence: str):
+        response_id = self.call_action_async(action="storeSlot", slot=slot, sequence=sequence)
+        return response_id
+
+    def fireSlot(self, slot: int, confirm: bool = False):
+        response_id = self.call_action_async(action="fireSlot", slot=slot, confirm=confirm)
+        return response_id
+
+    def sendRepeated(self, sequence: str, period: int, count: int = 0, unit: str = "ms"):
+        response_id = self.call_action_async(action="sendRepeated", sequence=sequence, period=period,
+                                             count=count, unit=unit)
+        return response_id
+
+    def firmwareId(self):
+        response_id = self.call_action_async(action="firmwareId")
+        return response_id
+
+    def updateCFile(self, CFilePath: str, force: bool = False):
+        response_id = self.call_action_async(action="updateCFile", CFilePath=CFilePath, force=force)
+        return response_id
+
+
+class ArduinoFleetDirector(ArduinoDirector):
+    """Director for an ArduinoFleetActor; `pins` is the combined pin map of all boards."""
+
+    def sendToDevices(self, commands: dict):
+        response_id = self.call_action_async(action="sendToDevices", commands=commands)
+        return response_id
+
+    def sendSynchronized(self, commands: dict, start_delay: float = 50, timestamp: Optional[int] = None):
+        response_id = self.call_action_async(action="sendSynchronized", commands=commands, start_delay=start_delay, timestamp=timestamp)
+        return response_id
+
+    def sendChannelEvents(self, events: list, unit: str = "ms", start_delay: float = 50):
+        response_id = self.call_action_async(action="sendChannelEvents", events=events, unit=unit, start_delay=start_delay)
+        return response_id
+
+    def syncClocks(self, samples: int = 8):
+        response_id = self.call_action_async(action="syncClocks", samples=samples)
+        return response_id
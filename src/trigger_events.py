@@ -1,18 +1,230 @@
+import re
 import time
-from typing import Optional, List
+from array import array
+from functools import cached_property
+from typing import Iterable, Optional, List
+from protocol import MAX_DELAY_US, MAX_EVENTS, NUM_CHANNELS, frame_binary, frame_command, pack_events
+
+# Time units of delays and widths: "ms" (default) or "us". Microsecond times are
+# sent with a "u" suffix, e.g. "(3,1500u,1);", so units can be mixed in one command.
+NS_PER_UNIT = {"ms": 1_000_000, "us": 1_000}
+UNIT_SUFFIX = {"ms": "", "us": "u"}
+
+def check_unit(unit: str):
+    if unit not in NS_PER_UNIT:
+        raise ValueError(f"unit must be one of {tuple(NS_PER_UNIT)}.")
+
+def timestamp_delay(timestamp: int, unit: str = "ms") -> int:
+    """Delay in `unit` from now until the absolute timestamp (ns, like time.time_ns())."""
+    ns_per_unit = NS_PER_UNIT[unit]
+    return max(timestamp // ns_per_unit - time.time_ns() // ns_per_unit, 0)
+
+EVENT_PATTERN = re.compile(r"\((\d+),(\d+)(u?),(\d+)\);")
+
+def _typed_array(typecode: str, values) -> array:
+    """`values` as array(typecode), taken as is if it already is one."""
+    if isinstance(values, array) and values.typecode == typecode:
+        return values
+    return array(typecode, values)
+
+class EventBlock:
+    """Typed, array-backed events of one command, validated and encoded once.
+
+    Event i sets channel `pins[i]` to `states[i]` after `delays[i]`, in µs if
+    `micro[i]` else ms. Validation (channel range, delay range, states and,
+    with `check_conflicts`, contradicting edges on one channel at the same
+    time) runs once on construction, as numpy checks over the whole block;
+    `validate=False` skips it for arrays the caller built valid (PulseTrain).
+    the command string, its text and binary frames, the event offsets and the
+    metadata (`kind`, `description`) are computed at most once. Sent as is by
+    ArduinoTrigger, and over RPC as `to_dict()`.
+
+    With a `timestamp` (host ns, like time.time_ns()) the delays are relative
+    to it, and ArduinoTrigger anchors them to that time on the device clock
+    ("@<device µs>;") when it sends the block.
+
+    Event objects check for conflicts among their own edges (a zero-width
+    pulse). Edges of separate objects may coincide: the firmware applies the
+    later one, so back-to-back pulses on one channel are fine:
+
+    >>> PulseSequence([Pulse(pin=2, width=5, delay=0), Pulse(pin=2, width=5, delay=5)]).events.command
+    '(2,0,1);(2,5,0);(2,5,1);(2,10,0);'
+    """
+
+    __slots__ = ("pins", "delays", "micro", "states", "kind", "description", "_command", "_frame", "_records",
+                 "_binary_frame", "_offsets", "timestamp")
+
+    def __init__(self, pins: Iterable[int], delays: Iterable[int], states: Iterable[int], unit: str = "ms",
+                 kind: str = "send_events", description: Optional[str] = None, micro: Optional[Iterable[int]] = None,
+                 command: Optional[str] = None, check_conflicts: bool = False, timestamp: Optional[int] = None,
+                 validate: bool = True):
+        check_unit(unit)
+        try:
+            self.pins = _typed_array('B', pins)
+            self.delays = _typed_array('q', delays)
+            self.states = _typed_array('B', states)
+            self.micro = array('B', micro) if micro is not None else array('B', [unit == "us"]) * len(self.pins)
+        except OverflowError as e:
+            raise ValueError(f"Event field out of range: {e}") from None
+        if not len(self.pins) == len(self.delays) == len(self.states) == len(self.micro):
+            raise ValueError("pins, delays and states must have the same length.")
+        self.kind = kind
+        self.timestamp = timestamp
+        self.description = description if description is not None else f"Sending {len(self.pins)} events"
+        self._command = command
+        self._frame = None
+        self._records = None
+        self._binary_frame = None
+        self._offsets = None
+        if not self.pins:
+            raise ValueError("An EventBlock needs at least one event.")
+        if validate:
+            self._validate(check_conflicts)
+
+    def _validate(self, check_conflicts: bool):
+        import numpy as np
+        pins = np.frombuffer(self.pins, dtype=np.uint8)
+        states = np.frombuffer(self.states, dtype=np.uint8)
+        delays = np.frombuffer(self.delays, dtype=np.int64)
+        us_per_unit = np.where(np.frombuffer(self.micro, dtype=np.uint8), 1, 1000)
+        # Delays are checked in their own unit, so converting them below can't overflow
+        bad = (pins >= NUM_CHANNELS) | (states > 1) | (delays < 0) | (delays > MAX_DELAY_US // us_per_unit)
+        if bad.any():
+            i = int(bad.argmax())
+            if self.pins[i] >= NUM_CHANNELS:
+                raise ValueError(f"Channel {self.pins[i]} is out of range (0-{NUM_CHANNELS - 1}).")
+            if self.states[i] > 1:
+                raise ValueError(f"State must be 0 or 1, not {self.states[i]}.")
+            raise ValueError(f"Delay of {self.delays[i] * int(us_per_unit[i]) / 1000:g} ms is out of range.")
+        if check_conflicts and len(pins) > 1:
+            # Events sorted by (time, channel); neighbours with one key but different states clash
+            keys = delays * us_per_unit * NUM_CHANNELS + pins
+            order = keys.argsort(kind="stable")
+            keys, states = keys[order], states[order]
+            clash = (keys[1:] == keys[:-1]) & (states[1:] != states[:-1])
+            if clash.any():
+                i = int(order[clash.argmax()])
+                raise ValueError(f"Contradicting edges on channel {self.pins[i]} at "
+                                 f"{self.delays[i] * int(us_per_unit[i]) / 1000:g} ms.")
+
+    def check_capacity(self, max_events: int = MAX_EVENTS):
+        """Raise if the firmware's event buffer can't hold the block in one command."""
+        if len(self.pins) > max_events:
+            raise ValueError(f"{len(self.pins)} events don't fit the firmware's buffer of {max_events}; "
+                             f"stream them instead.")
+        return self
+
+    def __len__(self):
+        return len(self.pins)
+
+    @property
+    def command(self) -> str:
+        if self._command is None:
+            self._command = "".join(f"({pin},{delay}{'u' if micro else ''},{state});" for pin, delay, micro, state
+                                    in zip(self.pins, self.delays, self.micro, self.states))
+        return self._command
+
+    @property
+    def frame(self) -> bytes:
+        """The framed command (without sequence number) as written to the port."""
+        if self._frame is None:
+            self._frame = frame_command(self.command)
+        return self._frame
+
+    @property
+    def records(self) -> bytes:
+        """The events as protocol.EVENT_RECORDs, delays in µs."""
+        if self._records is None:
+            self._records = pack_events((pin, delay if micro else delay * 1000, state) for pin, delay, micro, state
+                                        in zip(self.pins, self.delays, self.micro, self.states))
+        return self._records
+
+    @property
+    def binary_frame(self) -> Optional[bytes]:
+        """The binary frame (without sequence number), None if the events don't fit one."""
+        if self._binary_frame is None:
+            self._binary_frame = frame_binary(self.records)
+        return self._binary_frame
+
+    @property
+    def offsets(self):
+        """(offset_ns, pin, state) of every event, like trigger.parse_event_offsets."""
+        if self._offsets is None:
+            self._offsets = [(delay * (NS_PER_UNIT["us"] if micro else NS_PER_UNIT["ms"]), pin, state)
+                             for pin, delay, micro, state in zip(self.pins, self.delays, self.micro, self.states)]
+        return self._offsets
+
+    @classmethod
+    def concat(cls, blocks: List["EventBlock"], kind: str = "send_events", description: Optional[str] = None):
+        """One block holding the events of all `blocks` (validated together).
+
+        Blocks with different timestamps are rebased in µs on the earliest one; a
+        block without a timestamp starts now.
+        """
+        timestamps = {block.timestamp for block in blocks}
+        if len(timestamps) > 1:
+            now = time.time_ns()
+            starts = [block.timestamp if block.timestamp is not None else now for block in blocks]
+            origin = min(starts)
+            return cls(pins=[pin for block in blocks for pin in block.pins],
+                       delays=[(start - origin) // 1000 + (delay if micro else delay * 1000)
+                               for block, start in zip(blocks, starts)
+                               for delay, micro in zip(block.delays, block.micro)],
+                       states=[state for block in blocks for state in block.states], unit="us",
+                       kind=kind, description=description, timestamp=origin)
+        return cls(pins=[pin for block in blocks for pin in block.pins],
+                   delays=[delay for block in blocks for delay in block.delays],
+                   states=[state for block in blocks for state in block.states],
+                   micro=[micro for block in blocks for micro in block.micro],
+                   kind=kind, description=description, command="".join(block.command for block in blocks),
+                   timestamp=timestamps.pop())
+
+    @classmethod
+    def from_command(cls, command: str, kind: str = "send_events", description: Optional[str] = None):
+        """Parse a legacy "(pin,delay[u],state);..." string."""
+        events = EVENT_PATTERN.findall(command)
+        if "".join(f"({pin},{delay}{u},{state});" for pin, delay, u, state in events) != command:
+            raise ValueError(f"Not a plain event sequence: {command!r}")
+        return cls(pins=[int(e[0]) for e in events], delays=[int(e[1]) for e in events],
+                   states=[int(e[3]) for e in events], micro=[e[2] == "u" for e in events],
+                   kind=kind, description=description, command=command)
+
+    def to_dict(self) -> dict:
+        return {'pins': self.pins.tolist(), 'delays': self.delays.tolist(), 'micro': self.micro.tolist(),
+                'states': self.states.tolist(), 'kind': self.kind, 'description': self.description,
+                'timestamp': self.timestamp}
+
+    @classmethod
+    def from_dict(cls, data: dict):
+        return cls(pins=data['pins'], delays=data['delays'], states=data['states'], micro=data.get('micro'),
+                   kind=data.get('kind', "send_events"), description=data.get('description'),
+                   timestamp=data.get('timestamp'))
+
+def as_event_block(event) -> Optional[EventBlock]:
+    """EventBlock of an event object, EventBlock or its dict form; None for legacy command strings."""
+    if isinstance(event, EventBlock):
+        return event
+    if isinstance(event, dict):
+        return EventBlock.from_dict(event)
+    return getattr(event, 'events', None)
+
+def _to_ms(delay: int, unit: str) -> float:
+    return delay * NS_PER_UNIT[unit] / 1e6
 
 class RisingEdge:
     def __init__(self, pin, 
                 delay: Optional[int] = None, 
-                timestamp: Optional[int] = None):
+                timestamp: Optional[int] = None,
+                unit: str = "ms"):
+        check_unit(unit)
+        self.unit = unit
         self.pin = pin
         self.delay = delay
         self.timestamp = timestamp
         self.pulse = None
+        self.relative_delay = self.delay if self.delay is not None else 0
         if self.timestamp is not None:
-            now_ms = int(time.time_ns() / 1e6)
-            ts_ms = int(self.timestamp / 1e6)
-            ts_delay = max(ts_ms - now_ms, 0)
+            ts_delay = timestamp_delay(self.timestamp, self.unit)
 
             if self.delay is not None:
                 self.delay += ts_delay
@@ -23,20 +235,34 @@ class RisingEdge:
             raise ValueError("Either 'delay' or 'timestamp' must be provided.")
 
         # Now create the command as string
-        self.command = f"({self.pin},{self.delay},1);"
+        u = UNIT_SUFFIX[self.unit]
+        self.command = f"({self.pin},{self.delay}{u},1);"
+        # Same event relative to `timestamp`, for ArduinoTrigger.sendAtTimestamp. `events` keep the
+        # timestamp too, so sending them anchors it on the device clock; `command` resolves
+        # it to a delay from construction instead, which is late by the time it is sent
+        self.relative_command = f"({self.pin},{self.relative_delay}{u},1);"
+
+    @cached_property
+    def events(self) -> EventBlock:
+        return EventBlock([self.pin], [self.relative_delay], [1], self.unit, kind="send_rising_edge",
+                          description=f"Sending a rising edge to pin {self.pin} with delay of "
+                                      f"{_to_ms(self.delay, self.unit):g} ms", command=self.relative_command,
+                          timestamp=self.timestamp)
 
 class FallingEdge:
     def __init__(self, pin, 
                  delay: Optional[int] = None, 
-                 timestamp: Optional[int] = None):
+                 timestamp: Optional[int] = None,
+                 unit: str = "ms"):
+        check_unit(unit)
+        self.unit = unit
         self.pin = pin
         self.delay = delay
         self.timestamp = timestamp
         self.pulse = None
+        self.relative_delay = self.delay if self.delay is not None else 0
         if self.timestamp is not None:
-            now_ms = int(time.time_ns() / 1e6)
-            ts_ms = int(self.timestamp / 1e6)
-            ts_delay = max(ts_ms - now_ms, 0)
+            ts_delay = timestamp_delay(self.timestamp, self.unit)
 
             if self.delay is not None:
                 self.delay += ts_delay
@@ -47,22 +273,34 @@ class FallingEdge:
             raise ValueError("Either 'delay' or 'timestamp' must be provided.")
 
         # Now create the pulse command as string
-        self.command = f"({self.pin},{self.delay},0);"
+        u = UNIT_SUFFIX[self.unit]
+        self.command = f"({self.pin},{self.delay}{u},0);"
+        # Same event relative to `timestamp`, for ArduinoTrigger.sendAtTimestamp
+        self.relative_command = f"({self.pin},{self.relative_delay}{u},0);"
+
+    @cached_property
+    def events(self) -> EventBlock:
+        return EventBlock([self.pin], [self.relative_delay], [0], self.unit, kind="send_falling_edge",
+                          description=f"Sending a falling edge to pin {self.pin} with delay of "
+                                      f"{_to_ms(self.delay, self.unit):g} ms", command=self.relative_command,
+                          timestamp=self.timestamp)
 
 
 class Pulse:
     def __init__(self, pin, width, 
                  delay: Optional[int] = None, 
-                 timestamp: Optional[int] = None):
+                 timestamp: Optional[int] = None,
+                 unit: str = "ms"):
+        check_unit(unit)
+        self.unit = unit
         self.pin = pin
         self.delay = delay
         self.width = width
         self.timestamp = timestamp
         self.pulse = None
+        self.relative_delay = self.delay if self.delay is not None else 0
         if self.timestamp is not None:
-            now_ms = int(time.time_ns() / 1e6)
-            ts_ms = int(self.timestamp / 1e6)
-            ts_delay = max(ts_ms - now_ms, 0)
+            ts_delay = timestamp_delay(self.timestamp, self.unit)
 
             if self.delay is not None:
                 self.delay += ts_delay
@@ -73,7 +311,18 @@ class Pulse:
             raise ValueError("Either 'delay' or 'timestamp' must be provided.")
 
         # Now create the pulse command as string
-        self.command = f"({self.pin},{self.delay},1);({self.pin},{self.delay+self.width},0);"
+        u = UNIT_SUFFIX[self.unit]
+        self.command = f"({self.pin},{self.delay}{u},1);({self.pin},{self.delay+self.width}{u},0);"
+        # Same pulse relative to `timestamp`, for ArduinoTrigger.sendAtTimestamp
+        self.relative_command = f"({self.pin},{self.relative_delay}{u},1);({self.pin},{self.relative_delay+self.width}{u},0);"
+
+    @cached_property
+    def events(self) -> EventBlock:
+        return EventBlock([self.pin, self.pin], [self.relative_delay, self.relative_delay + self.width], [1, 0], self.unit,
+                          kind="send_pulse",
+                          description=f"Sending a pulse to pin {self.pin} with delay of {_to_ms(self.delay, self.unit):g} ms "
+                                      f"and pulse width of {_to_ms(self.width, self.unit):g} ms", command=self.relative_command,
+                          check_conflicts=True, timestamp=self.timestamp)
 
 class SyncPulseAndEdge:
     """
@@ -82,19 +331,23 @@ class SyncPulseAndEdge:
     
     Args:
         pulse_pin (int):        Pin to send the pulse on.
-        pulse_width (int):      Width of the pulse in ms.
+        pulse_width (int):      Width of the pulse in `unit`.
         edge_pin (int):         Pin to send the rising/falling edge on.
         edge_type (str):        'rising' or 'falling'.
-        delay (int, optional):  Delay in ms before both events fire.
+        delay (int, optional):  Delay in `unit` before both events fire.
         timestamp (int, optional): Absolute timestamp in ns (like time.time_ns()).
+        unit (str, optional):   'ms' (default) or 'us' for microsecond resolution.
     """
     def __init__(self, pulse_pin: int, pulse_width: int,
                  edge_pin: int, edge_type: str,
                  delay: Optional[int] = None,
-                 timestamp: Optional[int] = None):
+                 timestamp: Optional[int] = None,
+                 unit: str = "ms"):
 
         if edge_type not in ('rising', 'falling'):
             raise ValueError("edge_type must be 'rising' or 'falling'.")
+        check_unit(unit)
+        self.unit = unit
 
         self.pulse_pin = pulse_pin
         self.pulse_width = pulse_width
@@ -102,11 +355,10 @@ class SyncPulseAndEdge:
         self.edge_type = edge_type
         self.delay = delay
         self.timestamp = timestamp
+        self.relative_delay = self.delay if self.delay is not None else 0
 
         if self.timestamp is not None:
-            now_ms = int(time.time_ns() / 1e6)
-            ts_ms = int(self.timestamp / 1e6)
-            ts_delay = max(ts_ms - now_ms, 0)
+            ts_delay = timestamp_delay(self.timestamp, self.unit)
             if self.delay is not None:
                 self.delay += ts_delay
             else:
@@ -116,10 +368,24 @@ class SyncPulseAndEdge:
 
         # Both events use the exact same resolved delay so they fire together
         edge_state = 1 if edge_type == 'rising' else 0
-        pulse_cmd = f"({self.pulse_pin},{self.delay},1);({self.pulse_pin},{self.delay + self.pulse_width},0);"
-        edge_cmd  = f"({self.edge_pin},{self.delay},{edge_state});"
+        u = UNIT_SUFFIX[self.unit]
+        pulse_cmd = f"({self.pulse_pin},{self.delay}{u},1);({self.pulse_pin},{self.delay + self.pulse_width}{u},0);"
+        edge_cmd  = f"({self.edge_pin},{self.delay}{u},{edge_state});"
+
+        self.command = pulse_cmd + edge_cmd
+        # Same events relative to `timestamp`, for ArduinoTrigger.sendAtTimestamp
+        self.relative_command = (f"({self.pulse_pin},{self.relative_delay}{u},1);"
+                                 f"({self.pulse_pin},{self.relative_delay + self.pulse_width}{u},0);"
+                                 f"({self.edge_pin},{self.relative_delay}{u},{edge_state});")
 
-        self.command = pulse_cmd + edge_cmd        
+    @cached_property
+    def events(self) -> EventBlock:
+        edge_state = 1 if self.edge_type == 'rising' else 0
+        return EventBlock([self.pulse_pin, self.pulse_pin, self.edge_pin],
+                          [self.relative_delay, self.relative_delay + self.pulse_width, self.relative_delay],
+                          [1, 0, edge_state], self.unit, kind="send_sync_pulse_and_edge",
+                          description="Sending synchronized pulse and edge event",
+                          command=self.relative_command, check_conflicts=True, timestamp=self.timestamp)
 
 class PulseSequence:
     def __init__(self, pulses: List[Pulse]):
@@ -132,18 +398,119 @@ class PulseSequence:
         # Ensure timestamp of first pulse is our zero point if it exists
         if ref_pulse.timestamp is not None:
             ref_time = ref_pulse.timestamp
-            for i, pulse in enumerate(pulses[1:], start=1):
-                # Compute absolute timestamp relative to the first pulse
+            for pulse in pulses[1:]:
+                # Delays of pulses without a timestamp are relative to the first pulse's
                 if pulse.timestamp is None:
-                    delay_ms = pulse.delay if pulse.delay is not None else 0
-                    pulse.timestamp = ref_time + delay_ms / 1000.0
-                    # Recalculate delay based on new timestamp
-                    now_ms = int(time.time() * 1000)
-                    ts_ms = int(pulse.timestamp * 1000)
-                    pulse.delay = max(ts_ms - now_ms, 0)
-                    pulse.command = f"({pulse.pin},{pulse.delay},1);({pulse.pin},{pulse.delay + pulse.width},0);"
+                    pulse.timestamp = ref_time
+                    pulse.delay = pulse.relative_delay + timestamp_delay(ref_time, pulse.unit)
+                    u = UNIT_SUFFIX[pulse.unit]
+                    pulse.command = f"({pulse.pin},{pulse.delay}{u},1);({pulse.pin},{pulse.delay + pulse.width}{u},0);"
+                    vars(pulse).pop("events", None)  # Rebuilt with the timestamp on next use
 
         # Now create the command sequence as a string
-        self.command = ""
+        self.command = "".join(pulse.command for pulse in pulses)
+
+    @cached_property
+    def events(self) -> EventBlock:
+        """All pulses as one block, validated once rather than per pulse."""
+        pulses = self.pulses
+        kind, description = "send_pulse_sequence", f"Sending a pulse sequence of {len(pulses)} pulses"
+        if len({pulse.timestamp for pulse in pulses}) > 1:
+            # concat rebases the pulses on the earliest timestamp
+            return EventBlock.concat([pulse.events for pulse in pulses], kind=kind, description=description)
+        pins, delays, micro = [], [], []
         for pulse in pulses:
-            self.command += pulse.command
\ No newline at end of file
+            if pulse.width == 0:
+                # A pulse's own edges can't coincide; edges of separate pulses may
+                raise ValueError(f"Contradicting edges on channel {pulse.pin} at "
+                                 f"{_to_ms(pulse.relative_delay, pulse.unit):g} ms.")
+            pins += (pulse.pin, pulse.pin)
+            delays += (pulse.relative_delay, pulse.relative_delay + pulse.width)
+            micro += (pulse.unit == "us",) * 2
+        return EventBlock(pins, delays, array('B', (1, 0)) * len(pulses), micro=micro, kind=kind,
+                          description=description, timestamp=pulses[0].timestamp)
+
+class PulseTrain:
+    """
+    Builds whole pulse trains from arrays instead of one Pulse object per pulse.
+
+    `pins`, `delays` and `widths` are broadcast against each other, so scalars can
+    be mixed with arrays. The wire command is encoded in a single formatting pass.
+
+    Args:
+        pins (array-like of int):    Pin of each pulse.
+        delays (array-like of int):  Delay in `unit` of each pulse's rising edge.
+        widths (array-like of int):  Width in `unit` of each pulse.
+        timestamp (int, optional):   Absolute timestamp in ns (like time.time_ns())
+                                     that all delays are relative to.
+        unit (str, optional):        'ms' (default) or 'us' for microsecond resolution.
+    """
+    def __init__(self, pins, delays, widths, timestamp: Optional[int] = None, unit: str = "ms"):
+        import numpy as np  # Only PulseTrain needs numpy; keep `import trigger_events` light
+        check_unit(unit)
+        self.unit = unit
+        pins, delays, widths = np.broadcast_arrays(np.asarray(pins, dtype=np.int64),
+                                                   np.asarray(delays, dtype=np.int64),
+                                                   np.asarray(widths, dtype=np.int64))
+        if pins.ndim != 1 or pins.size == 0:
+            raise ValueError("PulseTrain must contain at least one pulse.")
+        if (delays < 0).any():
+            raise ValueError("Delays must be non-negative.")
+        if (widths <= 0).any():
+            raise ValueError("Widths must be positive.")
+        if ((pins < 0) | (pins >= NUM_CHANNELS)).any():
+            raise ValueError(f"Pins must be channels 0-{NUM_CHANNELS - 1}.")
+        last = int((delays + widths).max())
+        if last > MAX_DELAY_US * 1000 // NS_PER_UNIT[unit]:
+            raise ValueError(f"Delay of {_to_ms(last, unit):g} ms is out of range.")
+
+        self.timestamp = timestamp
+        self.pins = pins
+        self.delays = delays
+        self.widths = widths
+
+        # One row per pulse, relative to `timestamp`: (pin, delay, 1) then (pin, delay + width, 0)
+        events = np.empty((pins.size, 6), dtype=np.int64)
+        events[:, 0] = pins
+        events[:, 1] = delays
+        events[:, 2] = 1
+        events[:, 3] = pins
+        events[:, 4] = delays + widths
+        events[:, 5] = 0
+        template = "(%d,%d" + UNIT_SUFFIX[self.unit] + ",%d);"
+        self.relative_command = (template * (2 * pins.size)) % tuple(events.ravel().tolist())
+        self._rows = events
+        self.command = self.relative_command
+        if self.timestamp is not None:
+            # Legacy host-resolved delays from now, as in Pulse.command
+            ts_delay = timestamp_delay(self.timestamp, self.unit)
+            self.delays = delays + ts_delay
+            resolved = events.copy()
+            resolved[:, 1::3] += ts_delay
+            self.command = (template * (2 * pins.size)) % tuple(resolved.ravel().tolist())
+
+    @cached_property
+    def events(self) -> EventBlock:
+        # Checked above, so the arrays are copied over as bytes without the per-event validation
+        import numpy as np
+        rows = self._rows.reshape(-1, 3)
+        return EventBlock(array('B', rows[:, 0].astype(np.uint8).tobytes()),
+                          array('q', rows[:, 1].astype(np.int64).tobytes()),
+                          array('B', rows[:, 2].astype(np.uint8).tobytes()), self.unit, kind="send_pulse_sequence",
+                          description=f"Sending a pulse train of {self.pins.size} pulses",
+                          command=self.relative_command, timestamp=self.timestamp, validate=False)
+
+    @classmethod
+    def from_spec(cls, pin, period: int, count: int, width: int,
+                  delay: int = 0, timestamp: Optional[int] = None, unit: str = "ms"):
+        """Train of `count` pulses of `width` every `period`, starting after `delay` (all in `unit`).
+
+        >>> PulseTrain.from_spec(pin=2, period=10, count=3, width=10).command
+        '(2,0,1);(2,10,0);(2,10,1);(2,20,0);(2,20,1);(2,30,0);'
+        """
+        import numpy as np
+        return cls(pins=pin, delays=delay + period * np.arange(count, dtype=np.int64),
+                   widths=width, timestamp=timestamp, unit=unit)
+
+    def __len__(self):
+        return int(self.pins.size)
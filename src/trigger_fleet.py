@@ -0,0 +1,123 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+from latency_stats import LatencyStats
+from trigger import ArduinoTrigger
+from trigger_events import UNIT_SUFFIX, check_unit
+
+
+class TriggerFleet:
+    """Drives several Arduino triggers as one device with a combined pin map.
+
+    `devices` is a list of `device_info` dicts (as for `ArduinoTrigger`); the
+    triggers are keyed by serial number. Channel names from each board's `pins`
+    form the combined map `pins` (name -> {'serial_number', 'pin'}); a name used
+    on several boards is prefixed with its serial number ("<serial>:<name>").
+    Per-device command slices are dispatched concurrently, and `sendSynchronized`
+    arms all boards against one host timestamp through each board's clock sync,
+    so their schedules start together.
+    """
+
+    def __init__(self, devices: List[dict], publisher_name: str, proxy_address: str, proxy_port: int,
+                 **trigger_kwargs):
+        if not devices:
+            raise ValueError("TriggerFleet needs at least one device.")
+        self.triggers: Dict[str, ArduinoTrigger] = {}
+        try:
+            for device_info in devices:
+                self.triggers[device_info['serial_number']] = ArduinoTrigger(
+                    device_info, publisher_name, proxy_address, proxy_port, **trigger_kwargs)
+            self.pins, self.pins_to_letter = self._combine_pins(devices)
+        except Exception:
+            # Release the ports opened so far; the caller never gets a fleet to close
+            for trigger in self.triggers.values():
+                trigger.close()
+            raise
+        self.ports = {serial: trigger.device_port for serial, trigger in self.triggers.items()}
+        self._executor = ThreadPoolExecutor(max_workers=len(self.triggers), thread_name_prefix="trigger-fleet")
+        # Fleet-level and actor timings; each trigger keeps its own serial timings
+        self.latency = LatencyStats()
+
+    @staticmethod
+    def _combine_pins(devices):
+        names = [name for device_info in devices for name in device_info['pins']]
+        pins, pins_to_letter = {}, {}
+        for device_info in devices:
+            serial = device_info['serial_number']
+            letters = device_info.get('pins_to_letter', {})
+            for name, pin in device_info['pins'].items():
+                channel = name if names.count(name) == 1 else f"{serial}:{name}"
+                pins[channel] = {'serial_number': serial, 'pin': pin}
+                if name in letters:
+                    pins_to_letter[channel] = letters[name]
+        return pins, pins_to_letter
+
+    def close(self):
+        self._executor.shutdown(wait=False)
+        for trigger in self.triggers.values():
+            trigger.close()
+
+    def _check_serials(self, commands: Dict[str, object]):
+        unknown = set(commands) - set(self.triggers)
+        if unknown:
+            raise KeyError(f"Unknown serial numbers: {sorted(unknown)}")
+
+    def _map(self, func, commands: Dict[str, object]) -> Dict[str, object]:
+        """Run func(trigger, arg) for every serial number in `commands` concurrently."""
+        self._check_serials(commands)
+        futures = {serial: self._executor.submit(func, self.triggers[serial], arg)
+                   for serial, arg in commands.items()}
+        return {serial: future.result() for serial, future in futures.items()}
+
+    def splitChannelEvents(self, events: List[list], unit: str = "ms") -> Dict[str, str]:
+        """Turn [channel, delay, state] events on combined channel names into per-device commands."""
+        check_unit(unit)
+        commands = {}
+        for channel, delay, state in events:
+            target = self.pins[channel]
+            commands.setdefault(target['serial_number'], []).append(
+                f"({target['pin']},{delay}{UNIT_SUFFIX[unit]},{int(state)});")
+        return {serial: "".join(parts) for serial, parts in commands.items()}
+
+    def sendToDevices(self, commands: Dict[str, str]) -> Dict[str, str]:
+        """Send each device its own command slice, all boards in parallel."""
+        return self._map(lambda trigger, sequence: trigger.sendPulseSequence(sequence), commands)
+
+    def syncClocks(self, samples: int = 8) -> Dict[str, dict]:
+        return self._map(lambda trigger, n: trigger.syncClock(n), {serial: samples for serial in self.triggers})
+
+    def sendSynchronized(self, commands: Dict[str, str], start_delay: float = 50,
+                         timestamp: Optional[int] = None) -> Dict[str, str]:
+        """Arm every board so its slice starts at the same instant.
+
+        Delays in each slice are relative to `timestamp` (host time_ns()), which
+        defaults to `start_delay` ms from now; it must leave enough time to reach
+        every board.
+        """
+        self._check_serials(commands)
+        stale = {serial: None for serial in commands if self.triggers[serial].clock.is_stale()}
+        if stale:
+            self._map(lambda trigger, _: trigger.clock.sync(), stale)
+        if timestamp is None:
+            timestamp = time.time_ns() + int(start_delay * 1e6)
+        return self._map(lambda trigger, sequence: trigger.sendAtTimestamp(sequence, timestamp), commands)
+
+    def sendChannelEvents(self, events: List[list], unit: str = "ms", start_delay: float = 50) -> Dict[str, str]:
+        """Schedule events given on combined channel names with a synchronized start."""
+        return self.sendSynchronized(self.splitChannelEvents(events, unit), start_delay=start_delay)
+
+    @property
+    def latency_stats(self) -> Dict[str, dict]:
+        stats = {serial: trigger.latency_stats for serial, trigger in self.triggers.items()}
+        stats['fleet'] = self.latency.summary()
+        return stats
+
+    def resetLatencyStats(self):
+        self.latency.reset()
+        for trigger in self.triggers.values():
+            trigger.latency.reset()
+        return "Latency statistics reset"
+
+    def stop(self) -> Dict[str, str]:
+        return self._map(lambda trigger, _: trigger.stop(), {serial: None for serial in self.triggers})